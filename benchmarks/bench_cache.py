@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+"""
+Compare ``convert()`` to hits and misses of a ``ConversionCache`` over the
+schemas of the benchmark suite.
+
+Run with ``python benchmarks/bench_cache.py`` with the package installed.
+"""
+
+from __future__ import print_function
+import sys
+import timeit
+
+from colander_jsonschema import ConversionCache, convert
+
+from suite import CASES
+
+
+def main(number=10):
+    for name, make in CASES:
+        schema_node = make()
+        cache = ConversionCache()
+        convert(schema_node, cache=cache)
+
+        def miss():
+            cache.clear()
+            convert(schema_node, cache=cache)
+
+        timings = []
+        for run in (lambda: convert(schema_node),
+                    lambda: convert(schema_node, cache=cache),
+                    miss):
+            elapsed = min(timeit.repeat(run, number=number,
+                                        repeat=5)) / number
+            timings.append(elapsed * 1000)
+        print('%-10s convert %7.2f ms  hit %7.2f ms  miss %7.2f ms  '
+              'hit speedup %.1fx'
+              % ((name,) + tuple(timings) + (timings[0] / timings[1],)))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
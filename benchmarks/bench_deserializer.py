@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""
+Compare deserializing payloads with ``compile_deserializer()`` to colander's
+``deserialize()``, alone and followed by the ``compile_validator()`` of the
+converted schema.
+
+Run with ``python benchmarks/bench_deserializer.py`` with the package
+installed.
+"""
+
+from __future__ import print_function
+import sys
+import timeit
+
+import colander
+
+from colander_jsonschema.deserializer import compile_deserializer
+from colander_jsonschema.validator import compile_validator
+
+
+class Item(colander.MappingSchema):
+    name = colander.SchemaNode(
+        colander.String(),
+        validator=colander.All(colander.Length(max=32),
+                               colander.Regex('^[a-z]+$')))
+    count = colander.SchemaNode(colander.Integer(), missing=None,
+                                validator=colander.Range(0, 1000))
+    kind = colander.SchemaNode(colander.String(),
+                               validator=colander.OneOf(['a', 'b', 'c']))
+    ratio = colander.SchemaNode(colander.Float(), missing=None)
+    active = colander.SchemaNode(colander.Boolean(), missing=False)
+
+
+class Items(colander.SequenceSchema):
+    item = Item()
+
+
+class Batch(colander.MappingSchema):
+    items = Items(validator=colander.Length(min=1))
+    flag = colander.SchemaNode(colander.Boolean())
+
+
+def make_payload(size=1000):
+    return {
+        'items': [{'name': 'item', 'count': i % 1000, 'kind': 'abc'[i % 3],
+                   'ratio': i / 7.0, 'active': True}
+                  for i in range(size)],
+        'flag': True,
+    }
+
+
+def main(number=10):
+    schema = Batch()
+    payload = make_payload()
+    compiled = compile_deserializer(schema)
+    validate = compile_validator(schema)
+    assert compiled.deserialize(payload) == schema.deserialize(payload)
+
+    def two_passes(payload):
+        validate(payload)
+        return schema.deserialize(payload)
+
+    timings = []
+    for name, deserialize in [('colander', schema.deserialize),
+                              ('two-pass', two_passes),
+                              ('compiled', compiled.deserialize)]:
+        elapsed = min(timeit.repeat(lambda: deserialize(payload),
+                                    number=number, repeat=5)) / number
+        timings.append(elapsed)
+        print('%-10s %8.2f ms per 1000 items' % (name, elapsed * 1000))
+    print('speedup %.1fx over colander, %.1fx over two passes'
+          % (timings[0] / timings[2], timings[1] / timings[2]))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
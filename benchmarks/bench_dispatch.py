@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Show that type dispatch cost stays flat while the converter registry grows:
+converts a schema of ``colander.String`` subclass nodes, resolved through
+their MRO, with registries of increasing size.
+
+Run with ``python benchmarks/bench_dispatch.py`` with the package installed
+(``python setup.py develop``).
+"""
+
+from __future__ import print_function
+import sys
+import timeit
+
+import colander
+
+from colander_jsonschema import TypeConversionDispatcher, TypeConverter
+
+
+class Slug(colander.String):
+    pass
+
+
+class ShortSlug(Slug):
+    pass
+
+
+def make_schema(nodes=1000):
+    root = colander.SchemaNode(colander.Mapping())
+    for i in range(nodes):
+        root.add(colander.SchemaNode(ShortSlug(), name='s%d' % i))
+    return root
+
+
+def make_dispatcher_class(size):
+    converters = dict(TypeConversionDispatcher.converters)
+    for i in range(size):
+        schema_type = type('Type%d' % i, (colander.SchemaType,), {})
+        converters[schema_type] = TypeConverter
+    return type('Dispatcher', (TypeConversionDispatcher,),
+                {'converters': converters})
+
+
+def main(number=20):
+    schema = make_schema()
+    nodes = len(schema.children) + 1
+    for size in (0, 100, 1000, 10000):
+        dispatcher_class = make_dispatcher_class(size)
+        elapsed = min(timeit.repeat(lambda: dispatcher_class()(schema),
+                                    number=number, repeat=5)) / number
+        dispatcher = dispatcher_class()
+        resolve = min(timeit.repeat(lambda: dispatcher.resolve(ShortSlug),
+                                    number=100000, repeat=5)) / 100000
+        print('registry %5d  convert %6.2f us/node  resolve %5.0f ns'
+              % (len(dispatcher_class.converters), elapsed / nodes * 1e6,
+                 resolve * 1e9))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Compare ``fingerprint()`` to converting, and to hashing the JSON text of
+the conversion, over the schemas of the benchmark suite and a schema of
+``MappingSchema`` classes.
+
+Run with ``python benchmarks/bench_fingerprint.py`` with the package
+installed; the exit status is 1 when the median ratio of the time of
+``fingerprint()`` to the time of ``convert()`` exceeds ``--max-ratio`` for
+a schema.
+"""
+
+from __future__ import print_function
+import argparse
+import hashlib
+import json
+import sys
+import timeit
+
+import colander
+
+from colander_jsonschema import convert, fingerprint
+
+from suite import CASES, median
+
+
+class Address(colander.MappingSchema):
+    street = colander.SchemaNode(colander.String(),
+                                 validator=colander.Length(1, 100))
+    zip = colander.SchemaNode(colander.String(), missing=None,
+                              validator=colander.Regex(r'^\d+$'))
+    country = colander.SchemaNode(colander.String(),
+                                  validator=colander.OneOf(['jp', 'us']))
+
+
+class Person(colander.MappingSchema):
+    name = colander.SchemaNode(colander.String())
+    age = colander.SchemaNode(colander.Integer(), missing=None,
+                              validator=colander.Range(0, 150))
+    home = Address()
+    work = Address()
+
+
+def make_classes(people=300):
+    root = colander.SchemaNode(colander.Mapping(), name='root')
+    for i in range(people):
+        root.add(Person(name='p%d' % i))
+    return root
+
+
+def hash_conversion(schema_node):
+    text = json.dumps(convert(schema_node), sort_keys=True)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--max-ratio', type=float, default=0.6,
+                        help='slowest tolerated fingerprint/convert time '
+                             'ratio (default: %(default)s)')
+    parser.add_argument('--number', type=int, default=3,
+                        help='calls per timing (default: %(default)s)')
+    parser.add_argument('--rounds', type=int, default=15,
+                        help='timings per case (default: %(default)s)')
+    args = parser.parse_args(argv)
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), 10000))
+    failures = []
+    for name, make in CASES + [('classes', make_classes)]:
+        schema_node = make()
+        timings = []
+        for run in (convert, hash_conversion, fingerprint):
+            elapsed = min(timeit.repeat(lambda: run(schema_node),
+                                        number=args.number,
+                                        repeat=5)) / args.number
+            timings.append(elapsed * 1000)
+        # timed in turns, so both see the same machine load
+        ratios = []
+        for _ in range(args.rounds):
+            converting = timeit.timeit(lambda: convert(schema_node),
+                                       number=args.number)
+            ratios.append(timeit.timeit(lambda: fingerprint(schema_node),
+                                        number=args.number) / converting)
+        ratio = median(ratios)
+        print('%-10s convert %7.2f ms  convert+sha1 %7.2f ms  '
+              'fingerprint %7.2f ms  ratio %.2f'
+              % ((name,) + tuple(timings) + (ratio,)))
+        if ratio > args.max_ratio:
+            failures.append(name)
+    for name in failures:
+        print('TOO SLOW %s: fingerprint costs more than %.0f%% of convert'
+              % (name, args.max_ratio * 100))
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Compare payload validation by ``compile_validator()`` with the generic
+``jsonschema.Draft4Validator`` on the same converted schema.
+
+Run with ``python benchmarks/bench_validator.py`` with the package and
+``jsonschema`` installed.
+"""
+
+from __future__ import print_function
+import sys
+import timeit
+
+import colander
+
+from colander_jsonschema import convert
+from colander_jsonschema.validator import compile_validator
+
+
+class Item(colander.MappingSchema):
+    name = colander.SchemaNode(
+        colander.String(),
+        validator=colander.All(colander.Length(max=32),
+                               colander.Regex('^[a-z]+$')))
+    count = colander.SchemaNode(colander.Integer(), missing=None,
+                                validator=colander.Range(0, 1000))
+    kind = colander.SchemaNode(colander.String(),
+                               validator=colander.OneOf(['a', 'b', 'c']))
+    ratio = colander.SchemaNode(colander.Float(), missing=None)
+    created = colander.SchemaNode(colander.DateTime())
+
+
+class Items(colander.SequenceSchema):
+    item = Item()
+
+
+class Batch(colander.MappingSchema):
+    items = Items(validator=colander.Length(min=1))
+    flag = colander.SchemaNode(colander.Boolean())
+
+
+def make_payload(size=1000):
+    return {
+        'items': [{'name': 'item', 'count': i % 1000, 'kind': 'abc'[i % 3],
+                   'ratio': i / 7.0, 'created': '2014-10-06T00:00:00'}
+                  for i in range(size)],
+        'flag': True,
+    }
+
+
+def main(number=10):
+    try:
+        import jsonschema
+    except ImportError:
+        print('jsonschema is not installed')
+        return 1
+    schema = Batch()
+    payload = make_payload()
+    compiled = compile_validator(schema)
+    generic = jsonschema.Draft4Validator(convert(schema))
+    assert compiled.is_valid(payload) and generic.is_valid(payload)
+    timings = []
+    for name, validate in [('jsonschema', generic.is_valid),
+                           ('compiled', compiled.is_valid)]:
+        elapsed = min(timeit.repeat(lambda: validate(payload),
+                                    number=number, repeat=5)) / number
+        timings.append(elapsed)
+        print('%-10s %8.2f ms per 1000 items' % (name, elapsed * 1000))
+    print('speedup %.1fx' % (timings[0] / timings[1]))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+Compare the explicit-stack walker of ``TypeConversionDispatcher`` with the
+former recursive dispatch on 10k-node schema trees.
+
+Run with ``python benchmarks/bench_walk.py`` with the package installed
+(``python setup.py develop``).
+"""
+
+from __future__ import print_function
+import sys
+import timeit
+
+import colander
+
+from colander_jsonschema import TypeConversionDispatcher, finalize_conversion
+
+
+class RecursiveDispatcher(TypeConversionDispatcher):
+    """The dispatch of colander_jsonschema 0.2, recursing per sub-node."""
+
+    def __call__(self, schema_node):
+        converter_class = self.converters.get(type(schema_node.typ))
+        converter = converter_class(self)
+        return converter(schema_node)
+
+
+def make_wide(nodes=10000, width=100):
+    root = colander.SchemaNode(colander.Mapping())
+    for i in range(nodes // width):
+        mapping = colander.SchemaNode(colander.Mapping(), name='m%d' % i)
+        for j in range(width - 1):
+            mapping.add(colander.SchemaNode(
+                colander.String(), name='s%d' % j, missing=None,
+                validator=colander.Length(max=10)))
+        root.add(mapping)
+    return root
+
+
+def make_nested(nodes=10000, depth=50):
+    root = colander.SchemaNode(colander.Mapping())
+    for i in range(nodes // (depth * 2)):
+        node = root
+        for j in range(depth):
+            sub_node = colander.SchemaNode(colander.Mapping(),
+                                           name='m%d' % i)
+            sub_node.add(colander.SchemaNode(colander.Integer(), name='i',
+                                             validator=colander.Range(0)))
+            node.add(sub_node)
+            node = sub_node
+    return root
+
+
+def make_deep(depth=10000):
+    root = node = colander.SchemaNode(colander.Mapping())
+    for i in range(depth - 1):
+        sub_node = colander.SchemaNode(colander.Mapping(), name='n')
+        node.add(sub_node)
+        node = sub_node
+    return root
+
+
+def bench(dispatcher_class, schema, number):
+    def run():
+        finalize_conversion(dispatcher_class()(schema))
+    return min(timeit.repeat(run, number=number, repeat=5)) / number
+
+
+def main(number=5):
+    for name, schema in [('wide', make_wide()), ('nested', make_nested())]:
+        assert RecursiveDispatcher()(schema) == \
+            TypeConversionDispatcher()(schema)
+        recursive = bench(RecursiveDispatcher, schema, number)
+        walk = bench(TypeConversionDispatcher, schema, number)
+        print('%-8s recursive %8.2f ms  walk %8.2f ms  speedup %.2fx'
+              % (name, recursive * 1000, walk * 1000, recursive / walk))
+    schema = make_deep()
+    try:
+        RecursiveDispatcher()(schema)
+    except RuntimeError:  # RecursionError
+        recursive = 'RecursionError'
+    walk = bench(TypeConversionDispatcher, schema, number)
+    print('%-8s recursive %14s  walk %8.2f ms'
+          % ('deep', recursive, walk * 1000))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
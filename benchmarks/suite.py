@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion benchmark suite: wall time, per-node cost and peak memory of
+``convert()`` over synthetic schemas, compared with stored baselines.
+
+Times are stored relative to a calibration loop, timed just before each
+timing of a case so both see the same machine load, so baselines recorded
+on one machine remain meaningful on another one.  The median of the
+rounds is kept, with its spread: a case regressed when it is slower than
+both the threshold and the noise of the runs compared allow.
+
+Run with ``python benchmarks/suite.py`` with the package installed
+(``python setup.py develop``); the exit status is 1 when a case regressed
+beyond the threshold.  ``--save`` records the current results as the
+baselines.  Only the standard library is used.
+"""
+
+from __future__ import print_function
+import argparse
+import gc
+import json
+import os
+import sys
+import timeit
+
+try:
+    import tracemalloc
+except ImportError:  # pragma: no cover
+    tracemalloc = None
+
+import colander
+
+from colander_jsonschema import convert
+
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         'baselines.json')
+
+
+def make_wide(fields=2000):
+    root = colander.SchemaNode(colander.Mapping(), name='root')
+    for i in range(fields):
+        root.add(colander.SchemaNode(colander.String(), name='f%d' % i))
+    return root
+
+
+def make_deep(depth=500):
+    root = node = colander.SchemaNode(colander.Mapping(), name='root')
+    for i in range(depth):
+        child = colander.SchemaNode(colander.Mapping(), name='n%d' % i)
+        child.add(colander.SchemaNode(colander.Integer(), name='value'))
+        node.add(child)
+        node = child
+    return root
+
+
+def make_sequences(sequences=200, fields=5):
+    root = colander.SchemaNode(colander.Mapping(), name='root')
+    for i in range(sequences):
+        item = colander.SchemaNode(colander.Mapping(), name='item')
+        for j in range(fields):
+            item.add(colander.SchemaNode(colander.Integer(), name='f%d' % j,
+                                         missing=None))
+        sequence = colander.SchemaNode(colander.Sequence(), name='s%d' % i)
+        sequence.add(item)
+        root.add(sequence)
+    return root
+
+
+def make_validators(fields=500):
+    root = colander.SchemaNode(colander.Mapping(), name='root')
+    for i in range(fields):
+        validator = colander.All(
+            colander.Length(min=1, max=20),
+            colander.Regex(r'^[a-z]+$'),
+            colander.OneOf(['alpha', 'beta', 'gamma']),
+            colander.All(colander.Length(max=10)))
+        root.add(colander.SchemaNode(colander.String(), name='f%d' % i,
+                                     validator=validator))
+    return root
+
+
+CASES = [
+    ('wide', make_wide),
+    ('deep', make_deep),
+    ('sequences', make_sequences),
+    ('validators', make_validators),
+]
+
+
+def count_nodes(schema_node):
+    count = 0
+    stack = [schema_node]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(node.children)
+    return count
+
+
+def _workload():
+    converted = {}
+    for i in range(10000):
+        converted['k%d' % (i % 100)] = {'type': 'string', 'n': i}
+    return converted
+
+
+def calibrate(number=5):
+    """
+    Seconds taken by a fixed pure Python workload, the unit of the stored
+    times.
+
+    :rtype: float
+    """
+    return timeit.timeit(_workload, number=number) / number
+
+
+def median(values):
+    """
+    :type values: list
+    :rtype: float
+    """
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def peak_memory(func):
+    """
+    Peak bytes allocated while calling ``func``, or ``None`` without
+    ``tracemalloc``.
+
+    :rtype: int
+    """
+    if tracemalloc is None:
+        return None
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(schema_node, number=10, rounds=15):
+    """
+    Time ``rounds`` rounds of ``number`` conversions, each after timing
+    the calibration workload.
+
+    :type schema_node: colander.SchemaNode
+    :type number: int
+    :type rounds: int
+    :rtype: dict
+    """
+    nodes = count_nodes(schema_node)
+    timer = timeit.Timer(lambda: convert(schema_node))
+    timer.timeit(1)
+    seconds = []
+    ratios = []
+    for _ in range(rounds):
+        unit = calibrate()
+        elapsed = timer.timeit(number) / number
+        seconds.append(elapsed)
+        ratios.append(elapsed / unit)
+    elapsed = median(seconds)
+    relative = median(ratios)
+    return {
+        'nodes': nodes,
+        'seconds': elapsed,
+        'relative': relative,
+        # median absolute deviation of the rounds, relative to the median
+        'spread': median([abs(r - relative) for r in ratios]) / relative,
+        'per_node_us': elapsed / nodes * 1e6,
+        'peak_bytes': peak_memory(lambda: convert(schema_node)),
+    }
+
+
+def compare(results, baselines, threshold, memory_threshold, noise=3.0):
+    """
+    Regressions of ``results`` against ``baselines``, as messages.  The
+    time ``threshold`` is raised to ``noise`` times the spreads of the
+    result and of the baseline when they are larger.
+
+    :type results: dict
+    :type baselines: dict
+    :type threshold: float
+    :type memory_threshold: float
+    :type noise: float
+    :rtype: list
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        baseline = baselines.get(name)
+        if baseline is None:
+            continue
+        ratio = result['relative'] / baseline['relative']
+        tolerated = max(threshold, noise * (result.get('spread', 0) +
+                                            baseline.get('spread', 0)))
+        if ratio > 1 + tolerated:
+            regressions.append('%s: %.0f%% slower' % (name,
+                                                      (ratio - 1) * 100))
+        if result['peak_bytes'] and baseline.get('peak_bytes'):
+            ratio = float(result['peak_bytes']) / baseline['peak_bytes']
+            if ratio > 1 + memory_threshold:
+                regressions.append('%s: %.0f%% more memory'
+                                   % (name, (ratio - 1) * 100))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--baselines', default=BASELINES,
+                        help='baselines file (default: %(default)s)')
+    parser.add_argument('--save', action='store_true',
+                        help='record the results as the baselines')
+    parser.add_argument('--threshold', type=float, default=0.15,
+                        help='tolerated relative slowdown (default: '
+                             '%(default)s)')
+    parser.add_argument('--memory-threshold', type=float, default=0.10,
+                        help='tolerated relative memory growth (default: '
+                             '%(default)s)')
+    parser.add_argument('--number', type=int, default=10,
+                        help='conversions per timing (default: '
+                             '%(default)s)')
+    parser.add_argument('--rounds', type=int, default=15,
+                        help='timings per case (default: %(default)s)')
+    parser.add_argument('cases', nargs='*', metavar='case',
+                        help='cases to run: %s (default: all)'
+                             % ', '.join(name for name, _ in CASES))
+    args = parser.parse_args(argv)
+    selected = [(name, make) for name, make in CASES
+                if not args.cases or name in args.cases]
+
+    results = {}
+    for name, make in selected:
+        results[name] = result = measure(make(), number=args.number,
+                                         rounds=args.rounds)
+        print('%-10s %6d nodes  %8.2f ms  %6.2f us/node  +/-%4.1f%%  '
+              'peak %s'
+              % (name, result['nodes'], result['seconds'] * 1e3,
+                 result['per_node_us'], result['spread'] * 100,
+                 '%.0f KiB' % (result['peak_bytes'] / 1024.)
+                 if result['peak_bytes'] is not None else 'n/a'))
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as fp:
+            baselines = json.load(fp)
+    if args.save:
+        baselines.update(results)
+        with open(args.baselines, 'w') as fp:
+            json.dump(baselines, fp, indent=2, sort_keys=True)
+            fp.write('\n')
+        print('baselines saved to %s' % args.baselines)
+        return 0
+    regressions = compare(results, baselines, args.threshold,
+                          args.memory_threshold)
+    for regression in regressions:
+        print('REGRESSION %s' % regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
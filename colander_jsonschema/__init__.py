@@ -1,11 +1,33 @@
 # -*- coding: utf-8 -*-
 
+import binascii
+import collections
+import hashlib
+import inspect
+import json
+import re
+import threading
+import time
+import types
+import weakref
+
 import colander
 import colander.interfaces
+import translationstring
+
+from .dialects import get_dialect
+from .patterns import UntranslatablePattern, translate_pattern
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
 
 
 __version__ = '0.2'
 
+_timer = getattr(time, 'perf_counter', time.time)
+
 
 class ConversionError(Exception):
     pass
@@ -15,11 +37,26 @@ class NoSuchConverter(ConversionError):
     pass
 
 
+def converts_validators(*validator_types):
+    """
+    Declare the validator classes a validator converter converts, so
+    :class:`ValidatorConversionDispatcher` dispatches them to it by class
+    instead of probing it.
+
+    :type validator_types: tuple
+    """
+    def decorate(validator_converter):
+        validator_converter.validator_types = validator_types
+        return validator_converter
+    return decorate
+
+
 def convert_length_validator_factory(max_key, min_key):
     """
     :type max_key: str
     :type min_key: str
     """
+    @converts_validators(colander.Length)
     def validator_converter(schema_node, validator):
         """
         :type schema_node: colander.SchemaNode
@@ -41,6 +78,7 @@ def convert_oneof_validator_factory(null_values=(None,)):
     """
     :type null_values: iter
     """
+    @converts_validators(colander.OneOf)
     def validator_converter(schema_node, validator):
         """
         :type schema_node: colander.SchemaNode
@@ -58,6 +96,7 @@ def convert_oneof_validator_factory(null_values=(None,)):
     return validator_converter
 
 
+@converts_validators(colander.Range)
 def convert_range_validator(schema_node, validator):
     """
     :type schema_node: colander.SchemaNode
@@ -74,6 +113,7 @@ def convert_range_validator(schema_node, validator):
     return converted
 
 
+@converts_validators(colander.Regex)
 def convert_regex_validator(schema_node, validator):
     """
     :type schema_node: colander.SchemaNode
@@ -88,14 +128,105 @@ def convert_regex_validator(schema_node, validator):
         elif isinstance(validator, colander.Email):
             converted['format'] = 'email'
         else:
-            converted['pattern'] = validator.match_object.pattern
+            match_object = validator.match_object
+            try:
+                converted['pattern'] = translate_pattern(match_object.pattern,
+                                                         match_object.flags)
+            except UntranslatablePattern as e:
+                raise ConversionError('pattern of %r: %s'
+                                      % (schema_node.name, e))
     return converted
 
 
+_flattened = weakref.WeakKeyDictionary()
+
+
+def _flatten_all_validator(validator):
+    """
+    Sub-validators of a ``colander.All``, those of nested ``colander.All``
+    included, memoized per instance.
+
+    :type validator: colander.All
+    :rtype: tuple
+    """
+    try:
+        validators, flattened = _flattened[validator]
+        if validators is validator.validators:
+            return flattened
+    except (KeyError, TypeError):
+        pass
+    flattened = []
+    stack = [iter(validator.validators)]
+    while stack:
+        for sub_validator in stack[-1]:
+            if type(sub_validator) is colander.All:
+                stack.append(iter(sub_validator.validators))
+                break
+            flattened.append(sub_validator)
+        else:
+            stack.pop()
+    flattened = tuple(flattened)
+    try:
+        _flattened[validator] = validator.validators, flattened
+    except TypeError:
+        pass
+    return flattened
+
+
 class ValidatorConversionDispatcher(object):
+    """
+    Converts validators, dispatching them by class to validator converters.
+
+    Converters declaring their ``validator_types``, see
+    :func:`converts_validators`, are looked up through the MRO of the
+    validator class in a memoized table, the nearest class first.  Other
+    converters are probed in order, returning ``None`` for validators they
+    do not convert.
+    """
 
     def __init__(self, *converters):
         self.converters = converters
+        self._typed = [(colander.All, self.convert_all_validator)]
+        self._probed = []
+        for converter in converters:
+            validator_types = getattr(converter, 'validator_types', None)
+            if validator_types is None:
+                self._probed.append(converter)
+            else:
+                self._typed.extend((validator_type, converter)
+                                   for validator_type in validator_types)
+        self._table = {}
+
+    def extend(self, *converters):
+        """
+        A dispatcher with ``converters`` added, tried before the existing
+        ones for the same validator classes.
+
+        :rtype: ValidatorConversionDispatcher
+        """
+        return type(self)(*(converters + self.converters))
+
+    def resolve(self, validator_type):
+        """
+        Converters of ``validator_type``, in the order they are tried.
+
+        :type validator_type: type
+        :rtype: tuple
+        """
+        converters = self._table.get(validator_type)
+        if converters is None:
+            mro = inspect.getmro(validator_type)
+            typed = sorted(
+                (mro.index(cls), order, converter)
+                for order, (cls, converter) in enumerate(self._typed)
+                if cls in mro)
+            converters = []
+            for _, _, converter in typed:
+                if converter not in converters:
+                    converters.append(converter)
+            converters = tuple(converters + self._probed)
+            self._table[validator_type] = converters
+        return converters
 
     def __call__(self, schema_node, validator=None):
         """
@@ -107,7 +238,10 @@ class ValidatorConversionDispatcher(object):
             validator = schema_node.validator
         converted = {}
         if validator is not None:
-            for converter in (self.convert_all_validator,) + self.converters:
+            converters = self._table.get(type(validator))
+            if converters is None:
+                converters = self.resolve(type(validator))
+            for converter in converters:
                 ret = converter(schema_node, validator)
                 if ret is not None:
                     converted = ret
@@ -123,13 +257,54 @@ class ValidatorConversionDispatcher(object):
         converted = None
         if isinstance(validator, colander.All):
             converted = {}
-            for v in validator.validators:
+            for v in _flatten_all_validator(validator):
                 ret = self(schema_node, v)
                 converted.update(ret)
         return converted
 
 
+class ConversionObserver(object):
+    """
+    Receives the events of the conversions of a dispatcher given an
+    ``observer``.  ``path`` is the tuple of the node names from the root,
+    excluded, and ``elapsed`` is in seconds.
+    """
+
+    def node_entered(self, path, schema_node, converter_class):
+        """
+        :type path: tuple
+        :type schema_node: colander.SchemaNode
+        :type converter_class: type
+        """
+
+    def node_exited(self, path, schema_node, converter_class, elapsed):
+        """
+        Called once the node itself is converted, before its sub-nodes.
+
+        :type path: tuple
+        :type schema_node: colander.SchemaNode
+        :type converter_class: type
+        :type elapsed: float
+        """
+
+    def validator_converted(self, path, schema_node, validator, elapsed):
+        """
+        :type path: tuple
+        :type schema_node: colander.SchemaNode
+        :type validator: object
+        :type elapsed: float
+        """
+
+
+_fragments = {}
+
+
 class TypeConverter(object):
+    """
+    Converts schema nodes of a type.  Converters hold no per-node state:
+    a dispatcher binds one instance of each converter class and uses it for
+    every node.
+    """
 
     type = ''
     convert_validator = lambda self, schema_node: {}
@@ -140,15 +315,57 @@ class TypeConverter(object):
         """
         self.dispatcher = dispatcher
 
+    def make_fragment(self, required):
+        """
+        Members of the conversion depending only on the converter class and
+        on whether the node is ``required``.  Fragments are computed once
+        per class and shared, so they must not depend on the node.
+
+        :type required: bool
+        :rtype: dict
+        """
+        fragment = {'type': self.type}
+        if not required:
+            fragment['type'] = [self.type, 'null']
+        return fragment
+
+    def get_fragment(self, required):
+        """
+        Interned :meth:`make_fragment` and the keys of its lists, which
+        are copied into conversions.
+
+        :type required: bool
+        :rtype: tuple
+        """
+        key = type(self), required
+        entry = _fragments.get(key)
+        if entry is None:
+            fragment = self.make_fragment(required)
+            lists = tuple(k for k, v in fragment.items()
+                          if isinstance(v, list))
+            entry = _fragments[key] = fragment, lists
+        return entry
+
     def convert_type(self, schema_node, converted):
         """
         :type schema_node: colander.SchemaNode
         :type converted: dict
         :rtype: dict
         """
-        converted['type'] = self.type
-        if not schema_node.required:
-            converted['type'] = [converted['type'], 'null']
+        fragment, lists = self.get_fragment(schema_node.required)
+        converted.update(fragment)
+        if lists:
+            # interned lists are copied, once per compact conversion
+            shared = self.dispatcher._lists
+            for key in lists:
+                value = fragment[key]
+                if shared is None:
+                    converted[key] = list(value)
+                    continue
+                copied = shared.get(id(value))
+                if copied is None:
+                    copied = shared[id(value)] = list(value)
+                converted[key] = copied
         if schema_node.title:
             converted['title'] = schema_node.title
         if schema_node.description:
@@ -166,7 +383,18 @@ class TypeConverter(object):
         if converted is None:
             converted = {}
         converted = self.convert_type(schema_node, converted)
-        converted.update(self.convert_validator(schema_node))
+        observer = self.dispatcher.observer
+        if observer is None:
+            validated = self.convert_validator(schema_node)
+        else:
+            start = _timer()
+            validated = self.convert_validator(schema_node)
+            if schema_node.validator is not None:
+                observer.validator_converted(
+                    self.dispatcher.path, schema_node,
+                    schema_node.validator, _timer() - start)
+        if validated:
+            converted.update(validated)
         return converted
 
 
@@ -175,19 +403,18 @@ class BaseStringTypeConverter(TypeConverter):
     type = 'string'
     format = None
 
-    def convert_type(self, schema_node, converted):
+    def make_fragment(self, required):
         """
-        :type schema_node: colander.SchemaNode
-        :type converted: dict
+        :type required: bool
         :rtype: dict
         """
-        converted = super(BaseStringTypeConverter,
-                          self).convert_type(schema_node, converted)
-        if schema_node.required:
-            converted['minLength'] = 1
+        fragment = super(BaseStringTypeConverter,
+                         self).make_fragment(required)
+        if required:
+            fragment['minLength'] = 1
         if self.format is not None:
-            converted['format'] = self.format
-        return converted
+            fragment['format'] = self.format
+        return fragment
 
 
 class BooleanTypeConverter(TypeConverter):
@@ -269,7 +496,148 @@ class ArrayTypeConverter(TypeConverter):
         return converted
 
 
+# leaf converters converting from the node attributes only
+_plain_converters = frozenset([
+    BooleanTypeConverter, DateTypeConverter, DateTimeTypeConverter,
+    NumberTypeConverter, IntegerTypeConverter, StringTypeConverter,
+    TimeTypeConverter,
+])
+
+
+def _function(method):
+    """
+    :type method: callable
+    :rtype: callable
+    """
+    # unbound methods of Python 2
+    return getattr(method, '__func__', method)
+
+
+# convert_type() implementations only storing the conversions of sub-nodes
+_deferring_methods = frozenset([
+    _function(TypeConverter.convert_type),
+    _function(ObjectTypeConverter.convert_type),
+    _function(ArrayTypeConverter.convert_type),
+])
+
+
+_eager_classes = {}
+
+
+def _converts_eagerly(converter_class):
+    """
+    Whether converters of ``converter_class`` may read the conversions of
+    the sub-nodes they dispatch, which must then be complete when
+    returned.
+
+    :type converter_class: type
+    :rtype: bool
+    """
+    eager = _eager_classes.get(converter_class)
+    if eager is None:
+        eager = _eager_classes[converter_class] = (
+            _function(converter_class.convert_type) not in _deferring_methods
+            or _function(converter_class.__call__) is not
+            _function(TypeConverter.__call__))
+    return eager
+
+
+class ConverterRegistry(Mapping):
+    """
+    Read-only map of schema types to converter classes, optionally layered
+    over a ``parent`` registry.
+
+    :meth:`extend` returns a new layer instead of modifying the registry,
+    so registries can be shared between dispatchers and threads.
+    :meth:`resolve` looks converters up through the MRO of schema types and
+    memoizes the results per registry.
+    """
+
+    def __init__(self, converters=None, parent=None):
+        """
+        :type converters: dict
+        :type parent: ConverterRegistry
+        """
+        self.parent = parent
+        self._converters = dict(converters or ())
+        self._resolved = {}
+
+    def __getitem__(self, schema_type):
+        registry = self
+        while registry is not None:
+            try:
+                return registry._converters[schema_type]
+            except KeyError:
+                registry = registry.parent
+        raise KeyError(schema_type)
+
+    def __iter__(self):
+        seen = set()
+        registry = self
+        while registry is not None:
+            for schema_type in registry._converters:
+                if schema_type not in seen:
+                    seen.add(schema_type)
+                    yield schema_type
+            registry = registry.parent
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def extend(self, converters):
+        """
+        :type converters: dict
+        :rtype: ConverterRegistry
+        """
+        return self.__class__(converters, self)
+
+    def resolve(self, schema_type):
+        """
+        Converter class of ``schema_type``, or of its nearest base class
+        having one.
+
+        :type schema_type: type
+        :rtype: type
+        """
+        try:
+            return self._resolved[schema_type]
+        except KeyError:
+            pass
+        converter_class = None
+        for base in inspect.getmro(schema_type):
+            converter_class = self.get(base)
+            if converter_class is not None:
+                break
+        # racing threads store the same value
+        self._resolved[schema_type] = converter_class
+        return converter_class
+
+
+_registries = {}
+
+
 class TypeConversionDispatcher(object):
+    """
+    Converts schema trees, dispatching nodes to type converters.
+
+    ``converters`` is the class-wide map of schema types to converter
+    classes; override it in subclasses, never modify it.  The ``converters``
+    given to an instance, and :meth:`register`, only apply to that instance.
+    A dispatcher converts one tree at a time; :func:`convert` never shares
+    one between running calls, so concurrent calls are thread-safe.
+
+    An ``observer``, see :class:`ConversionObserver`, is notified of the
+    conversion of every node and validator; without one the conversion is
+    not timed.
+
+    With ``compact``, equal conversions of leaf nodes are a single dict,
+    and converters may share lists between nodes: the result must not be
+    modified.  Nothing is shared with other conversions.
+
+    With ``dialects``, see :mod:`colander_jsonschema.dialects`, every node
+    is also emitted in each dialect as it is converted, and
+    :meth:`dialect_conversions` returns the conversions of the tree.
+    """
 
     converters = {
         colander.Boolean: BooleanTypeConverter,
@@ -283,27 +651,478 @@ class TypeConversionDispatcher(object):
         colander.Time: TimeTypeConverter,
     }
 
-    def __init__(self, converters=None):
+    post_order = False
+    observer = None
+    compact = False
+    dialects = ()
+    # path of the node being converted, while observed
+    path = ()
+    # state of the running walk
+    _pending = None
+    _depth = 0
+    _seen = frozenset()
+    _walk_convert = None
+    # whether the converter running converts sub-nodes at once
+    _eager = False
+    # id of interned fragment lists: their copy shared by the leaves
+    _lists = None
+
+    def __init__(self, converters=None, observer=None, compact=False,
+                 dialects=None):
         """
         :type converters: dict
+        :type observer: ConversionObserver
+        :type compact: bool
+        :type dialects: list
+        """
+        registry = self.default_registry()
+        if converters:
+            registry = registry.extend(converters)
+        self.converters = registry
+        if observer is not None:
+            self.observer = observer
+        if compact:
+            self.compact = True
+        if dialects:
+            self.dialects = tuple(get_dialect(d) for d in dialects)
+            if compact and len(self.dialects) > 1:
+                # interned leaves are rewritten in place, for one dialect
+                raise ConversionError('compact conversions are emitted in '
+                                      'a single dialect')
+            # the dialect emitted into the draft-04 conversion itself
+            self._in_place = 0
+            for index, dialect in enumerate(self.dialects):
+                if dialect.name == 'draft-04':
+                    self._in_place = index
+            # id of converted nodes: their conversion in each dialect
+            self._outputs = {}
+        if self.observer is not None:
+            self._paths = {}
+        if self.compact:
+            self._leaves = {}
+            self._lists = {}
+        self._instances = {}
+        self._bound = {}
+        self._eager_converters = set()
+
+    @classmethod
+    def default_registry(cls):
+        """
+        Registry of the class-wide ``converters``, shared by the instances
+        and built again when the dict was modified.
+
+        :rtype: ConverterRegistry
+        """
+        registry, source = _registries.get(cls, (None, None))
+        # the registry holds a copy to compare the dict with
+        if (source is not cls.converters or
+                registry._converters != source):
+            source = cls.converters
+            registry = ConverterRegistry(source)
+            _registries[cls] = registry, source
+        return registry
+
+    def register(self, schema_type, converter_class):
+        """
+        Convert ``schema_type`` and its subclasses with ``converter_class``
+        in this dispatcher.
+
+        :type schema_type: type
+        :type converter_class: type
+        """
+        self.converters = self.converters.extend(
+            {schema_type: converter_class})
+        self._instances = {}
+
+    def resolve(self, schema_type):
+        """
+        Converter class of ``schema_type``, or of its nearest base class
+        having one.
+
+        :type schema_type: type
+        :rtype: type
         """
-        if converters is not None:
-            self.converters.update(converters)
+        return self.converters.resolve(schema_type)
 
     def __call__(self, schema_node):
         """
+        Convert ``schema_node``.  While a conversion is running, sub-nodes
+        dispatched by converters are queued instead, and an empty dict is
+        returned which is filled in once the current converter returned.
+        Sub-nodes dispatched by converters overriding ``convert_type()`` or
+        ``__call__()``, which may read their conversions, are converted at
+        once.
+
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        pending = self._pending
+        if pending is None:
+            return self.walk(schema_node)
+        if self.compact and not schema_node.children:
+            return self.intern_leaf(schema_node)
+        converted = {}
+        pending.append((schema_node, converted, self._depth + 1))
+        if self._eager:
+            self.convert_eagerly(converted)
+        return converted
+
+    def convert_eagerly(self, converted):
+        """
+        Convert the node just queued, standing for ``converted``, and the
+        sub-nodes it dispatches, before returning to the running converter.
+
+        :type converted: dict
+        """
+        pending = self._pending
+        base = len(pending) - 1
+        depth = self._depth
+        path = self.path
+        if self.observer is not None:
+            self._paths[id(converted)] = path + (pending[-1][0].name,)
+        if self.dialects:
+            self._outputs[id(converted)] = self.make_outputs(converted)
+        seen = self._seen
+        convert_node = self._walk_convert
+        eager = self._eager_converters
+        instances = self._instances
+        while len(pending) > base:
+            node, target, node_depth = pending.pop()
+            if node_depth is None:
+                self.exit_node(node, target)
+                continue
+            seen.add(id(node))
+            if node_depth >= len(seen):
+                raise ConversionError(
+                    'recursive schema at %r, convert it with dedup'
+                    % (node.name,))
+            self._depth = node_depth
+            if self.post_order:
+                pending.append((node, target, None))
+            schema_type = type(node.typ)
+            converter = instances.get(schema_type)
+            if converter is None:
+                converter = self.get_converter(schema_type)
+            self._eager = converter in eager
+            convert_node(node, target)
+        self._depth = depth
+        self.path = path
+        self._eager = True
+
+    def intern_leaf(self, schema_node):
+        """
+        Convert the leaf ``schema_node`` at once, returning the conversion
+        of an equal leaf instead if there was one.
+
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        node_key = None
+        if (schema_node.validator is None and
+                schema_node.default is colander.null and
+                self.observer is None):
+            schema_type = type(schema_node.typ)
+            converter = self._instances.get(schema_type)
+            if converter is None:
+                converter = self.get_converter(schema_type)
+            if type(converter) in _plain_converters:
+                # the conversion only depends on these
+                node_key = (type(converter), schema_node.required,
+                            schema_node.title, schema_node.description)
+                converted = self._leaves.get(node_key)
+                if converted is not None:
+                    return converted
+        if self.observer is not None:
+            path = self.path
+            converted = {}
+            self._paths[id(converted)] = path + (schema_node.name,)
+            self.observe_node(schema_node, converted)
+            self.path = path
+        else:
+            converted = self.convert_node(schema_node, {})
+        converted = self._leaves.setdefault(_leaf_key(converted), converted)
+        if node_key is not None:
+            self._leaves[node_key] = converted
+        return converted
+
+    def walk(self, schema_node):
+        """
+        Convert the tree below ``schema_node`` using an explicit stack, so
+        the nesting depth is not bounded by the interpreter recursion limit.
+
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        converted = {}
+        convert_node = self._start_walk(schema_node, converted)
+        try:
+            self._convert_pending(convert_node)
+        finally:
+            self._end_walk()
+        return converted
+
+    def iter_walk(self, schema_node, step=None):
+        """
+        :meth:`walk` as a generator, pausing with ``None`` after every
+        ``step`` nodes and yielding the conversion last, so it can be
+        resumed later, e.g. from an event loop.  Closing the generator
+        abandons the conversion.
+
+        :type schema_node: colander.SchemaNode
+        :type step: int
+        :rtype: generator
+        """
+        converted = {}
+        convert_node = self._start_walk(schema_node, converted)
+        try:
+            while self._convert_pending(convert_node, step):
+                yield None
+        finally:
+            self._end_walk()
+        yield converted
+
+    def _start_walk(self, schema_node, converted):
+        """
+        Queue ``schema_node``, standing for ``converted``, and return the
+        method converting each node, None for the inlined
+        :meth:`convert_node`.
+
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :rtype: callable
+        """
+        self._seen = set()
+        convert_node = None
+        if (type(self).convert_node is not
+                TypeConversionDispatcher.convert_node):
+            convert_node = self.convert_node
+        if self.observer is not None:
+            convert_node = self.observe_node
+            self._paths = {}
+        if self.dialects:
+            self._convert_node = convert_node or self.convert_node
+            convert_node = self.emit_dialects
+            self._outputs = {id(converted): self.make_outputs(converted)}
+        self._walk_convert = convert_node or self.convert_node
+        self._pending = [(schema_node, converted, 0)]
+        return convert_node
+
+    def _convert_pending(self, convert_node, step=None):
+        """
+        Convert the queued nodes, pausing after ``step`` of them.
+
+        :type convert_node: callable
+        :type step: int
+        :rtype: bool
+        """
+        pending = self._pending
+        seen = self._seen
+        post_order = self.post_order
+        instances = self._instances
+        eager = self._eager_converters
+        nodes = 0
+        while pending:
+            if nodes == step:
+                return True
+            nodes += 1
+            node, target, depth = pending.pop()
+            if depth is None:
+                self.exit_node(node, target)
+                continue
+            # an acyclic path is never deeper than the nodes seen so far
+            seen.add(id(node))
+            if depth >= len(seen):
+                raise ConversionError(
+                    'recursive schema at %r, convert it with dedup'
+                    % (node.name,))
+            self._depth = depth
+            if post_order:
+                pending.append((node, target, None))
+            if convert_node is not None:
+                converter = instances.get(type(node.typ))
+                if converter is None:
+                    converter = self.get_converter(type(node.typ))
+                if eager:
+                    self._eager = converter in eager
+                convert_node(node, target)
+                continue
+            # inlined convert_node()
+            schema_type = type(node.typ)
+            converter = instances.get(schema_type)
+            if converter is None:
+                converter = self.get_converter(schema_type)
+            if eager:
+                self._eager = converter in eager
+            ret = converter(node, target)
+            if ret is not target:
+                target.update(ret)
+        return False
+
+    def _end_walk(self):
+        """
+        Forget the walk, completed or abandoned.
+        """
+        self._pending = None
+        self._eager = False
+        self._seen.clear()
+
+    def convert_node(self, schema_node, converted):
+        """
+        Fill ``converted`` with the conversion of ``schema_node`` alone.
+
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :rtype: dict
+        """
+        schema_type = type(schema_node.typ)
+        converter = self._instances.get(schema_type)
+        if converter is None:
+            converter = self.get_converter(schema_type)
+        ret = converter(schema_node, converted)
+        if ret is not converted:
+            converted.update(ret)
+        return converted
+
+    def observe_node(self, schema_node, converted):
+        """
+        :meth:`convert_node` notifying the ``observer``.
+
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :rtype: dict
+        """
+        observer = self.observer
+        pending = self._pending
+        queued = len(pending)
+        path = self.path = self._paths.pop(id(converted), ())
+        converter_class = type(self.get_converter(type(schema_node.typ)))
+        observer.node_entered(path, schema_node, converter_class)
+        start = _timer()
+        self.convert_node(schema_node, converted)
+        elapsed = _timer() - start
+        for sub_node, sub_converted, depth in pending[queued:]:
+            if depth is not None:
+                self._paths[id(sub_converted)] = path + (sub_node.name,)
+        observer.node_exited(path, schema_node, converter_class, elapsed)
+        return converted
+
+    def make_outputs(self, converted):
+        """
+        The conversions of a node in each dialect, still empty.
+
+        :type converted: dict
+        :rtype: list
+        """
+        outputs = [{} for _ in self.dialects]
+        outputs[self._in_place] = converted
+        return outputs
+
+    def emit_dialects(self, schema_node, converted):
+        """
+        :meth:`convert_node` also emitting the conversion of
+        ``schema_node`` in each dialect, referring to the conversions of
+        its sub-nodes, filled in when they are converted.
+
         :type schema_node: colander.SchemaNode
+        :type converted: dict
         :rtype: dict
         """
-        schema_type = schema_node.typ
-        schema_type = type(schema_type)
-        converter_class = self.converters.get(schema_type)
-        if converter_class is None:
-            raise NoSuchConverter
-        converter = converter_class(self)
-        converted = converter(schema_node)
+        pending = self._pending
+        queued = len(pending)
+        self._convert_node(schema_node, converted)
+        outputs = self._outputs
+        for sub_node, sub_converted, depth in pending[queued:]:
+            if depth is not None:
+                outputs[id(sub_converted)] = self.make_outputs(sub_converted)
+        targets = outputs[id(converted)]
+        in_place = self._in_place
+        # copy before the conversion is rewritten in place
+        for index, dialect in enumerate(self.dialects):
+            if index != in_place:
+                _emit_dialect(converted, dialect, outputs, index,
+                              targets[index])
+        _emit_dialect(converted, self.dialects[in_place], outputs)
         return converted
 
+    def dialect_conversions(self, converted):
+        """
+        The conversions in each dialect of the tree converted by the last
+        call, ``converted`` being its draft-04 conversion, completed by
+        :meth:`colander_jsonschema.dialects.Dialect.finalize`.
+
+        :type converted: dict
+        :rtype: list
+        """
+        outputs = self._outputs
+        self._outputs = {}
+        results = outputs[id(converted)]
+        definitions = converted.get('definitions')
+        if definitions is not None:
+            for index, result in enumerate(results):
+                if result is not converted:
+                    result['definitions'] = collections.OrderedDict(
+                        (name, outputs[id(definition)][index])
+                        for name, definition in definitions.items())
+        return [dialect.finalize(result)
+                for dialect, result in zip(self.dialects, results)]
+
+    def get_converter(self, schema_type):
+        """
+        Converter of ``schema_type``, instantiated once per dispatcher.
+
+        :type schema_type: type
+        :rtype: TypeConverter
+        """
+        converter = self._instances.get(schema_type)
+        if converter is None:
+            converter_class = self.converters.resolve(schema_type)
+            if converter_class is None:
+                raise NoSuchConverter
+            converter = self._bound.get(converter_class)
+            if converter is None:
+                converter = converter_class(self)
+                self._bound[converter_class] = converter
+                if _converts_eagerly(converter_class):
+                    self._eager_converters.add(converter)
+            self._instances[schema_type] = converter
+        return converter
+
+    def convert_shallow(self, schema_node, converted):
+        """
+        Fill ``converted`` with the conversion of ``schema_node`` alone and
+        return the ``(sub_node, converted)`` pairs standing for its
+        sub-nodes, still empty, for the caller to convert.  Converters
+        overriding ``convert_type()`` or ``__call__()``, which may read the
+        conversions of the sub-nodes, convert the whole subtree at once
+        instead, as in a walk, and no pairs are returned.
+
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :rtype: list
+        """
+        converter = self.get_converter(type(schema_node.typ))
+        pending = self._pending = []
+        self._depth = 0
+        self._eager = converter in self._eager_converters
+        self._seen = set([id(schema_node)])
+        self._walk_convert = self.convert_node
+        try:
+            self.convert_node(schema_node, converted)
+        finally:
+            self._pending = None
+            self._eager = False
+            self._seen = set()
+        return [(node, target) for node, target, depth in pending]
+
+    def exit_node(self, schema_node, converted):
+        """
+        Called with the completed conversion of every node, children first,
+        when ``post_order`` is set.
+
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        """
+
 
 def finalize_conversion(converted):
     """
@@ -314,13 +1133,1709 @@ def finalize_conversion(converted):
     return converted
 
 
-def convert(schema_node, converters=None):
+# members holding schemas: mappings, lists, or schemas of schemas
+_schema_mappings = frozenset(['properties', 'patternProperties',
+                              'definitions'])
+_schema_lists = frozenset(['items', 'allOf', 'anyOf', 'oneOf'])
+_schema_values = frozenset(['items', 'additionalProperties', 'not'])
+
+
+def _emit_dialect(converted, dialect, outputs, index=None, target=None):
     """
-    :type schema_node: colander.SchemaNode
-    :type converters: dict
+    Rewrite the conversion of a node for ``dialect`` in place or, given
+    the ``index`` of the dialect, copy it into ``target`` with the sub-node
+    conversions of the dialect found in ``outputs``.  Schemas nested in the
+    node itself, e.g. references, are rewritten too.
+
+    :type converted: dict
+    :type dialect: colander_jsonschema.dialects.Dialect
+    :type outputs: dict
+    :type index: int
+    :type target: dict
     :rtype: dict
     """
-    dispatcher = TypeConversionDispatcher(converters)
-    converted = dispatcher(schema_node)
-    converted = finalize_conversion(converted)
-    return converted
+    copy = target is not None
+    if not copy:
+        target = converted
+
+    def emit(schema):
+        sub_outputs = outputs.get(id(schema))
+        if sub_outputs is not None:
+            # a sub-node, emitted on its own
+            return sub_outputs[index] if copy else schema
+        return _emit_dialect(schema, dialect, outputs, index,
+                             {} if copy else None)
+
+    for key, value in converted.items():
+        if key in _schema_mappings:
+            if not copy:
+                for schema in value.values():
+                    emit(schema)
+                continue
+            value = value.__class__((name, emit(schema))
+                                    for name, schema in value.items())
+        elif key in _schema_lists and isinstance(value, list):
+            value = [emit(schema) for schema in value]
+        elif key in _schema_values and isinstance(value, dict):
+            value = emit(value)
+        elif isinstance(value, list) and copy:
+            value = list(value)
+        if copy:
+            target[key] = value
+    dialect.rewrite(target)
+    return target
+
+
+_primitive_types = tuple(set([bool, float, int, type(2 ** 64), bytes,
+                             type(u''), type(None)]))
+_identity_types = (type, types.FunctionType, types.BuiltinFunctionType,
+                   types.MethodType)
+
+
+def _freeze(value, seen=None):
+    """
+    Build a hashable, structural representation of ``value``.
+
+    :type value: object
+    :type seen: set
+    :rtype: tuple
+    """
+    if isinstance(value, _primitive_types):
+        return type(value), value
+    if isinstance(value, _identity_types):
+        return value
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return type(value), id(value)
+    seen.add(id(value))
+    try:
+        if isinstance(value, dict):
+            items = [(_freeze(k, seen), _freeze(v, seen))
+                     for k, v in value.items()]
+            return dict, tuple(sorted(items, key=repr))
+        if isinstance(value, (list, tuple)):
+            return type(value), tuple(_freeze(v, seen) for v in value)
+        if isinstance(value, (set, frozenset)):
+            return type(value), frozenset(_freeze(v, seen) for v in value)
+        if isinstance(value, type(re.compile(''))):
+            return type(value), value.pattern, value.flags
+        if hasattr(value, '__dict__'):
+            return type(value), _freeze(vars(value), seen)
+    finally:
+        seen.discard(id(value))
+    try:
+        hash(value)
+    except TypeError:
+        return type(value), id(value)
+    return value
+
+
+def _leaf_key(converted):
+    """
+    Hashable representation of the conversion of a leaf node, cheaper than
+    :func:`_freeze` for flat dicts.
+
+    :type converted: dict
+    :rtype: frozenset
+    """
+    items = []
+    for key, value in converted.items():
+        if isinstance(value, _primitive_types):
+            # 1, 1.0 and True are equal but not interchangeable
+            value = type(value), value
+        elif type(value) is list and all(
+                type(v) in _leaf_list_types for v in value):
+            value = list, tuple(value)
+        else:
+            value = _freeze(value)
+        items.append((key, value))
+    return frozenset(items)
+
+
+_leaf_list_types = frozenset([type(u''), str])
+_close_tuple = object()
+
+
+def _stable_digest(value):
+    """
+    SHA-1 hex digest of a key built by :func:`_freeze`, stable across
+    processes (unlike ``hash()``).
+
+    :type value: object
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    stack = [value]
+    while stack:
+        value = stack.pop()
+        if value is _close_tuple:
+            token = b')'
+        elif isinstance(value, tuple):
+            token = b'('
+            stack.append(_close_tuple)
+            stack.extend(reversed(value))
+        elif isinstance(value, frozenset):
+            token = ('{%s}' % ','.join(sorted(_stable_digest(v)
+                                              for v in value))).encode()
+        elif isinstance(value, _identity_types):
+            token = ('T%s.%s' % (value.__module__,
+                                 getattr(value, '__qualname__',
+                                         value.__name__))).encode()
+        elif isinstance(value, type(u'')):
+            token = b'S' + json.dumps(value).encode('ascii')
+        elif isinstance(value, bytes):
+            token = b'B' + binascii.hexlify(value)
+        elif isinstance(value, float):
+            token = b'V' + repr(value).encode('ascii')
+        elif isinstance(value, _primitive_types):
+            token = b'V' + str(value).encode('ascii')
+        else:
+            token = b'R' + repr(value).encode('utf-8')
+        digest.update(token + b';')
+    return digest.hexdigest()
+
+
+def _annotations_key(schema_node):
+    """
+    :type schema_node: colander.SchemaNode
+    :rtype: tuple
+    """
+    return (_freeze(schema_node.title), _freeze(schema_node.description),
+            _freeze(schema_node.default))
+
+
+class _StructureIndex(object):
+    """
+    Structural keys of every node of a schema tree.
+
+    A node key covers what its conversion depends on except its own name
+    and annotations, which belong to the key of its parent; equal keys
+    mean equal conversions.  The tree is walked with an explicit stack,
+    visiting shared nodes once, and references back to an ancestor make
+    the ancestor ``recursive`` instead of looping.
+    """
+
+    def __init__(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        """
+        self.keys = {}
+        self.nodes = {}
+        self.recursive = set()
+        path_depths = {}
+        depth = 0
+        stack = [(schema_node, False)]
+        while stack:
+            node, expanded = stack.pop()
+            node_id = id(node)
+            if not expanded:
+                if node_id in self.nodes:
+                    continue
+                self.nodes[node_id] = node
+                path_depths[node_id] = depth
+                depth += 1
+                stack.append((node, True))
+                for sub_node in reversed(node.children):
+                    sub_id = id(sub_node)
+                    if sub_id in path_depths:
+                        self.recursive.add(sub_id)
+                    elif sub_id not in self.nodes:
+                        stack.append((sub_node, False))
+                continue
+            depth -= 1
+            children = []
+            for sub_node in node.children:
+                sub_id = id(sub_node)
+                if sub_id in path_depths:
+                    sub_key = ('recursion', depth - path_depths[sub_id])
+                else:
+                    sub_key = self.keys[sub_id]
+                children.append((sub_node.name, _annotations_key(sub_node),
+                                 sub_key))
+            self.keys[node_id] = (
+                _freeze(node.typ),
+                node.required,
+                _freeze(node.validator),
+                tuple(children),
+            )
+            del path_depths[node_id]
+
+
+def _text_token(value):
+    """
+    :type value: str
+    :rtype: str
+    """
+    # the length keeps separators in the text unambiguous
+    return u'S%d:%s' % (len(value), value)
+
+
+_pattern_type = type(re.compile(''))
+_function_types = (types.FunctionType, types.BuiltinFunctionType,
+                   types.MethodType)
+# attribute values whose equality implies equal encodings
+_atom_types = frozenset([
+    type(None), bool, int, type(2 ** 64), float, str, type(u''), bytes,
+    translationstring.TranslationString, _pattern_type])
+# atoms only equal to atoms encoded alike
+_text_types = frozenset([
+    type(None), str, type(u''), bytes, translationstring.TranslationString,
+    _pattern_type])
+_recent_size = 4
+# most members of a subtree included in the text of its parent
+_inline_size = 1024
+
+
+def _content_key(value_type, attributes):
+    """
+    Hashable key of the objects of ``value_type`` with ``attributes`` equal
+    to these, if their values are atoms or lists and tuples of atoms, else
+    ``None``.
+
+    :type value_type: type
+    :type attributes: dict
+    :rtype: tuple
+    """
+    values = tuple(attributes.values())
+    value_types = tuple(map(type, values))
+    if not _atom_types.issuperset(value_types):
+        values = list(values)
+        for index, value in enumerate(values):
+            if type(value) in _atom_types:
+                continue
+            if type(value) not in (list, tuple):
+                return None
+            element_types = tuple(map(type, value))
+            if not _atom_types.issuperset(element_types):
+                return None
+            values[index] = tuple(value), element_types
+        values = tuple(values)
+    return value_type, tuple(attributes), values, value_types
+
+
+class _CanonicalEncoder(object):
+    """
+    Canonical text of values as converters interpret them: lists and
+    tuples alike, dicts and sets in sorted order, ``colander.All``
+    flattened, objects by class and attributes, functions by name.  Unlike
+    :func:`_freeze`, it does not depend on the process or Python version.
+
+    The encoding method of each class is memoized by the instance, and so
+    is the text of the objects already encoded: by content for the objects
+    whose attributes are atoms, or lists of atoms, e.g. the types and most
+    validators of equal nodes, by identity for the others.  The members
+    of nodes besides their names, titles and descriptions are listed once
+    as kinds, the last few of each type class matched without encoding.
+    """
+
+    def __init__(self):
+        self.encoders = {
+            type(None): lambda value: u'N',
+            bool: lambda value: u'T' if value else u'F',
+            int: self.encode_integer,
+            type(2 ** 64): self.encode_integer,
+            float: lambda value: u'D%r' % value,
+            # native strings of Python 2 are text too
+            str: _text_token,
+            type(u''): _text_token,
+            list: self.encode_sequence,
+            tuple: self.encode_sequence,
+            dict: self.encode_mapping,
+            set: self.encode_set,
+            frozenset: self.encode_set,
+        }
+        if bytes is not str:
+            self.encoders[bytes] = (
+                lambda value: u'B' + binascii.hexlify(value).decode('ascii'))
+        self.memo = {}
+        self.prefixes = {}
+        self.schema_classes = {}
+        # members of nodes by index, in the order they were met
+        self.kinds = []
+        self.kind_indexes = {}
+        # class of types: the members and kinds of the last nodes of one
+        self.last_kinds = {}
+        # class: the attributes and text of its last objects of atoms
+        self.recent = {}
+        # classes of the validators of a colander.All: the last ones
+        self.recent_all = {}
+
+    def __call__(self, value):
+        """
+        :type value: object
+        :rtype: str
+        """
+        encode = self.encoders.get(type(value))
+        if encode is None:
+            encode = self.encoders[type(value)] = self.find_encoder(
+                type(value))
+        return encode(value)
+
+    def find_encoder(self, value_type):
+        """
+        :type value_type: type
+        :rtype: callable
+        """
+        if issubclass(value_type, type):
+            return self.encode_class
+        if issubclass(value_type, _function_types):
+            return self.encode_function
+        if value_type is colander.All:
+            return self.encode_all
+        if issubclass(value_type, _pattern_type):
+            return self.encode_pattern
+        for base in (bool, int, type(2 ** 64), float, type(u''), str,
+                     bytes, list, tuple, dict, set, frozenset):
+            if issubclass(value_type, base):
+                return self.encoders[base]
+        return self.encode_object
+
+    def encode_integer(self, value):
+        return u'I%d' % value
+
+    def encode_class(self, value):
+        return u'C%s.%s' % (value.__module__, value.__name__)
+
+    def encode_function(self, value):
+        function = getattr(value, '__func__', value)
+        encoded = u'F%s.%s' % (function.__module__, function.__name__)
+        code = getattr(function, '__code__', None)
+        if code is not None and function.__name__ == '<lambda>':
+            # lambdas of a module are told apart by their line
+            encoded += u'@%d' % code.co_firstlineno
+        return encoded
+
+    def encode_all(self, value):
+        validators = _flatten_all_validator(value)
+        classes = tuple(map(type, validators))
+        last = self.recent_all.get(classes)
+        if last is not None:
+            # the last validators of the classes, compared like them
+            snapshots, checks, encoded = last
+            try:
+                attributes = [v.__dict__ for v in validators]
+                if attributes == snapshots:
+                    for index, check in checks:
+                        if check != tuple(map(type,
+                                              attributes[index].values())):
+                            break
+                    else:
+                        return encoded
+            except Exception:
+                pass
+        encoders = self.encoders
+        tokens = []
+        last = []
+        for v_type, v in zip(classes, validators):
+            token = encoders[v_type](v) if v_type in encoders else self(v)
+            tokens.append(token)
+            recent = self.recent.get(v_type)
+            if last is not None and recent and recent[0][2] == token:
+                last.append(recent[0])
+            else:
+                # e.g. functions, or objects of other objects
+                last = None
+        encoded = u'A[' + u','.join(tokens) + u']'
+        if last is not None:
+            self.recent_all[classes] = (
+                [snapshot for snapshot, check, token in last],
+                [(index, check) for index, (snapshot, check, token)
+                 in enumerate(last) if check is not None], encoded)
+        return encoded
+
+    def encode_pattern(self, value):
+        # patterns of text are always unicode in Python 3
+        return u'P%s/%d' % (self(value.pattern), value.flags & ~re.UNICODE)
+
+    def encode_sequence(self, value):
+        key = id(value)
+        encoded = self.memo.get(key)
+        if encoded is None:
+            # a reference cycle
+            self.memo[key] = u'[...]'
+            encoded = self.memo[key] = (
+                u'[' + u','.join([self(v) for v in value]) + u']')
+        return encoded
+
+    def encode_mapping(self, value):
+        key = id(value)
+        encoded = self.memo.get(key)
+        if encoded is None:
+            self.memo[key] = u'{...}'
+            encoded = self.memo[key] = u'{' + u','.join(sorted([
+                self(k) + u':' + self(v) for k, v in value.items()])) + u'}'
+        return encoded
+
+    def encode_set(self, value):
+        return u'<' + u','.join(sorted([self(v) for v in value])) + u'>'
+
+    def encode_object(self, value):
+        value_type = type(value)
+        attributes = getattr(value, '__dict__', None)
+        if not attributes:
+            prefix = self.prefixes.get(value_type)
+            if prefix is None:
+                prefix = self.prefixes[value_type] = self.prefix(value_type)
+                if attributes is not None:
+                    self.recent[value_type] = [({}, None, prefix)]
+            return prefix
+        recent = self.recent.get(value_type)
+        if recent:
+            try:
+                for snapshot, value_types, encoded in recent:
+                    if attributes == snapshot and (
+                            value_types is None or value_types == tuple(
+                                map(type, attributes.values()))):
+                        return encoded
+            except Exception:
+                # e.g. attributes without a truth value for ==
+                pass
+        memo = self.memo
+        key = _content_key(value_type, attributes)
+        if key is None:
+            key = id(value)
+        encoded = memo.get(key)
+        if encoded is None:
+            prefix = self.prefixes.get(value_type)
+            if prefix is None:
+                prefix = self.prefixes[value_type] = self.prefix(value_type)
+            # a reference cycle is encoded by the class of the object
+            memo[key] = prefix
+            # attribute names are identifiers, sorted without encoding them
+            encoded = memo[key] = prefix + u'{' + u','.join([
+                u'%s:%s' % (name, self(attribute))
+                for name, attribute in sorted(attributes.items())]) + u'}'
+        if type(key) is tuple:
+            self.remember(key, attributes, encoded)
+        return encoded
+
+    def remember(self, key, attributes, encoded):
+        """
+        Keep the text of an object of atoms among the last ones of its
+        class, found by comparing attributes rather than by key.
+
+        :type key: tuple
+        :type attributes: dict
+        :type encoded: str
+        """
+        value_type, names, values, value_types = key
+        if _text_types.issuperset(value_types) or all(
+                _text_types.issuperset(value[1])
+                if type(value) is tuple else type(value) in _text_types
+                for value in values):
+            # equal attributes are encoded alike
+            check = None
+        elif _atom_types.issuperset(value_types):
+            # but 1, 1.0 and True are equal, their types are compared
+            check = value_types
+        else:
+            return
+        recent = self.recent.setdefault(value_type, [])
+        recent.insert(0, (dict(attributes), check, encoded))
+        del recent[_recent_size:]
+
+    def prefix(self, value_type):
+        """
+        :type value_type: type
+        :rtype: str
+        """
+        return u'O%s.%s' % (value_type.__module__, value_type.__name__)
+
+    def node_kind(self, node):
+        """
+        Index in :attr:`kinds` of the members of ``node`` many nodes share:
+        the name of its class, its required flag, and the texts of its
+        type, default and validator.
+
+        :type node: colander.SchemaNode
+        :rtype: int
+        """
+        typ = node.typ
+        default = node.default
+        validator = node.validator
+        missing = node.missing
+        node_class = type(node)
+        last_kinds = self.last_kinds.get(type(typ), ())
+        try:
+            # the kind of one of the last nodes of the type class
+            attributes = typ.__dict__
+            for (last_class, last_default, last_validator, last_missing,
+                 snapshot, check, index) in last_kinds:
+                if (last_class is node_class and last_default is default and
+                        last_missing is missing and snapshot == attributes and
+                        (check is None or
+                         check == tuple(map(type, attributes.values()))) and
+                        (last_validator is validator or
+                         type(last_validator) is type(validator) and
+                         self(validator) == self.kinds[index][4])):
+                    return index
+        except Exception:
+            # attributes without a truth value for ==
+            pass
+        class_name = self.schema_classes.get(node_class)
+        if class_name is None:
+            # deduplicated conversions name and share nodes by class
+            class_name = self.schema_classes[node_class] = u'%s.%s' % (
+                node_class.__module__,
+                getattr(node_class, '__qualname__', node_class.__name__))
+        typ_token = self(typ)
+        kind = (
+            class_name,
+            # node.required, without the call of a property
+            missing is colander.required or isinstance(
+                missing, colander.deferred),
+            typ_token,
+            None if default is colander.null else self(default),
+            None if validator is None else self(validator),
+        )
+        index = self.kind_indexes.get(kind)
+        if index is None:
+            index = self.kind_indexes[kind] = len(self.kinds)
+            self.kinds.append(kind)
+        recent = self.recent.get(type(typ))
+        if recent and recent[0][2] == typ_token:
+            # types of atoms, compared like their last type
+            last_kinds = self.last_kinds.setdefault(type(typ), [])
+            last_kinds.insert(0, (node_class, default, validator, missing,
+                                  recent[0][0], recent[0][1], index))
+            del last_kinds[_recent_size:]
+        return index
+
+    def json_default(self, value):
+        """
+        JSON value of the names, titles and descriptions JSON has no value
+        for.
+
+        :type value: object
+        :rtype: list
+        """
+        return [self(value)]
+
+
+def fingerprint(schema_node):
+    """
+    Hex digest of what the conversion of the tree below ``schema_node``
+    depends on: the classes, types, names, required flags, titles,
+    descriptions, defaults and validators of its nodes, and their order.
+    Equal trees, e.g. ``clone()``-d ones, have the same fingerprint in any
+    process and Python version, e.g. to tell whether a schema changed
+    without converting it.  Schema classes are identified by module and
+    qualified name, the names deduplicated conversions depend on,
+    functions by module and name, objects by class and attributes.
+
+    Only these members are collected, in a flat list serialized as JSON
+    once: for each node in pre-order its kind, name, title, description
+    and number of sub-nodes.  Kinds, the class, required flag, type,
+    default and validator of nodes, are encoded once per content and
+    listed once.  The members of shared subtrees are collected once, and
+    a subtree of more than a thousand members is replaced by its digest,
+    so the text hashed stays linear in the size of the tree.  References
+    back to an ancestor are encoded by their negated distance to it.
+
+    :type schema_node: colander.SchemaNode
+    :rtype: str
+    """
+    encoder = _CanonicalEncoder()
+    node_kind = encoder.node_kind
+    dumps = json.JSONEncoder(
+        separators=(',', ':'), check_circular=False,
+        default=encoder.json_default).encode
+    sha1 = hashlib.sha1
+    last_kinds = encoder.last_kinds
+    out = []
+    # id of subtrees: the first member in out of ancestors, the members of
+    # the others and the number of cuts then
+    states = {}
+    # id of ancestors
+    opened = []
+    # first members of the subtrees replaced by their digest, in order
+    cuts = []
+    stack = [iter([schema_node])]
+    while stack:
+        for node in stack[-1]:
+            children = node.children
+            if children:
+                node_id = id(node)
+                state = states.get(node_id)
+                if state is not None:
+                    if state.__class__ is not tuple:
+                        # an ancestor, by its distance
+                        out.append(opened.index(node_id) - len(opened))
+                        continue
+                    start, end, known_cuts = state
+                    if (known_cuts == len(cuts) or
+                            min(cuts[known_cuts:]) > start):
+                        out.extend(out[start:end])
+                        continue
+            typ = node.typ
+            try:
+                # the kind of the last node of the type class, without a call
+                last = last_kinds[type(typ)][0]
+                same = (last[0] is type(node) and last[1] is node.default and
+                        last[2] is node.validator and
+                        last[3] is node.missing and last[5] is None and
+                        last[4] == typ.__dict__)
+            except Exception:
+                same = False
+            kind = last[6] if same else node_kind(node)
+            if not children:
+                out += (kind, node.name, node.title, node.description, 0)
+                continue
+            states[node_id] = len(out)
+            opened.append(node_id)
+            out += (kind, node.name, node.title, node.description,
+                    len(children))
+            stack.append(iter(children))
+            break
+        else:
+            stack.pop()
+            if not opened:
+                continue
+            # the end of a subtree
+            node_id = opened.pop()
+            start = states[node_id]
+            if len(out) - start > _inline_size:
+                digest = sha1(dumps(out[start:]).encode('ascii')).hexdigest()
+                del out[start:]
+                out.append(digest)
+                cuts.append(start)
+            states[node_id] = start, len(out), len(cuts)
+    return sha1(dumps([encoder.kinds, out]).encode('ascii')).hexdigest()
+
+
+_generic_schema_classes = (
+    colander.SchemaNode,
+    colander.MappingSchema,
+    colander.SequenceSchema,
+    colander.TupleSchema,
+)
+
+
+class DeduplicatingDispatcher(TypeConversionDispatcher):
+    """
+    Emits subtrees occurring more than once, and recursive ones, once under
+    ``definitions`` and refers to them with ``$ref``.
+
+    With ``dedup='structure'`` subtrees are shared when they convert equally,
+    with ``dedup='class'`` when they are instances of the same schema class
+    (only recursive nodes of generic classes are shared).  Titles,
+    descriptions and defaults stay at the referring site.
+    """
+
+    annotations = ('title', 'description', 'default')
+
+    def __init__(self, converters=None, dedup='structure', observer=None,
+                 dialects=None):
+        """
+        :type converters: dict
+        :type dedup: str
+        :type observer: ConversionObserver
+        :type dialects: list
+        """
+        if dedup not in ('structure', 'class'):
+            raise ValueError('unknown dedup mode: %r' % (dedup,))
+        super(DeduplicatingDispatcher, self).__init__(converters, observer,
+                                                      dialects=dialects)
+        self.dedup = dedup
+        self.definitions = collections.OrderedDict()
+        self.references = {}
+        self.reference_counts = collections.Counter()
+        self._definition_ids = set()
+        self._share_keys = None
+
+    def __call__(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        if self._pending is None:
+            return self.walk(schema_node)
+        key = self._share_keys.get(id(schema_node))
+        if key is None:
+            return super(DeduplicatingDispatcher, self).__call__(schema_node)
+        ref = self.references.get(key)
+        if ref is None:
+            name = self.make_name(schema_node)
+            ref = self.references[key] = '#/definitions/' + name
+            converted = super(DeduplicatingDispatcher,
+                              self).__call__(schema_node)
+            self.definitions[name] = converted
+            self._definition_ids.add(id(converted))
+        self.reference_counts[ref] += 1
+        return self.make_reference(schema_node, ref)
+
+    def walk(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        self.prepare(schema_node)
+        try:
+            converted = super(DeduplicatingDispatcher,
+                              self).walk(schema_node)
+        finally:
+            self._share_keys = None
+        if self.definitions:
+            converted['definitions'] = self.definitions
+        return converted
+
+    def iter_walk(self, schema_node, step=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type step: int
+        :rtype: generator
+        """
+        self.prepare(schema_node)
+        try:
+            for converted in super(DeduplicatingDispatcher,
+                                   self).iter_walk(schema_node, step):
+                if converted is None:
+                    yield converted
+        finally:
+            self._share_keys = None
+        if self.definitions:
+            converted['definitions'] = self.definitions
+        yield converted
+
+    def prepare(self, schema_node):
+        """
+        Forget the previous walk and find the nodes of ``schema_node`` to
+        share.
+
+        :type schema_node: colander.SchemaNode
+        """
+        self.definitions.clear()
+        self.references.clear()
+        self.reference_counts.clear()
+        self._definition_ids = set()
+        self._share_keys = self.find_shared(schema_node)
+        key = self._share_keys.get(id(schema_node))
+        if key is not None:
+            self.references[key] = '#'
+
+    def convert_node(self, schema_node, converted):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :rtype: dict
+        """
+        converted = super(DeduplicatingDispatcher,
+                          self).convert_node(schema_node, converted)
+        if id(converted) in self._definition_ids:
+            for annotation in self.annotations:
+                converted.pop(annotation, None)
+        return converted
+
+    def share_key(self, index, schema_node):
+        """
+        :type index: _StructureIndex
+        :type schema_node: colander.SchemaNode
+        :rtype: tuple
+        """
+        node_id = id(schema_node)
+        if not schema_node.children:
+            return None
+        if self.dedup == 'structure':
+            return index.keys[node_id]
+        schema_class = type(schema_node)
+        if schema_class not in _generic_schema_classes:
+            return (schema_class, _freeze(schema_node.typ),
+                    schema_node.required, _freeze(schema_node.validator))
+        if node_id in index.recursive:
+            return 'recursive', node_id
+        return None
+
+    def find_shared(self, schema_node):
+        """
+        Share keys, by node id, of the nodes to emit under ``definitions``.
+
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        index = _StructureIndex(schema_node)
+        keys = dict((node_id, self.share_key(index, node))
+                    for node_id, node in index.nodes.items())
+        counts = collections.Counter()
+        for node in index.nodes.values():
+            for sub_node in node.children:
+                counts[keys[id(sub_node)]] += 1
+        recursive = set(keys[node_id] for node_id in index.recursive)
+        shared = set(key for key, count in counts.items() if count > 1)
+        shared.update(recursive)
+        shared.discard(None)
+        # count occurrences again, expanding each shared subtree only once,
+        # so subtrees only repeated inside a shared one are inlined
+        counts.clear()
+        root_key = keys[id(schema_node)]
+        expanded = set([root_key])
+        counts[root_key] += 1
+        stack = [schema_node]
+        while stack:
+            node = stack.pop()
+            for sub_node in node.children:
+                key = keys[id(sub_node)]
+                if key in shared:
+                    counts[key] += 1
+                    if key in expanded:
+                        continue
+                    expanded.add(key)
+                stack.append(sub_node)
+        shared = set(key for key in shared
+                     if counts[key] > 1 or key in recursive)
+        return dict((node_id, key) for node_id, key in keys.items()
+                    if key in shared)
+
+    def make_name(self, schema_node, taken=None):
+        """
+        A name for the definition of ``schema_node`` not in ``taken``,
+        ``definitions`` by default.
+
+        :type schema_node: colander.SchemaNode
+        :type taken: set
+        :rtype: str
+        """
+        if taken is None:
+            taken = self.definitions
+        schema_class = type(schema_node)
+        if schema_class not in _generic_schema_classes:
+            base = schema_class.__name__
+        else:
+            base = ''.join(part.capitalize()
+                           for part in schema_node.name.split('_'))
+        base = re.sub(r'[^0-9A-Za-z_]', '', base) or 'Definition'
+        name = base
+        suffix = 2
+        while name in taken:
+            name = '%s%d' % (base, suffix)
+            suffix += 1
+        return name
+
+    def make_reference(self, schema_node, ref):
+        """
+        :type schema_node: colander.SchemaNode
+        :type ref: str
+        :rtype: dict
+        """
+        reference = {'$ref': ref}
+        converted = {}
+        if schema_node.title:
+            converted['title'] = schema_node.title
+        if schema_node.description:
+            converted['description'] = schema_node.description
+        if schema_node.default is not colander.null:
+            converted['default'] = schema_node.default
+        if not converted:
+            return reference
+        # draft-04 ignores members next to ``$ref``
+        converted['allOf'] = [reference]
+        return converted
+
+
+def _copy_converted(converted):
+    """
+    Copy the dict/list containers of a converted schema.
+
+    :type converted: dict
+    :rtype: dict
+    """
+    copied = dict(converted)
+    stack = [copied]
+    while stack:
+        container = stack.pop()
+        if isinstance(container, dict):
+            keys = container.keys()
+        else:
+            keys = range(len(container))
+        for key in keys:
+            value = container[key]
+            if isinstance(value, dict):
+                value = container[key] = dict(value)
+                stack.append(value)
+            elif isinstance(value, list):
+                value = container[key] = list(value)
+                stack.append(value)
+    return copied
+
+
+def _contains_node(schema_node, target):
+    """
+    Whether ``target`` is ``schema_node`` or one of its descendants.
+
+    :type schema_node: colander.SchemaNode
+    :type target: colander.SchemaNode
+    :rtype: bool
+    """
+    seen = set()
+    stack = [schema_node]
+    while stack:
+        node = stack.pop()
+        if node is target:
+            return True
+        if id(node) not in seen:
+            seen.add(id(node))
+            stack.extend(node.children)
+    return False
+
+
+class ConversionCache(object):
+    """
+    Bounded LRU cache of converted schemas.
+
+    Entries are keyed on the :func:`fingerprint` of the schema tree and on
+    the custom converters, and are copied on read and on write, so callers
+    may freely mutate what :func:`convert` returns.
+
+    The fingerprint of a schema node is computed once, on its first
+    lookup; after modifying a node, :meth:`invalidate` it, which also
+    forgets the fingerprints of the trees containing it.  ``clone()``-d or
+    equally built trees share the entries.
+    """
+
+    def __init__(self, maxsize=128):
+        """
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = collections.OrderedDict()
+        # schema nodes: their fingerprints
+        self._fingerprints = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def make_key(self, schema_node, converters=None, dedup=None,
+                 dialect=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        :type dedup: str
+        :type dialect: str
+        :rtype: tuple
+        """
+        if converters:
+            converters = frozenset(converters.items())
+        else:
+            converters = None
+        with self._lock:
+            structure = self._fingerprints.get(schema_node)
+        if structure is None:
+            structure = fingerprint(schema_node)
+            with self._lock:
+                self._fingerprints[schema_node] = structure
+        key = structure, converters, dedup or None
+        if dialect is not None:
+            dialect = get_dialect(dialect)
+            if dialect.name != 'draft-04':
+                key += (dialect.name,)
+        return key
+
+    def get(self, key):
+        """
+        :type key: tuple
+        :rtype: dict
+        """
+        with self._lock:
+            converted = self._entries.pop(key, None)
+            if converted is None:
+                self.misses += 1
+                return None
+            self._entries[key] = converted
+            self.hits += 1
+        return _copy_converted(converted)
+
+    def set(self, key, converted):
+        """
+        :type key: tuple
+        :type converted: dict
+        """
+        converted = _copy_converted(converted)
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = converted
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, schema_node=None, converters=None, dedup=None,
+                   dialect=None):
+        """
+        Drop the entry for ``schema_node`` in ``dialect``, or in every
+        dialect if omitted, and forget its fingerprint and those of the
+        trees containing it; drop every entry if ``schema_node`` is
+        omitted.
+
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        :type dedup: str
+        :type dialect: str
+        """
+        if schema_node is None:
+            self.clear()
+            return
+        if dialect is not None:
+            self.discard(self.make_key(schema_node, converters, dedup,
+                                       dialect))
+        else:
+            # the keys of the other dialects extend the draft-04 key
+            key = self.make_key(schema_node, converters, dedup)
+            with self._lock:
+                for entry in [k for k in self._entries
+                              if k[:len(key)] == key]:
+                    del self._entries[entry]
+        with self._lock:
+            roots = list(self._fingerprints.keys())
+        stale = [root for root in roots
+                 if _contains_node(root, schema_node)]
+        with self._lock:
+            for root in stale:
+                self._fingerprints.pop(root, None)
+
+    def discard(self, key):
+        """
+        :type key: tuple
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+def _make_dispatcher(converters=None, dedup=None, observer=None,
+                     compact=False, dialects=None):
+    """
+    :type converters: dict
+    :type dedup: str
+    :type observer: ConversionObserver
+    :type compact: bool
+    :type dialects: list
+    :rtype: TypeConversionDispatcher
+    """
+    if dedup:
+        if compact:
+            raise ConversionError('deduplicated conversions are not '
+                                  'compacted')
+        if dedup is True:
+            dedup = 'structure'
+        return DeduplicatingDispatcher(converters, dedup, observer, dialects)
+    return TypeConversionDispatcher(converters, observer, compact, dialects)
+
+
+_idle_dispatchers = []
+
+
+def _convert_plain(schema_node):
+    """
+    Convert ``schema_node`` without options, reusing an idle dispatcher of
+    the default converters, which holds no state between walks, instead of
+    setting one up per call.
+
+    :type schema_node: colander.SchemaNode
+    :rtype: dict
+    """
+    try:
+        dispatcher = _idle_dispatchers.pop()
+    except IndexError:
+        dispatcher = None
+    if (dispatcher is None or dispatcher.converters is not
+            TypeConversionDispatcher.default_registry()):
+        dispatcher = TypeConversionDispatcher()
+    converted = finalize_conversion(dispatcher(schema_node))
+    # a failed walk drops its dispatcher
+    _idle_dispatchers.append(dispatcher)
+    return converted
+
+
+def _replace_placeholders(converted, proxies):
+    """
+    Replace the placeholders of sub-nodes in ``converted`` by their proxies.
+
+    :type converted: dict
+    :type proxies: dict
+    """
+    stack = [converted]
+    while stack:
+        container = stack.pop()
+        if isinstance(container, dict):
+            keys = container.keys()
+        else:
+            keys = range(len(container))
+        for key in keys:
+            value = container[key]
+            proxy = proxies.get(id(value))
+            if proxy is not None:
+                container[key] = proxy
+            elif isinstance(value, (dict, list)):
+                stack.append(value)
+
+
+class LazySchema(Mapping):
+    """
+    Read-only converted schema of a node, converted on first access.  The
+    sub-nodes, e.g. the values of ``properties`` and ``items``, are
+    ``LazySchema`` too, so only the accessed branches are converted.  Custom
+    converters overriding ``convert_type()`` or ``__call__()`` convert
+    their whole subtree on first access.
+
+    :meth:`materialize` returns the plain dicts, e.g. for ``json.dumps()``.
+    """
+
+    __slots__ = ('schema_node', '_dispatcher', '_lock', '_root',
+                 '_converted')
+
+    def __init__(self, schema_node, dispatcher, lock=None, root=False):
+        """
+        :type schema_node: colander.SchemaNode
+        :type dispatcher: TypeConversionDispatcher
+        :type lock: threading.Lock
+        :type root: bool
+        """
+        self.schema_node = schema_node
+        self._dispatcher = dispatcher
+        self._lock = lock or threading.Lock()
+        self._root = root
+        self._converted = None
+
+    @property
+    def loaded(self):
+        """
+        Whether the node has been converted.
+
+        :rtype: bool
+        """
+        return self._converted is not None
+
+    def _load(self):
+        """
+        :rtype: dict
+        """
+        converted = self._converted
+        if converted is not None:
+            return converted
+        with self._lock:
+            if self._converted is None:
+                converted = {}
+                pairs = self._dispatcher.convert_shallow(self.schema_node,
+                                                         converted)
+                if pairs:
+                    _replace_placeholders(converted, dict(
+                        (id(placeholder),
+                         LazySchema(sub_node, self._dispatcher, self._lock))
+                        for sub_node, placeholder in pairs))
+                if self._root:
+                    converted = finalize_conversion(converted)
+                self._converted = converted
+        return self._converted
+
+    def __getitem__(self, key):
+        return self._load()[key]
+
+    def __iter__(self):
+        return iter(self._load())
+
+    def __len__(self):
+        return len(self._load())
+
+    def __repr__(self):
+        if self._converted is None:
+            return '<LazySchema %r (not converted)>' % (self.schema_node.name,)
+        return '<LazySchema %r %r>' % (self.schema_node.name,
+                                       self._converted)
+
+    def materialize(self):
+        """
+        Convert the whole subtree into plain dicts.
+
+        :rtype: dict
+        """
+        with self._lock:
+            converted = self._dispatcher(self.schema_node)
+        if self._root:
+            converted = finalize_conversion(converted)
+        return converted
+
+
+def _output_dialect(dialect):
+    """
+    The dialect to rewrite conversions into, None for draft-04.
+
+    :type dialect: str
+    :rtype: colander_jsonschema.dialects.Dialect
+    """
+    if dialect is None:
+        return None
+    dialect = get_dialect(dialect)
+    if dialect.name == 'draft-04':
+        return None
+    return dialect
+
+
+def _finish_conversion(dispatcher, converted):
+    """
+    :type dispatcher: TypeConversionDispatcher
+    :type converted: dict
+    :rtype: dict
+    """
+    if dispatcher.dialects:
+        return dispatcher.dialect_conversions(converted)[0]
+    return finalize_conversion(converted)
+
+
+def convert(schema_node, converters=None, cache=None, dedup=None,
+            lazy=False, observer=None, compact=False, dialect=None):
+    """
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :type cache: ConversionCache
+    :type dedup: str
+    :type lazy: bool
+    :type observer: ConversionObserver
+    :type compact: bool
+    :type dialect: str
+    :rtype: dict
+    """
+    if (cache is None and observer is None and
+            not (converters or dedup or lazy or compact or dialect)):
+        return _convert_plain(schema_node)
+    dialect = _output_dialect(dialect)
+    if lazy:
+        if cache is not None or dedup:
+            raise ConversionError('lazy conversions are neither cached '
+                                  'nor deduplicated')
+        if observer is not None or compact:
+            raise ConversionError('lazy conversions are neither observed '
+                                  'nor compacted')
+        if dialect is not None:
+            raise ConversionError('lazy conversions are in draft-04')
+        dispatcher = TypeConversionDispatcher(converters)
+        return LazySchema(schema_node, dispatcher, root=True)
+    if cache is not None:
+        key = cache.make_key(schema_node, converters, dedup, dialect)
+        converted = cache.get(key)
+        if converted is not None:
+            return converted
+    dispatcher = _make_dispatcher(converters, dedup, observer, compact,
+                                  dialect and [dialect])
+    converted = _finish_conversion(dispatcher, dispatcher(schema_node))
+    if cache is not None:
+        cache.set(key, converted)
+    return converted
+
+
+def convert_dialects(schema_node, dialects, converters=None, dedup=None,
+                     observer=None):
+    """
+    Convert ``schema_node`` in each of ``dialects`` with a single walk,
+    sharing the conversion of types and validators between them.
+
+    :type schema_node: colander.SchemaNode
+    :type dialects: list
+    :type converters: dict
+    :type dedup: str
+    :type observer: ConversionObserver
+    :rtype: collections.OrderedDict
+    """
+    dialects = [get_dialect(dialect) for dialect in dialects]
+    dispatcher = _make_dispatcher(converters, dedup, observer,
+                                  dialects=dialects)
+    converted = dispatcher.dialect_conversions(dispatcher(schema_node))
+    return collections.OrderedDict(
+        (dialect.name, result) for dialect, result in zip(dialects,
+                                                          converted))
+
+
+_PLAN_SLOT, _PLAN_LIST, _PLAN_SLOT_DICT, _PLAN_TEMPLATE = range(4)
+
+
+def _json_size(converted):
+    """
+    :type converted: dict
+    :rtype: int
+    """
+    return len(json.dumps(converted, sort_keys=True, separators=(',', ':'),
+                          default=repr))
+
+
+def deduplication_report(schema_node, converters=None, dedup='structure'):
+    """
+    Compare the serialized sizes of the inlined and the deduplicated
+    conversions of ``schema_node``.  ``inline_size`` is ``None`` for
+    recursive schemas, which cannot be inlined.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :type dedup: str
+    :rtype: dict
+    """
+    dispatcher = _make_dispatcher(converters, dedup)
+    size = _json_size(finalize_conversion(dispatcher(schema_node)))
+    inline_size = None
+    if not _StructureIndex(schema_node).recursive:
+        inline_size = _json_size(convert(schema_node, converters))
+    report = {
+        'size': size,
+        'inline_size': inline_size,
+        'saved': None,
+        'ratio': None,
+        'definitions': dict(
+            (ref.rsplit('/', 1)[-1], count)
+            for ref, count in dispatcher.reference_counts.items()
+            if ref != '#'),
+    }
+    if inline_size:
+        report['saved'] = inline_size - size
+        report['ratio'] = float(size) / inline_size
+    return report
+
+
+class _PlanSlot(object):
+
+    __slots__ = ('index',)
+
+    def __init__(self, index):
+        """
+        :type index: int
+        """
+        self.index = index
+
+
+def _instantiate(template, results):
+    """
+    :type template: object
+    :type results: list
+    :rtype: object
+    """
+    if isinstance(template, _PlanSlot):
+        return results[template.index]
+    if isinstance(template, dict):
+        return dict((k, _instantiate(v, results))
+                    for k, v in template.items())
+    if isinstance(template, list):
+        return [_instantiate(v, results) for v in template]
+    return template
+
+
+class _CompilingDispatcher(TypeConversionDispatcher):
+
+    post_order = True
+
+    def __init__(self, converters=None):
+        """
+        :type converters: dict
+        """
+        super(_CompilingDispatcher, self).__init__(converters)
+        self.steps = []
+        # conversions of the nodes, children first
+        self.exited = []
+        self._slots = {}
+
+    def exit_node(self, schema_node, converted):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        """
+        self.exited.append(converted)
+
+    def make_steps(self, converted):
+        """
+        Compile the conversions of the last walk, ``converted`` standing
+        for the root.  Converters reading their sub-nodes may modify them
+        after they exited, so the steps are made once the walk is over.
+
+        :type converted: dict
+        """
+        exited = self.exited
+        exited[-1] = converted
+        for index, node_converted in enumerate(exited):
+            self.steps.append(self.make_step(node_converted))
+            # ``exited`` keeps the ids from being reused while compiling
+            self._slots[id(node_converted)] = _PlanSlot(index)
+
+    def make_step(self, converted):
+        """
+        Split a converted node into a constant fragment, copied as a whole
+        on replay, and instructions for container values and sub-conversions.
+
+        :type converted: dict
+        :rtype: tuple
+        """
+        fragment = {}
+        dynamic = []
+        for key, value in converted.items():
+            if isinstance(value, (dict, list)):
+                dynamic.append((key,) + self.make_instruction(value))
+            else:
+                fragment[key] = value
+        return fragment, tuple(dynamic)
+
+    def make_instruction(self, value):
+        """
+        :type value: dict or list
+        :rtype: tuple
+        """
+        template = self.make_template(value)
+        if isinstance(template, _PlanSlot):
+            return _PLAN_SLOT, template.index
+        if isinstance(template, list) and not any(
+                isinstance(v, (_PlanSlot, dict, list)) for v in template):
+            return _PLAN_LIST, tuple(template)
+        if isinstance(template, dict) and all(
+                isinstance(v, _PlanSlot) for v in template.values()):
+            return _PLAN_SLOT_DICT, tuple((k, v.index)
+                                          for k, v in template.items())
+        return _PLAN_TEMPLATE, template
+
+    def make_template(self, value):
+        """
+        :type value: object
+        :rtype: object
+        """
+        if isinstance(value, dict):
+            slot = self._slots.get(id(value))
+            if slot is not None:
+                return slot
+            return dict((k, self.make_template(v)) for k, v in value.items())
+        if isinstance(value, list):
+            return [self.make_template(v) for v in value]
+        return value
+
+
+class ConversionPlan(object):
+    """
+    Precompiled emission program of a schema tree.
+
+    Nodes are stored flat in post-order, each as a constant fragment plus
+    instructions building its containers from constants and already emitted
+    sub-nodes, so emitting does not dispatch, instantiate converters nor
+    inspect validators.
+    """
+
+    def __init__(self, steps):
+        """
+        :type steps: list
+        """
+        self.steps = tuple(steps)
+
+    def __len__(self):
+        return len(self.steps)
+
+    def __call__(self):
+        """
+        :rtype: dict
+        """
+        results = []
+        for fragment, dynamic in self.steps:
+            converted = dict(fragment)
+            for key, op, arg in dynamic:
+                if op == _PLAN_SLOT:
+                    converted[key] = results[arg]
+                elif op == _PLAN_LIST:
+                    converted[key] = list(arg)
+                elif op == _PLAN_SLOT_DICT:
+                    converted[key] = dict((k, results[i]) for k, i in arg)
+                else:
+                    converted[key] = _instantiate(arg, results)
+            results.append(converted)
+        return results[-1]
+
+
+def compile(schema_node, converters=None):
+    """
+    Compile ``schema_node`` into a :class:`ConversionPlan`; calling the plan
+    returns a fresh dict equal to ``convert(schema_node, converters)``.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :rtype: ConversionPlan
+    """
+    dispatcher = _CompilingDispatcher(converters)
+    converted = dispatcher(schema_node)
+    dispatcher.make_steps(finalize_conversion(converted))
+    return ConversionPlan(dispatcher.steps)
+
+
+class IncrementalConversion(object):
+    """
+    Conversion of a schema tree kept up to date while the tree is edited.
+
+    The converted fragment of every node is remembered.  After a node is
+    modified, e.g. its validator replaced, :meth:`invalidate` it; after a
+    child is added or removed, invalidate the parent.  The next
+    :meth:`convert` converts again only the invalidated nodes and their
+    ancestors, and reuses the fragments of the untouched subtrees.  Nodes
+    of custom converters overriding ``convert_type()`` or ``__call__()``,
+    which may read the conversions of their sub-nodes, are converted again
+    with their whole subtree.
+
+    Successive results share the fragments of untouched subtrees, copy them
+    before modifying them.  A handle must not be shared between threads.
+    """
+
+    def __init__(self, schema_node, converters=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        """
+        self.schema_node = schema_node
+        self.dispatcher = TypeConversionDispatcher(converters)
+        # number of nodes converted by the last call of convert()
+        self.converted_nodes = 0
+        self._nodes = {}
+        self._fragments = {}
+        self._children = {}
+        self._parents = {}
+        self._dirty = set()
+
+    def __contains__(self, schema_node):
+        return self._nodes.get(id(schema_node)) is schema_node
+
+    def invalidate(self, schema_node=None):
+        """
+        Convert ``schema_node`` and its ancestors again on the next
+        :meth:`convert`, or the whole tree if omitted.
+
+        :type schema_node: colander.SchemaNode
+        """
+        if schema_node is None:
+            self._nodes.clear()
+            self._fragments.clear()
+            self._children.clear()
+            self._parents.clear()
+            self._dirty.clear()
+            return
+        if schema_node not in self:
+            raise ConversionError('%r is not part of the converted tree'
+                                  % (schema_node.name,))
+        dirty = self._dirty
+        stack = [id(schema_node)]
+        while stack:
+            key = stack.pop()
+            if key not in dirty:
+                dirty.add(key)
+                stack.extend(self._parents.get(key, ()))
+
+    def convert(self):
+        """
+        :rtype: dict
+        """
+        converted = dict(self.update())
+        return finalize_conversion(converted)
+
+    def update(self):
+        """
+        Bring the remembered fragments up to date and return the fragment
+        of the root node.
+
+        :rtype: dict
+        """
+        fragments = self._fragments
+        dirty = self._dirty
+        self.converted_nodes = 0
+        root = self.schema_node
+        if id(root) in fragments and id(root) not in dirty:
+            return fragments[id(root)]
+        nodes = self._nodes
+        convert_shallow = self.dispatcher.convert_shallow
+        converted = {}
+        stack = [(root, converted, 0)]
+        seen = set()
+        while stack:
+            node, target, depth = stack.pop()
+            key = id(node)
+            fragment = fragments.get(key)
+            if fragment is not None and key not in dirty and key not in seen:
+                target.update(fragment)
+                continue
+            # an acyclic path is never deeper than the nodes seen so far
+            seen.add(key)
+            if depth >= len(seen):
+                raise ConversionError('recursive schema at %r'
+                                      % (node.name,))
+            pairs = convert_shallow(node, target)
+            self.converted_nodes += 1
+            nodes[key] = node
+            fragments[key] = target
+            dirty.discard(key)
+            if pairs or not node.children:
+                self._link(key, [sub_node for sub_node, _ in pairs])
+                for sub_node, placeholder in pairs:
+                    stack.append((sub_node, placeholder, depth + 1))
+            else:
+                self._cover(node)
+        return converted
+
+    def _link(self, key, sub_nodes):
+        """
+        Record ``sub_nodes`` as the children of the node of ``key``, and
+        forget its former children no longer among them.
+
+        :type key: int
+        :type sub_nodes: list
+        """
+        parents = self._parents
+        sub_keys = tuple(id(sub_node) for sub_node in sub_nodes)
+        removed = set(self._children.get(key, ())).difference(sub_keys)
+        self._children[key] = sub_keys
+        for sub_key in sub_keys:
+            parents.setdefault(sub_key, set()).add(key)
+        if removed:
+            self._release(key, removed)
+
+    def _cover(self, schema_node):
+        """
+        Record the subtree of ``schema_node``, converted at once with it by
+        a converter reading the conversions of its sub-nodes, so that
+        invalidating one of them converts ``schema_node`` again.
+
+        :type schema_node: colander.SchemaNode
+        """
+        nodes = self._nodes
+        dirty = self._dirty
+        covered = set()
+        stack = [schema_node]
+        while stack:
+            node = stack.pop()
+            self._link(id(node), node.children)
+            for sub_node in node.children:
+                key = id(sub_node)
+                if key in covered:
+                    continue
+                covered.add(key)
+                nodes[key] = sub_node
+                if key in dirty:
+                    # converted again here, and elsewhere if also shared
+                    # with nodes converted one at a time
+                    dirty.discard(key)
+                    self._fragments.pop(key, None)
+                stack.append(sub_node)
+
+    def _release(self, parent_key, keys):
+        """
+        Forget the nodes of ``keys`` removed from the node of ``parent_key``,
+        and their subtrees, unless they are still referred to elsewhere.
+
+        :type parent_key: int
+        :type keys: set
+        """
+        parents = self._parents
+        stack = [(parent_key, key) for key in keys]
+        while stack:
+            parent_key, key = stack.pop()
+            referrers = parents.get(key)
+            if referrers is None:
+                continue
+            referrers.discard(parent_key)
+            if not referrers:
+                del parents[key]
+                self._nodes.pop(key, None)
+                self._fragments.pop(key, None)
+                self._dirty.discard(key)
+                stack.extend((key, sub_key)
+                             for sub_key in self._children.pop(key, ()))
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Conversions cooperating with an asyncio event loop, for Python 3.5 and
+later.
+"""
+
+import asyncio
+import threading
+
+from . import _finish_conversion, _make_dispatcher, _output_dialect
+
+
+def _run_walk(walk, cancelled):
+    """
+    Resume ``walk`` until it is exhausted, or abandon it once ``cancelled``
+    is set.
+
+    :type walk: generator
+    :type cancelled: threading.Event
+    :rtype: dict
+    """
+    try:
+        for converted in walk:
+            if cancelled.is_set():
+                return None
+        return converted
+    finally:
+        walk.close()
+
+
+async def convert_async(schema_node, converters=None, cache=None,
+                        dedup=None, observer=None, compact=False,
+                        dialect=None, step=500, executor=None,
+                        offload_threshold=None):
+    """
+    :func:`colander_jsonschema.convert` giving control back to the event
+    loop after every ``step`` nodes, so other tasks keep running while
+    large schemas are converted.
+
+    Once ``offload_threshold`` nodes were converted on the loop, the rest
+    of the tree is converted in ``executor``, the default executor of the
+    loop if None, and the ``observer`` is notified from there.  Cancelling
+    the task abandons the conversion after the current step.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :type cache: colander_jsonschema.ConversionCache
+    :type dedup: str
+    :type observer: colander_jsonschema.ConversionObserver
+    :type compact: bool
+    :type dialect: str
+    :type step: int
+    :type executor: concurrent.futures.Executor
+    :type offload_threshold: int
+    :rtype: dict
+    """
+    if step < 1:
+        raise ValueError('step must be positive: %r' % (step,))
+    dialect = _output_dialect(dialect)
+    if cache is not None:
+        key = cache.make_key(schema_node, converters, dedup, dialect)
+        converted = cache.get(key)
+        if converted is not None:
+            return converted
+    dispatcher = _make_dispatcher(converters, dedup, observer, compact,
+                                  dialect and [dialect])
+    walk = dispatcher.iter_walk(schema_node, step)
+    nodes = 0
+    offloaded = False
+    try:
+        for converted in walk:
+            if converted is not None:
+                break
+            nodes += step
+            if offload_threshold is not None and nodes >= offload_threshold:
+                offloaded = True
+                loop = asyncio.get_event_loop()
+                cancelled = threading.Event()
+                try:
+                    converted = await loop.run_in_executor(
+                        executor, _run_walk, walk, cancelled)
+                except asyncio.CancelledError:
+                    # the executor abandons the walk itself
+                    cancelled.set()
+                    raise
+                break
+            await asyncio.sleep(0)
+    finally:
+        if not offloaded:
+            walk.close()
+    converted = _finish_conversion(dispatcher, converted)
+    if cache is not None:
+        cache.set(key, converted)
+    return converted
@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Convert many independent schemas at once, over a pool of processes.
+"""
+
+import collections
+import multiprocessing
+import multiprocessing.pool
+import pickle
+import time
+
+from . import ConversionError, convert
+
+try:
+    from collections.abc import Mapping
+except ImportError:  # pragma: no cover
+    from collections import Mapping
+
+
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+ConversionResult = collections.namedtuple(
+    'ConversionResult', ['key', 'converted', 'error', 'elapsed', 'backend'])
+
+
+def _convert_one(schema_node, converters, dedup):
+    """
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :type dedup: str
+    :rtype: tuple
+    """
+    start = _timer()
+    converted = error = None
+    try:
+        converted = convert(schema_node, converters, dedup=dedup)
+    except Exception as e:
+        error = e
+    return converted, error, _timer() - start
+
+
+def _convert_pickled(payload):
+    """
+    Worker side of the process backend: pickles in, pickles out.
+
+    :type payload: bytes
+    :rtype: bytes
+    """
+    result = _convert_one(*pickle.loads(payload))
+    try:
+        return pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        error = ConversionError('cannot pickle the conversion: %r' % (e,))
+        return pickle.dumps((None, error, result[2]),
+                            pickle.HIGHEST_PROTOCOL)
+
+
+def _load_result(payload):
+    """
+    :type payload: bytes
+    :rtype: tuple
+    """
+    try:
+        return pickle.loads(payload)
+    except Exception as e:
+        return None, ConversionError('cannot unpickle the conversion: %r'
+                                     % (e,)), 0.0
+
+
+def convert_many(schemas, converters=None, workers=None, backend='process',
+                 dedup=None):
+    """
+    Convert independent schemas in parallel.
+
+    ``schemas`` is a sequence of schema nodes, or a mapping of them by
+    name; results come in the same order, keyed by index or name.  Errors
+    are collected per schema in ``error`` instead of aborting the batch,
+    and ``elapsed`` is the conversion time of the schema in seconds.
+
+    With ``backend='process'`` schemas which cannot be pickled are
+    converted in this process meanwhile, ``backend='thread'`` uses a thread
+    pool and ``backend='serial'`` (or ``workers=1``) no pool at all.
+    ``workers`` defaults to the number of CPUs.
+
+    :type schemas: list or dict
+    :type converters: dict
+    :type workers: int
+    :type backend: str
+    :type dedup: str
+    :rtype: list of ConversionResult
+    """
+    if backend not in ('process', 'thread', 'serial'):
+        raise ValueError('unknown backend: %r' % (backend,))
+    if isinstance(schemas, Mapping):
+        items = list(schemas.items())
+    else:
+        items = list(enumerate(schemas))
+    if workers is None:
+        workers = multiprocessing.cpu_count()
+    if workers <= 1 or len(items) <= 1:
+        backend = 'serial'
+
+    results = [None] * len(items)
+    serial = []
+    if backend == 'process':
+        payloads = []
+        for position, (key, schema_node) in enumerate(items):
+            try:
+                payload = pickle.dumps((schema_node, converters, dedup),
+                                       pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                serial.append(position)
+                continue
+            payloads.append((position, payload))
+        pool = None
+        if payloads:
+            pool = multiprocessing.Pool(min(workers, len(payloads)))
+        try:
+            if pool is not None:
+                chunksize = max(1, len(payloads) // (workers * 4))
+                pending = pool.map_async(
+                    _convert_pickled, [payload for _, payload in payloads],
+                    chunksize)
+            for position in serial:
+                key, schema_node = items[position]
+                results[position] = ConversionResult(
+                    key, *_convert_one(schema_node, converters, dedup),
+                    backend='serial')
+            if pool is not None:
+                for (position, _), payload in zip(payloads, pending.get()):
+                    results[position] = ConversionResult(
+                        items[position][0], *_load_result(payload),
+                        backend='process')
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    elif backend == 'thread':
+        pool = multiprocessing.pool.ThreadPool(min(workers, len(items)))
+        try:
+            converted = pool.map(
+                lambda item: _convert_one(item[1], converters, dedup), items)
+        finally:
+            pool.close()
+            pool.join()
+        for position, result in enumerate(converted):
+            results[position] = ConversionResult(
+                items[position][0], *result, backend='thread')
+    else:
+        for position, (key, schema_node) in enumerate(items):
+            results[position] = ConversionResult(
+                key, *_convert_one(schema_node, converters, dedup),
+                backend='serial')
+    return results
@@ -0,0 +1,654 @@
+# -*- coding: utf-8 -*-
+"""
+Compile schema trees into specialized Python functions deserializing and
+validating payloads in a single pass.
+"""
+
+import colander
+
+from . import (ArrayTypeConverter, BooleanTypeConverter, NumberTypeConverter,
+               ObjectTypeConverter, StringTypeConverter,
+               TypeConversionDispatcher)
+
+
+_text_type = type(u'')
+_string_types = tuple(set([str, _text_type]))
+# returned for the nodes which failed, left out of their parent
+_invalid = object()
+_required = colander._('Required')
+_not_a_mapping = colander._('"${val}" is not a mapping type: ${err}')
+_unknown_keys = colander._('Unrecognized keys in mapping: "${val}"')
+_not_iterable = colander._('"${val}" is not iterable')
+
+
+def _function(cls, name):
+    """
+    The function behind the method ``name`` of ``cls``.
+
+    :type cls: type
+    :type name: str
+    :rtype: function
+    """
+    method = getattr(cls, name, None)
+    return getattr(method, '__func__', method)
+
+
+_node_deserialize = _function(colander.SchemaNode, 'deserialize')
+
+
+def _collect(exc, path, errors):
+    """
+    Append the ``(path, message)`` errors of a :class:`colander.Invalid`.
+
+    :type exc: colander.Invalid
+    :type path: tuple
+    :type errors: list
+    """
+    stack = [(exc, path)]
+    while stack:
+        exc, path = stack.pop()
+        if exc.msg is not None:
+            errors.append((path, exc.msg))
+        named = isinstance(exc.node.typ, colander.Mapping)
+        for child in reversed(exc.children):
+            key = child.node.name if named else child.pos
+            stack.append((child, path + (key,)))
+
+
+def _deserialize_node(node, cstruct, errors, path):
+    """
+    Deserialize with colander the nodes without specialized code.
+
+    :type node: colander.SchemaNode
+    :type cstruct: object
+    :type errors: list
+    :type path: tuple
+    :rtype: object
+    """
+    try:
+        return node.deserialize(cstruct)
+    except colander.Invalid as e:
+        _collect(e, path, errors)
+        return _invalid
+
+
+def _deserialize_type(node, cstruct, errors, path):
+    """
+    :type node: colander.SchemaNode
+    :type cstruct: object
+    :type errors: list
+    :type path: tuple
+    :rtype: object
+    """
+    try:
+        return node.typ.deserialize(node, cstruct)
+    except colander.Invalid as e:
+        _collect(e, path, errors)
+        return _invalid
+
+
+def _validate(validator, node, appstruct, errors, path):
+    """
+    Run ``validator``, whose checks failed or could not be inlined, for
+    its error message.
+
+    :type validator: callable
+    :type node: colander.SchemaNode
+    :type appstruct: object
+    :type errors: list
+    :type path: tuple
+    :rtype: object
+    """
+    try:
+        validator(node, appstruct)
+    except colander.Invalid as e:
+        _collect(e, path, errors)
+        return _invalid
+    return appstruct
+
+
+def _mapping(cstruct, errors, path):
+    """
+    :type cstruct: object
+    :type errors: list
+    :type path: tuple
+    :rtype: dict
+    """
+    try:
+        if hasattr(cstruct, 'items'):
+            return dict(cstruct)
+        raise TypeError('Does not implement dict-like functionality.')
+    except Exception as e:
+        errors.append((path, colander._(
+            _not_a_mapping, mapping={'val': cstruct, 'err': e})))
+        return _invalid
+
+
+def _sequence(cstruct, accept_scalar, errors, path):
+    """
+    :type cstruct: object
+    :type accept_scalar: bool
+    :type errors: list
+    :type path: tuple
+    :rtype: list
+    """
+    if (hasattr(cstruct, '__iter__') and not hasattr(cstruct, 'get') and
+            not isinstance(cstruct, _string_types)):
+        return list(cstruct)
+    if accept_scalar:
+        return [cstruct]
+    errors.append((path, colander._(_not_iterable,
+                                    mapping={'val': cstruct})))
+    return _invalid
+
+
+def _unknown(value, names, errors, path):
+    """
+    :type value: dict
+    :type names: frozenset
+    :type errors: list
+    :type path: tuple
+    """
+    unknown = dict((key, item) for key, item in value.items()
+                   if key not in names)
+    errors.append((path, colander._(_unknown_keys,
+                                    mapping={'val': unknown})))
+
+
+def _make_invalid(schema_node, errors):
+    """
+    The :class:`colander.Invalid` tree :meth:`colander.SchemaNode.deserialize`
+    raises for ``errors``.
+
+    :type schema_node: colander.SchemaNode
+    :type errors: list
+    :rtype: colander.Invalid
+    """
+    root = colander.Invalid(schema_node)
+    invalids = {(): root}
+    for path, message in errors:
+        node = schema_node
+        parent = root
+        for depth, key in enumerate(path):
+            if isinstance(node.typ, colander.Sequence):
+                pos, node = key, node.children[0]
+            elif isinstance(key, int):
+                pos, node = key, node.children[key]
+            else:
+                pos, node = [(i, child) for i, child
+                             in enumerate(node.children)
+                             if child.name == key][0]
+            invalid = invalids.get(path[:depth + 1])
+            if invalid is None:
+                invalid = invalids[path[:depth + 1]] = colander.Invalid(node)
+                parent.add(invalid, pos)
+            parent = invalid
+        parent.msg = message
+    return root
+
+
+class CompiledDeserializer(object):
+    """
+    Deserializes and validates payloads like
+    :meth:`colander.SchemaNode.deserialize` with generated code, collecting
+    the errors instead of raising them.
+
+    Calling it returns the ``(appstruct, errors)`` of a payload, ``errors``
+    being a list of ``(path, message)``, ``path`` the tuple of keys and
+    indexes leading to the failing value and ``message`` the message of
+    the :class:`colander.Invalid` colander would raise.  The appstruct of
+    an invalid payload is incomplete.  ``source`` holds the generated code.
+    """
+
+    def __init__(self, schema_node, function, source):
+        """
+        :type schema_node: colander.SchemaNode
+        :type function: callable
+        :type source: str
+        """
+        self.schema_node = schema_node
+        self.function = function
+        self.source = source
+
+    def __call__(self, cstruct=colander.null):
+        """
+        :type cstruct: object
+        :rtype: tuple
+        """
+        errors = []
+        appstruct = self.function(cstruct, (), errors)
+        return appstruct, errors
+
+    def deserialize(self, cstruct=colander.null):
+        """
+        Deserialize ``cstruct``, raising the :class:`colander.Invalid` of
+        all its errors.
+
+        :type cstruct: object
+        :rtype: object
+        """
+        errors = []
+        appstruct = self.function(cstruct, (), errors)
+        if errors:
+            raise _make_invalid(self.schema_node, errors)
+        return appstruct
+
+
+class _DeserializerBuilder(object):
+
+    # converter classes of the node types with specialized code
+    emitters = (
+        (ObjectTypeConverter, 'emit_mapping'),
+        (ArrayTypeConverter, 'emit_sequence'),
+        (StringTypeConverter, 'emit_string'),
+        (NumberTypeConverter, 'emit_number'),
+        (BooleanTypeConverter, 'emit_boolean'),
+    )
+    # node types whose deserialize() the specialized code reproduces
+    deserializers = {
+        'emit_mapping': _function(colander.Mapping, 'deserialize'),
+        'emit_sequence': _function(colander.Sequence, 'deserialize'),
+        'emit_string': _function(colander.String, 'deserialize'),
+        'emit_number': _function(colander.Number, 'deserialize'),
+        'emit_boolean': _function(colander.Boolean, 'deserialize'),
+        'emit_type': None,
+    }
+    inlined_validators = {
+        colander.Length: 'length_checks',
+        colander.Range: 'range_checks',
+        colander.OneOf: 'oneof_checks',
+        colander.Regex: 'regex_checks',
+        colander.Email: 'regex_checks',
+    }
+
+    def __init__(self, converters=None):
+        """
+        :type converters: dict
+        """
+        self.dispatcher = TypeConversionDispatcher(converters)
+        self.functions = []
+        self.namespace = {
+            'null': colander.null,
+            'drop': colander.drop,
+            '_invalid': _invalid,
+            '_required': _required,
+            '_text_type': _text_type,
+            '_deserialize_node': _deserialize_node,
+            '_deserialize_type': _deserialize_type,
+            '_validate': _validate,
+            '_mapping': _mapping,
+            '_sequence': _sequence,
+            '_unknown': _unknown,
+        }
+
+    def constant(self, prefix, value):
+        """
+        :type prefix: str
+        :type value: object
+        :rtype: str
+        """
+        name = '%s%d' % (prefix, len(self.namespace))
+        self.namespace[name] = value
+        return name
+
+    def emitter(self, schema_node):
+        """
+        Name of the method emitting the type code of ``schema_node``, or
+        None when colander has to deserialize it.
+
+        :type schema_node: colander.SchemaNode
+        :rtype: str
+        """
+        if (_function(type(schema_node), 'deserialize') is not
+                _node_deserialize):
+            return None
+        converter_class = self.dispatcher.resolve(type(schema_node.typ))
+        if converter_class is None:
+            return None
+        for base, name in self.emitters:
+            if issubclass(converter_class, base):
+                break
+        else:
+            return 'emit_type'
+        expected = self.deserializers[name]
+        if (expected is not None and
+                _function(type(schema_node.typ), 'deserialize') is not
+                expected):
+            return 'emit_type'
+        if name == 'emit_string' and schema_node.typ.encoding:
+            return 'emit_type'
+        return name
+
+    def build_function(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        :rtype: str
+        """
+        name = '_deserialize%d' % len(self.functions)
+        lines = ['def %s(cstruct, path, errors):' % name]
+        self.functions.append(lines)
+        self.emit_node(schema_node, 'cstruct', 'appstruct', 'path', lines,
+                       '    ')
+        lines.append('    return appstruct')
+        return name
+
+    def emit_child(self, schema_node, cstruct, appstruct, path, lines,
+                   indent):
+        """
+        Deserialize a child inline, or in a function of its own when it is
+        a container, which keeps the generated blocks shallow.
+        """
+        if self.emitter(schema_node) in ('emit_mapping', 'emit_sequence'):
+            name = self.build_function(schema_node)
+            lines.append('%s%s = %s(%s, %s, errors)' % (
+                indent, appstruct, name, cstruct, path))
+            return
+        self.emit_node(schema_node, cstruct, appstruct, path, lines, indent)
+
+    def emit_node(self, schema_node, cstruct, appstruct, path, lines,
+                  indent):
+        """
+        Append the code setting ``appstruct`` to the deserialization of
+        ``cstruct`` by ``schema_node``, or to ``_invalid``.
+
+        :type schema_node: colander.SchemaNode
+        :type cstruct: str
+        :type appstruct: str
+        :type path: str
+        :type lines: list
+        :type indent: str
+        """
+        name = self.emitter(schema_node)
+        if name is None:
+            lines.append('%s%s = _deserialize_node(%s, %s, errors, %s)' % (
+                indent, appstruct, self.constant('_node', schema_node),
+                cstruct, path))
+            return
+        getattr(self, name)(schema_node, cstruct, appstruct, path, lines,
+                            indent)
+        preparer = schema_node.preparer
+        if preparer is not None:
+            if not hasattr(preparer, '__call__'):
+                preparers = list(preparer)
+            else:
+                preparers = [preparer]
+            lines.append('%sif %s is not _invalid:' % (indent, appstruct))
+            for preparer in preparers:
+                lines.append('%s    %s = %s(%s)' % (
+                    indent, appstruct, self.constant('_preparer', preparer),
+                    appstruct))
+        missing = schema_node.missing
+        lines.append('%sif %s is null:' % (indent, appstruct))
+        if (missing is colander.required or
+                isinstance(missing, colander.deferred)):
+            lines.append('%s    errors.append((%s, _required))'
+                         % (indent, path))
+            lines.append('%s    %s = _invalid' % (indent, appstruct))
+        elif missing is colander.drop:
+            lines.append('%s    %s = drop' % (indent, appstruct))
+        elif missing is None:
+            lines.append('%s    %s = None' % (indent, appstruct))
+        elif missing is not colander.null:
+            lines.append('%s    %s = %s' % (
+                indent, appstruct, self.constant('_missing', missing)))
+        else:
+            lines.append('%s    pass' % indent)
+        validator = schema_node.validator
+        if validator is None or isinstance(validator, colander.deferred):
+            return
+        node = self.constant('_node', schema_node)
+        report = '%s = _validate(%s, %s, %s, errors, %s)' % (
+            appstruct, self.constant('_validator', validator), node,
+            appstruct, path)
+        checks = self.validator_checks(
+            validator, appstruct, name in ('emit_string', 'emit_number'))
+        lines.append('%selif %s is not _invalid:' % (indent, appstruct))
+        if checks is None:
+            lines.append('%s    %s' % (indent, report))
+            return
+        lines.append('%s    if %s:' % (indent, ' or '.join(checks)))
+        lines.append('%s        %s' % (indent, report))
+
+    def validator_checks(self, validator, appstruct, hashable):
+        """
+        Expressions true when ``validator`` fails, or None when it cannot
+        be inlined; ``hashable`` tells whether the appstruct is.
+
+        :type validator: callable
+        :type appstruct: str
+        :type hashable: bool
+        :rtype: list
+        """
+        validators = [validator]
+        checks = []
+        while validators:
+            validator = validators.pop(0)
+            if type(validator) is colander.All:
+                validators[:0] = validator.validators
+                continue
+            name = self.inlined_validators.get(type(validator))
+            if name is None:
+                return None
+            checks.extend(getattr(self, name)(validator, appstruct,
+                                              hashable))
+        return checks or ['False']
+
+    def length_checks(self, validator, appstruct, hashable):
+        checks = []
+        if validator.min is not None:
+            checks.append('len(%s) < %r' % (appstruct, validator.min))
+        if validator.max is not None:
+            checks.append('len(%s) > %r' % (appstruct, validator.max))
+        return checks
+
+    def range_checks(self, validator, appstruct, hashable):
+        checks = []
+        if validator.min is not None:
+            checks.append('%s < %s' % (
+                appstruct, self.constant('_minimum', validator.min)))
+        if validator.max is not None:
+            checks.append('%s > %s' % (
+                appstruct, self.constant('_maximum', validator.max)))
+        return checks
+
+    def oneof_checks(self, validator, appstruct, hashable):
+        choices = validator.choices
+        if hashable:
+            try:
+                choices = frozenset(choices)
+            except TypeError:
+                pass
+        return ['%s not in %s' % (appstruct,
+                                  self.constant('_choices', choices))]
+
+    def regex_checks(self, validator, appstruct, hashable):
+        return ['%s(%s) is None' % (
+            self.constant('_match', validator.match_object.match),
+            appstruct)]
+
+    def emit_type(self, schema_node, cstruct, appstruct, path, lines,
+                  indent):
+        lines.append('%s%s = _deserialize_type(%s, %s, errors, %s)' % (
+            indent, appstruct, self.constant('_node', schema_node), cstruct,
+            path))
+
+    def emit_boolean(self, schema_node, cstruct, appstruct, path, lines,
+                     indent):
+        lines.extend([
+            '%sif %s is null:' % (indent, cstruct),
+            '%s    %s = null' % (indent, appstruct),
+        ])
+        for value in (True, False):
+            # their deserialization only depends on the choices
+            try:
+                result = schema_node.typ.deserialize(schema_node, value)
+            except colander.Invalid:
+                continue
+            lines.extend([
+                '%selif %s is %r:' % (indent, cstruct, value),
+                '%s    %s = %r' % (indent, appstruct, result),
+            ])
+        lines.append('%selse:' % indent)
+        self.emit_type(schema_node, cstruct, appstruct, path, lines,
+                       indent + '    ')
+
+    def emit_string(self, schema_node, cstruct, appstruct, path, lines,
+                    indent):
+        lines.extend([
+            '%sif not %s:' % (indent, cstruct),
+            '%s    %s = null' % (indent, appstruct),
+            '%selif type(%s) is _text_type:' % (indent, cstruct),
+            '%s    %s = %s' % (indent, appstruct, cstruct),
+            '%selse:' % indent,
+        ])
+        self.emit_type(schema_node, cstruct, appstruct, path, lines,
+                       indent + '    ')
+
+    def emit_number(self, schema_node, cstruct, appstruct, path, lines,
+                    indent):
+        lines.extend([
+            '%sif %s != 0 and not %s:' % (indent, cstruct, cstruct),
+            '%s    %s = null' % (indent, appstruct),
+            '%selse:' % indent,
+            '%s    try:' % indent,
+            '%s        %s = %s(%s)' % (
+                indent, appstruct,
+                self.constant('_num', schema_node.typ.num), cstruct),
+            '%s    except Exception:' % indent,
+        ])
+        self.emit_type(schema_node, cstruct, appstruct, path, lines,
+                       indent + '        ')
+
+    def emit_mapping(self, schema_node, cstruct, appstruct, path, lines,
+                     indent):
+        value = 'value%d' % len(lines)
+        lines.extend([
+            '%sif %s is null:' % (indent, cstruct),
+            '%s    %s = null' % (indent, appstruct),
+            '%selse:' % indent,
+            '%s    if type(%s) is dict:' % (indent, cstruct),
+            '%s        %s = %s' % (indent, value, cstruct),
+            '%s    else:' % indent,
+            '%s        %s = _mapping(%s, errors, %s)' % (
+                indent, value, cstruct, path),
+            '%s    if %s is _invalid:' % (indent, value),
+            '%s        %s = _invalid' % (indent, appstruct),
+            '%s    else:' % indent,
+        ])
+        indent += '        '
+        unknown = schema_node.typ.unknown
+        mark = 'mark%d' % len(lines)
+        lines.append('%s%s = len(errors)' % (indent, mark))
+        result = 'result%d' % len(lines)
+        lines.append('%s%s = {}' % (indent, result))
+        for sub_node in schema_node.children:
+            key = repr(sub_node.name)
+            sub_cstruct = 'cstruct%d' % len(lines)
+            sub_appstruct = 'appstruct%d' % len(lines)
+            lines.append('%s%s = %s.get(%s, null)' % (
+                indent, sub_cstruct, value, key))
+            self.emit_child(sub_node, sub_cstruct, sub_appstruct,
+                            '%s + (%s,)' % (path, key), lines, indent)
+            lines.append('%sif %s is not drop and %s is not _invalid:' % (
+                indent, sub_appstruct, sub_appstruct))
+            lines.append('%s    %s[%s] = %s' % (indent, result, key,
+                                                sub_appstruct))
+        if unknown != 'ignore':
+            names = self.constant('_names', frozenset(
+                sub_node.name for sub_node in schema_node.children))
+            key = 'key%d' % len(lines)
+        if unknown == 'raise':
+            lines.extend([
+                '%sif not %s.issuperset(%s):' % (indent, names, value),
+                # colander reports the unknown keys only
+                '%s    del errors[%s:]' % (indent, mark),
+                '%s    _unknown(%s, %s, errors, %s)' % (indent, value, names,
+                                                        path),
+            ])
+        elif unknown == 'preserve':
+            lines.extend([
+                '%sfor %s in %s:' % (indent, key, value),
+                '%s    if %s not in %s:' % (indent, key, names),
+                '%s        %s[%s] = %s[%s]' % (indent, result, key, value,
+                                               key),
+            ])
+        self.emit_result(result, appstruct, mark, lines, indent)
+
+    def emit_result(self, result, appstruct, mark, lines, indent):
+        """
+        Set ``appstruct`` to the ``result`` of a container, or to
+        ``_invalid`` when errors were added since ``mark``.
+        """
+        lines.extend([
+            '%sif len(errors) > %s:' % (indent, mark),
+            '%s    %s = _invalid' % (indent, appstruct),
+            '%selse:' % indent,
+            '%s    %s = %s' % (indent, appstruct, result),
+        ])
+
+    def emit_sequence(self, schema_node, cstruct, appstruct, path, lines,
+                      indent):
+        items = 'items%d' % len(lines)
+        lines.extend([
+            '%sif %s is null:' % (indent, cstruct),
+            '%s    %s = null' % (indent, appstruct),
+            '%selse:' % indent,
+            '%s    if type(%s) is list:' % (indent, cstruct),
+            '%s        %s = %s' % (indent, items, cstruct),
+            '%s    else:' % indent,
+            '%s        %s = _sequence(%s, %r, errors, %s)' % (
+                indent, items, cstruct, bool(schema_node.typ.accept_scalar),
+                path),
+            '%s    if %s is _invalid:' % (indent, items),
+            '%s        %s = _invalid' % (indent, appstruct),
+            '%s    else:' % indent,
+        ])
+        indent += '        '
+        mark = 'mark%d' % len(lines)
+        result = 'result%d' % len(lines)
+        index = 'index%d' % len(lines)
+        item = 'item%d' % len(lines)
+        sub_appstruct = 'appstruct%d' % len(lines)
+        lines.extend([
+            '%s%s = len(errors)' % (indent, mark),
+            '%s%s = []' % (indent, result),
+            '%sfor %s, %s in enumerate(%s):' % (indent, index, item, items),
+        ])
+        self.emit_child(schema_node.children[0], item, sub_appstruct,
+                        '%s + (%s,)' % (path, index), lines, indent + '    ')
+        lines.extend([
+            '%s    if %s is not _invalid:' % (indent, sub_appstruct),
+            '%s        %s.append(%s)' % (indent, result, sub_appstruct),
+        ])
+        self.emit_result(result, appstruct, mark, lines, indent)
+
+    def build(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        :rtype: CompiledDeserializer
+        """
+        name = self.build_function(schema_node)
+        source = '\n\n'.join('\n'.join(lines) for lines in self.functions)
+        code = compile(source, '<colander_jsonschema deserializer>', 'exec')
+        exec(code, self.namespace)
+        return CompiledDeserializer(schema_node, self.namespace[name],
+                                    source)
+
+
+def compile_deserializer(schema_node, converters=None):
+    """
+    Compile a function deserializing and validating payloads against
+    ``schema_node`` in one pass.
+
+    Node types are dispatched through the converters of
+    :class:`colander_jsonschema.TypeConversionDispatcher`, extended with
+    ``converters``: nodes converted as objects, arrays, strings, numbers
+    and booleans get specialized code, as do ``Length``, ``Range``,
+    ``OneOf`` and ``Regex`` validators, other nodes and validators are
+    called.  The schema must not be modified afterwards.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :rtype: CompiledDeserializer
+    """
+    return _DeserializerBuilder(converters).build(schema_node)
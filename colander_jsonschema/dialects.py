@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Output dialects of conversions.
+
+Converters emit JSON Schema draft-04; a dialect rewrites the members which
+differ in its specification, node by node, while the tree is walked, so a
+single walk emits any number of dialects and the conversion of types and
+validators is shared between them.
+"""
+
+import collections
+
+
+class Dialect(object):
+    """
+    Rewrites draft-04 conversions.  :meth:`rewrite` is called with the
+    conversion of every node, and of every schema nested in it, e.g. the
+    ``$ref`` of a deduplicated sub-node, after the nested ones.  It must
+    assign the members it changes instead of modifying their values, which
+    may be shared.
+    """
+
+    name = None
+    schema_uri = None
+    # path of the shared subschemas from the root
+    definitions_path = ('definitions',)
+    # whether the members next to ``$ref`` apply
+    ref_siblings = False
+
+    @property
+    def definitions_ref(self):
+        """
+        :rtype: str
+        """
+        return '#/' + '/'.join(self.definitions_path) + '/'
+
+    def rewrite(self, converted):
+        """
+        :type converted: dict
+        """
+        ref = converted.get('$ref')
+        if (ref is not None and ref.startswith('#/definitions/') and
+                self.definitions_path != ('definitions',)):
+            converted['$ref'] = (self.definitions_ref +
+                                 ref[len('#/definitions/'):])
+        if self.ref_siblings and ref is None:
+            all_of = converted.get('allOf')
+            # the wrapper of a reference next to annotations
+            if (all_of is not None and len(all_of) == 1 and
+                    list(all_of[0]) == ['$ref']):
+                del converted['allOf']
+                converted['$ref'] = all_of[0]['$ref']
+
+    def finalize(self, converted):
+        """
+        Complete the conversion of the root.
+
+        :type converted: dict
+        :rtype: dict
+        """
+        definitions = converted.pop('definitions', None)
+        if definitions is not None:
+            container = converted
+            for name in self.definitions_path[:-1]:
+                container = container.setdefault(name, {})
+            container[self.definitions_path[-1]] = definitions
+        if self.schema_uri is not None:
+            converted['$schema'] = self.schema_uri
+        return converted
+
+
+class Draft4(Dialect):
+    name = 'draft-04'
+    schema_uri = 'http://json-schema.org/draft-04/schema#'
+
+    def rewrite(self, converted):
+        pass
+
+
+class Draft7(Dialect):
+    name = 'draft-07'
+    schema_uri = 'http://json-schema.org/draft-07/schema#'
+
+
+class Draft202012(Dialect):
+    name = '2020-12'
+    schema_uri = 'https://json-schema.org/draft/2020-12/schema'
+    definitions_path = ('$defs',)
+    ref_siblings = True
+
+
+class OpenAPI30(Dialect):
+    """
+    Schema objects of OpenAPI 3.0: nullable types are ``nullable`` and
+    shared subschemas are kept under ``components/schemas`` of the root,
+    to be moved into the components of the OpenAPI document.
+    """
+
+    name = 'openapi-3.0'
+    definitions_path = ('components', 'schemas')
+
+    def rewrite(self, converted):
+        super(OpenAPI30, self).rewrite(converted)
+        types = converted.get('type')
+        if isinstance(types, list) and 'null' in types:
+            types = [t for t in types if t != 'null']
+            if len(types) == 1:
+                converted['type'] = types[0]
+                converted['nullable'] = True
+
+
+dialects = collections.OrderedDict(
+    (dialect.name, dialect)
+    for dialect in (Draft4(), Draft7(), Draft202012(), OpenAPI30()))
+
+
+def get_dialect(dialect):
+    """
+    The dialect named ``dialect``, or ``dialect`` if it is a
+    :class:`Dialect`.
+
+    :type dialect: str
+    :rtype: Dialect
+    """
+    if isinstance(dialect, Dialect):
+        return dialect
+    try:
+        return dialects[dialect]
+    except KeyError:
+        raise ValueError('unknown dialect: %r' % (dialect,))
@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent cache of converted schemas, shared by processes and restarts.
+
+The cache directory must only be writable by trusted users: entries are
+pickles, like bytecode caches they are loaded as code.
+"""
+
+import argparse
+import errno
+import importlib
+import inspect
+import os
+import pickle
+import sys
+import tempfile
+
+import colander
+
+from . import (
+    TypeConversionDispatcher,
+    __version__,
+    _freeze,
+    _stable_digest,
+    convert,
+    fingerprint,
+)
+from .dialects import dialects, get_dialect
+
+
+_replace = getattr(os, 'replace', os.rename)
+_file_mode = None
+# format of the keys, bumped when entries written under the same key may
+# differ, e.g. since schema classes are part of the fingerprint
+_key_version = 2
+
+
+def _entry_mode():
+    """
+    Mode of the files created under the process umask, which entries get
+    instead of the private mode of temporary files.
+
+    :rtype: int
+    """
+    global _file_mode
+    if _file_mode is None:
+        # the umask can only be read by setting it, do it once
+        umask = os.umask(0o022)
+        os.umask(umask)
+        _file_mode = 0o666 & ~umask
+    return _file_mode
+
+
+class DiskCache(object):
+    """
+    On-disk cache of converted schemas, one pickle per entry, usable as
+    ``convert(node, cache=DiskCache(directory))``.
+
+    Keys are digests of the schema structure and classes, of the converter
+    map, of the library version and of the Python version, so they are
+    stable across processes.  Entries are written atomically, with the mode
+    of files created under the umask, so a cache prewarmed by one user can
+    be read by the processes of another; unreadable ones are misses.
+    ``memory`` may be a :class:`colander_jsonschema.ConversionCache` kept in
+    front of the disk.
+    """
+
+    suffix = '.pickle'
+
+    def __init__(self, directory, memory=None):
+        """
+        :type directory: str
+        :type memory: colander_jsonschema.ConversionCache
+        """
+        self.directory = directory
+        self.memory = memory
+        self.hits = 0
+        self.misses = 0
+
+    def make_key(self, schema_node, converters=None, dedup=None,
+                 dialect=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        :type dedup: str
+        :type dialect: str
+        :rtype: str
+        """
+        return self.dialect_key(
+            self.base_key(schema_node, converters, dedup), dialect)
+
+    def base_key(self, schema_node, converters=None, dedup=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        :type dedup: str
+        :rtype: tuple
+        """
+        registry = dict(TypeConversionDispatcher.converters)
+        if converters:
+            registry.update(converters)
+        # the fingerprint covers the classes of the nodes, which
+        # deduplicated conversions name and share definitions by
+        return (
+            __version__,
+            _key_version,
+            tuple(sys.version_info[:2]),
+            _freeze(registry),
+            dedup or None,
+            fingerprint(schema_node),
+        )
+
+    def dialect_key(self, key, dialect=None):
+        """
+        Digest of the :meth:`base_key` ``key`` in ``dialect``.
+
+        :type key: tuple
+        :type dialect: str
+        :rtype: str
+        """
+        if dialect is not None:
+            dialect = get_dialect(dialect)
+            if dialect.name != 'draft-04':
+                key += (dialect.name,)
+        return _stable_digest(key)
+
+    def path(self, key):
+        """
+        :type key: str
+        :rtype: str
+        """
+        return os.path.join(self.directory, key + self.suffix)
+
+    def __contains__(self, key):
+        return os.path.exists(self.path(key))
+
+    def get(self, key):
+        """
+        :type key: str
+        :rtype: dict
+        """
+        if self.memory is not None:
+            converted = self.memory.get(key)
+            if converted is not None:
+                self.hits += 1
+                return converted
+        try:
+            with open(self.path(key), 'rb') as fp:
+                converted = pickle.loads(fp.read())
+        except Exception:
+            self.misses += 1
+            return None
+        self.hits += 1
+        if self.memory is not None:
+            self.memory.set(key, converted)
+        return converted
+
+    def set(self, key, converted):
+        """
+        :type key: str
+        :type converted: dict
+        """
+        if self.memory is not None:
+            self.memory.set(key, converted)
+        try:
+            os.makedirs(self.directory)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, temp_path = tempfile.mkstemp(suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen(fd, 'wb') as fp:
+                pickle.dump(converted, fp, pickle.HIGHEST_PROTOCOL)
+            # readable by the processes the umask lets read other files
+            os.chmod(temp_path, _entry_mode())
+            _replace(temp_path, self.path(key))
+        except Exception:
+            os.unlink(temp_path)
+            raise
+
+    def invalidate(self, schema_node=None, converters=None, dedup=None,
+                   dialect=None):
+        """
+        Drop the entry for ``schema_node`` in ``dialect``, or in every
+        registered dialect if omitted; drop every entry if ``schema_node``
+        is omitted.
+
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        :type dedup: str
+        :type dialect: str
+        """
+        if schema_node is None:
+            self.clear()
+            return
+        base_key = self.base_key(schema_node, converters, dedup)
+        if dialect is not None:
+            names = [dialect]
+        else:
+            names = list(dialects)
+        for name in names:
+            key = self.dialect_key(base_key, name)
+            if self.memory is not None:
+                self.memory.discard(key)
+            try:
+                os.unlink(self.path(key))
+            except OSError as e:
+                if e.errno != errno.ENOENT:
+                    raise
+
+    def clear(self):
+        if self.memory is not None:
+            self.memory.clear()
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name.endswith(self.suffix):
+                os.unlink(os.path.join(self.directory, name))
+
+
+def _resolve(name):
+    """
+    :type name: str
+    :rtype: object
+    """
+    module_name, _, attribute = name.partition(':')
+    value = importlib.import_module(module_name)
+    for part in attribute.split('.') if attribute else ():
+        value = getattr(value, part)
+    return value
+
+
+def find_schemas(name):
+    """
+    Resolve ``module:attribute`` to the schema it names, instantiating
+    schema classes, or ``module`` to the schemas defined in it.
+
+    :type name: str
+    :rtype: list of (str, colander.SchemaNode)
+    """
+    value = _resolve(name)
+    if not inspect.ismodule(value):
+        if inspect.isclass(value):
+            value = value()
+        return [(name, value)]
+    schemas = []
+    for attribute, member in sorted(vars(value).items()):
+        if isinstance(member, colander.SchemaNode):
+            schemas.append(('%s:%s' % (name, attribute), member))
+        elif (inspect.isclass(member) and
+              issubclass(member, colander.SchemaNode) and
+              member.__module__ == value.__name__):
+            try:
+                member = member()
+            except NotImplementedError:
+                # no schema_type, the class needs a type to instantiate
+                continue
+            schemas.append(('%s:%s' % (name, attribute), member))
+    return schemas
+
+
+def main(argv=None):
+    """
+    Prewarm a :class:`DiskCache`, e.g. as a build step.
+
+    :type argv: list
+    :rtype: int
+    """
+    parser = argparse.ArgumentParser(
+        prog='colander_jsonschema-prewarm',
+        description='Convert colander schemas into an on-disk cache.')
+    parser.add_argument('directory', help='cache directory')
+    parser.add_argument('schemas', nargs='+', metavar='schema',
+                        help='module:attribute of a schema, or a module '
+                             'to convert every schema defined in it')
+    parser.add_argument('--converters', metavar='module:attribute',
+                        help='dict of custom type converters')
+    parser.add_argument('--dedup', choices=['structure', 'class'])
+    args = parser.parse_args(argv)
+
+    converters = None
+    if args.converters:
+        converters = _resolve(args.converters)
+    cache = DiskCache(args.directory)
+    status = 0
+    counts = {'converted': 0, 'cached': 0, 'failed': 0}
+    for name in args.schemas:
+        try:
+            schemas = find_schemas(name)
+        except Exception as e:
+            sys.stderr.write('%s: %s\n' % (name, e))
+            counts['failed'] += 1
+            status = 1
+            continue
+        for schema_name, schema_node in schemas:
+            try:
+                if cache.make_key(schema_node, converters,
+                                  args.dedup) in cache:
+                    counts['cached'] += 1
+                    continue
+                convert(schema_node, converters, cache=cache,
+                        dedup=args.dedup)
+            except Exception as e:
+                sys.stderr.write('%s: %r\n' % (schema_name, e))
+                counts['failed'] += 1
+                status = 1
+                continue
+            counts['converted'] += 1
+    sys.stdout.write('%(converted)d converted, %(cached)d already cached, '
+                     '%(failed)d failed\n' % counts)
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
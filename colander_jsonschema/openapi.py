@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+OpenAPI 3.0 components of a whole service, generated from a registry of
+named schemas.
+"""
+
+import collections
+
+import colander
+
+from . import DeduplicatingDispatcher, _StructureIndex, _generic_schema_classes
+
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # pragma: no cover
+    from collections import MutableMapping
+
+
+_components_ref = '#/components/schemas/'
+
+
+def _find_references(converted):
+    """
+    Names of the components ``converted`` refers to.
+
+    :type converted: dict
+    :rtype: frozenset
+    """
+    names = set()
+    stack = [converted]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            ref = value.get('$ref')
+            if ref is not None and ref.startswith(_components_ref):
+                names.add(ref[len(_components_ref):])
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return frozenset(names)
+
+
+class _ComponentDispatcher(DeduplicatingDispatcher):
+    """
+    Converts the schemas of a :class:`ComponentsGenerator` one at a time.
+    Nodes of mapping schema classes are shared even when they occur once,
+    and the references of the components already emitted, and their names,
+    are kept from one walk to the next.
+    """
+
+    def __init__(self, generator, converters=None):
+        """
+        :type generator: ComponentsGenerator
+        :type converters: dict
+        """
+        super(_ComponentDispatcher, self).__init__(
+            converters, 'class', dialects=['openapi-3.0'])
+        self.generator = generator
+        # name of the registered schema being converted
+        self.root_name = None
+        # names in use, by registered schemas or by components
+        self.taken = set()
+
+    def root_key(self, schema_node):
+        """
+        Share key of the registered ``schema_node``, referred to by the
+        nodes of the same class.
+
+        :type schema_node: colander.SchemaNode
+        :rtype: tuple
+        """
+        if type(schema_node) in _generic_schema_classes:
+            return None
+        return self.share_key(None, schema_node)
+
+    def share_key(self, index, schema_node):
+        """
+        :type index: _StructureIndex
+        :type schema_node: colander.SchemaNode
+        :rtype: tuple
+        """
+        key = super(_ComponentDispatcher, self).share_key(index, schema_node)
+        if key is None or key[0] == 'recursive':
+            return key
+        if isinstance(schema_node.typ, colander.Mapping):
+            # one component per class, whether nodes are required or not
+            return (type(schema_node),)
+        return None
+
+    def convert_node(self, schema_node, converted):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :rtype: dict
+        """
+        converted = super(_ComponentDispatcher,
+                          self).convert_node(schema_node, converted)
+        types = converted.get('type')
+        if (id(schema_node) in self._share_keys and
+                isinstance(types, list) and 'null' in types):
+            # components are required, optional nodes referring to them
+            # are nullable instead
+            types = [t for t in types if t != 'null']
+            converted['type'] = types[0] if len(types) == 1 else types
+        return converted
+
+    def make_reference(self, schema_node, ref):
+        """
+        :type schema_node: colander.SchemaNode
+        :type ref: str
+        :rtype: dict
+        """
+        converted = super(_ComponentDispatcher,
+                          self).make_reference(schema_node, ref)
+        if schema_node.required:
+            return converted
+        if '$ref' in converted:
+            converted = {'allOf': [converted]}
+        converted['nullable'] = True
+        return converted
+
+    def find_shared(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        :rtype: dict
+        """
+        index = _StructureIndex(schema_node)
+        keys = ((node_id, self.share_key(index, node))
+                for node_id, node in index.nodes.items())
+        return dict((node_id, key) for node_id, key in keys
+                    if key is not None)
+
+    def prepare(self, schema_node):
+        """
+        :type schema_node: colander.SchemaNode
+        """
+        self.definitions.clear()
+        self.reference_counts.clear()
+        self._definition_ids = set()
+        self._share_keys = self.find_shared(schema_node)
+        key = self._share_keys.get(id(schema_node))
+        if key is not None:
+            # schemas of the same class refer to one of them
+            self.references.setdefault(key,
+                                       '#/definitions/' + self.root_name)
+
+    def make_name(self, schema_node, taken=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type taken: set
+        :rtype: str
+        """
+        names = self.generator._names
+        key = self._share_keys[id(schema_node)]
+        name = names.get(key)
+        if name is None:
+            name = super(_ComponentDispatcher, self).make_name(schema_node,
+                                                               self.taken)
+            names[key] = name
+            self.taken.add(name)
+        return name
+
+
+class ComponentsGenerator(MutableMapping):
+    """
+    The ``components/schemas`` of an OpenAPI 3.0 document, generated from
+    a registry of named schemas, e.g. the request and response bodies of a
+    service.
+
+    Every registered schema is a component of its name.  Every node of a
+    mapping schema class, e.g. ``class Address(colander.MappingSchema)``,
+    is emitted once as a component named after its class, and referred to
+    with ``$ref`` wherever the class is used in the registry; nodes of the
+    class of a registered schema refer to its component.  As with
+    ``convert(node, dedup='class')``, the nodes of a class are assumed to
+    convert equally.  Components are not nullable; the references of
+    optional nodes are.
+
+    :meth:`generate` converts again only the schemas registered or
+    invalidated since its previous call, and the components they use; the
+    other components are kept as they were.  After a registered schema is
+    modified, :meth:`invalidate` it.  Registering a schema of a class
+    already emitted under another name converts every schema again.
+
+    Successive results share the untouched components, copy them before
+    modifying them.  A generator must not be shared between threads.
+    """
+
+    def __init__(self, schemas=None, converters=None):
+        """
+        :type schemas: dict
+        :type converters: dict
+        """
+        self.dispatcher = _ComponentDispatcher(self, converters)
+        # registered schemas converted by the last call of generate()
+        self.converted_schemas = 0
+        # names of the components emitted by the last call of generate()
+        self.emitted = []
+        self._schemas = collections.OrderedDict()
+        self._root_keys = {}
+        # share keys: names of their components
+        self._names = {}
+        self._components = {}
+        # names of the components each component refers to
+        self._references = {}
+        self._dirty = set()
+        if schemas:
+            self.update(schemas)
+
+    def __getitem__(self, name):
+        return self._schemas[name]
+
+    def __setitem__(self, name, schema_node):
+        """
+        :type name: str
+        :type schema_node: colander.SchemaNode
+        """
+        key = self.dispatcher.root_key(schema_node)
+        owner = self._names.get(key) if key is not None else None
+        # whether components would be renamed, or referred to under another
+        # name
+        renamed = (owner is not None and owner != name and
+                   owner not in self._schemas)
+        if name in self._schemas:
+            renamed = renamed or self._root_keys[name] != key
+        elif name in self._names.values():
+            renamed = renamed or owner != name
+        if renamed:
+            self.invalidate()
+        old_key = self._root_keys.get(name)
+        if old_key is not None and self._names.get(old_key) == name:
+            del self._names[old_key]
+        self._schemas[name] = schema_node
+        self._root_keys[name] = key
+        if key is not None:
+            self._names.setdefault(key, name)
+        self._dirty.add(name)
+
+    def __delitem__(self, name):
+        # the component stays while other components refer to it
+        del self._schemas[name]
+        del self._root_keys[name]
+        self._dirty.discard(name)
+
+    def __iter__(self):
+        return iter(self._schemas)
+
+    def __len__(self):
+        return len(self._schemas)
+
+    def invalidate(self, name=None):
+        """
+        Convert the schema registered as ``name`` again on the next
+        :meth:`generate`, or every schema if omitted.
+
+        :type name: str
+        """
+        if name is None:
+            self._names = dict((key, name)
+                               for name, key in self._root_keys.items()
+                               if key is not None)
+            self._components.clear()
+            self._references.clear()
+            self._dirty = set(self._schemas)
+            return
+        if name not in self._schemas:
+            raise KeyError(name)
+        self._dirty.add(name)
+
+    def generate(self):
+        """
+        The ``components`` of an OpenAPI document, holding the ``schemas``
+        by name.
+
+        :rtype: dict
+        """
+        dispatcher = self.dispatcher
+        references = dispatcher.references
+        references.clear()
+        for name, key in self._root_keys.items():
+            if key is not None:
+                references[key] = ('#/definitions/' +
+                                   self._names.setdefault(key, name))
+        dispatcher.taken = set(self._schemas)
+        dispatcher.taken.update(self._names.values())
+        dispatcher.taken.update(self._components)
+        self.converted_schemas = 0
+        self.emitted = []
+        for name, schema_node in self._schemas.items():
+            if name not in self._dirty:
+                continue
+            dispatcher.root_name = name
+            converted = dispatcher.dialect_conversions(
+                dispatcher(schema_node))[0]
+            components = converted.pop('components', None)
+            self._emit(name, converted)
+            if components is not None:
+                for sub_name, component in components['schemas'].items():
+                    self._emit(sub_name, component)
+            self._dirty.discard(name)
+            self.converted_schemas += 1
+        self._collect()
+        return {'schemas': collections.OrderedDict(
+            sorted(self._components.items()))}
+
+    def _emit(self, name, converted):
+        """
+        :type name: str
+        :type converted: dict
+        """
+        self._components[name] = converted
+        self._references[name] = _find_references(converted)
+        self.emitted.append(name)
+
+    def _collect(self):
+        """
+        Drop the components no registered schema uses anymore.
+        """
+        live = set()
+        stack = list(self._schemas)
+        while stack:
+            name = stack.pop()
+            if name not in live:
+                live.add(name)
+                stack.extend(self._references.get(name, ()))
+        for name in list(self._components):
+            if name not in live:
+                del self._components[name]
+                del self._references[name]
+        for key, name in list(self._names.items()):
+            if name not in live:
+                del self._names[key]
@@ -0,0 +1,560 @@
+# -*- coding: utf-8 -*-
+"""
+Translate Python regular expressions into the ECMA 262 dialect of JSON
+Schema ``pattern``.
+
+Named groups become numbered groups, ``\\A`` and ``\\Z`` anchors, the
+``IGNORECASE``, ``DOTALL``, ``MULTILINE`` and ``VERBOSE`` flags, inline or
+scoped, are applied to the pattern itself, and Python only escapes and
+quantifiers are rewritten.  Constructs without an equivalent raise
+:class:`UntranslatablePattern`.  The translation does not try to mimic
+the remaining semantic differences of the engines, e.g. ``$`` before a
+trailing newline or the Unicode ``\\d`` and ``\\w`` of Python 3;
+:func:`compile_pattern` compiles a translation with the ECMA 262 ``$``.
+
+Translations are cached per pattern and flags, so patterns shared by many
+validators are translated once per process.
+"""
+
+import collections
+import re
+import threading
+import unicodedata
+
+try:
+    unichr
+except NameError:  # pragma: no cover
+    unichr = chr
+
+
+_FLAGS = {
+    'i': re.IGNORECASE,
+    'm': re.MULTILINE,
+    's': re.DOTALL,
+    'x': re.VERBOSE,
+    'L': re.LOCALE,
+    'u': re.UNICODE,
+    'a': getattr(re, 'ASCII', 0),
+}
+_SUPPORTED_FLAGS = re.IGNORECASE | re.MULTILINE | re.DOTALL | re.VERBOSE
+
+_class_escapes = set('dDsSwW')
+_anchor_escapes = {'A': '^', 'Z': '$', 'b': '\\b', 'B': '\\B'}
+_control_escapes = {'a': 0x07, 'f': 0x0c, 'n': 0x0a, 'r': 0x0d, 't': 0x09,
+                    'v': 0x0b}
+_quantifier = re.compile(r'\{(\d*)(,?)(\d*)\}')
+_octal_digits = '01234567'
+_max_expanded_range = 0x400
+
+
+class UntranslatablePattern(ValueError):
+    """
+    A construct of a Python regular expression has no ECMA 262 equivalent.
+    """
+
+    def __init__(self, pattern, position, reason):
+        """
+        :type pattern: str
+        :type position: int
+        :type reason: str
+        """
+        super(UntranslatablePattern, self).__init__(
+            '%s at position %d of %r' % (reason, position, pattern))
+        self.pattern = pattern
+        self.position = position
+        self.reason = reason
+
+
+def _swapped_cases(code_point):
+    """
+    Code points of the other cases of ``code_point``.
+
+    :type code_point: int
+    :rtype: list
+    """
+    char = unichr(code_point)
+    swapped = []
+    for other in (char.lower(), char.upper()):
+        if len(other) == 1 and other != char and ord(other) not in swapped:
+            swapped.append(ord(other))
+    return swapped
+
+
+def _escape_code_point(code_point, in_class):
+    """
+    :type code_point: int
+    :type in_class: bool
+    :rtype: str
+    """
+    if code_point > 0xffff:
+        if in_class:
+            return None
+        code_point -= 0x10000
+        return '\\u%04X\\u%04X' % (0xd800 + (code_point >> 10),
+                                   0xdc00 + (code_point & 0x3ff))
+    char = unichr(code_point)
+    if code_point < 0x20 or code_point == 0x7f:
+        return '\\x%02X' % code_point
+    if in_class:
+        if char in '\\]^-[':
+            return '\\' + char
+    elif char in '\\^$.|?*+()[]{}':
+        return '\\' + char
+    if unicodedata.category(char) in ('Cc', 'Cf', 'Zl', 'Zp', 'Cs'):
+        return '\\u%04X' % code_point
+    return char
+
+
+class _Translator(object):
+
+    def __init__(self, pattern, flags):
+        """
+        :type pattern: str
+        :type flags: int
+        """
+        self.pattern = pattern
+        self.position = 0
+        self.groups = {}
+        self.group_count = 0
+        self.flags = [flags]
+        # global flags are only allowed before anything else
+        self.at_start = True
+        self.token_at_start = True
+
+    def error(self, reason, position=None):
+        if position is None:
+            position = self.position
+        return UntranslatablePattern(self.pattern, position, reason)
+
+    def peek(self, length=1):
+        return self.pattern[self.position:self.position + length]
+
+    def check_flags(self, flags, position):
+        if flags & re.LOCALE:
+            raise self.error('the LOCALE flag is not supported', position)
+        return flags & _SUPPORTED_FLAGS
+
+    def translate(self):
+        """
+        :rtype: str
+        """
+        self.flags[0] = self.check_flags(self.flags[0], 0)
+        translated = []
+        pattern = self.pattern
+        while self.position < len(pattern):
+            translated.append(self.translate_token())
+        if len(self.flags) > 1:
+            raise self.error('missing )')
+        return ''.join(translated)
+
+    def translate_token(self):
+        """
+        :rtype: str
+        """
+        pattern = self.pattern
+        start = self.position
+        char = pattern[start]
+        flags = self.flags[-1]
+        self.position += 1
+        self.token_at_start = self.at_start
+        self.at_start = False
+        if flags & re.VERBOSE:
+            if char.isspace():
+                return ''
+            if char == '#':
+                end = pattern.find('\n', self.position)
+                self.position = len(pattern) if end < 0 else end + 1
+                return ''
+        if char == '\\':
+            return self.translate_escape(start)
+        if char == '[':
+            return self.translate_class(start)
+        if char == '(':
+            return self.translate_group(start)
+        if char == ')':
+            if len(self.flags) == 1:
+                raise self.error('unbalanced parenthesis', start)
+            self.flags.pop()
+            return ')'
+        if char == '.':
+            return '[\\s\\S]' if flags & re.DOTALL else '.'
+        if char == '^':
+            return '(?:^|(?<=\\n))' if flags & re.MULTILINE else '^'
+        if char == '$':
+            return '(?=\\n|$)' if flags & re.MULTILINE else '$'
+        if char in '*+?':
+            return char + self.translate_lazy()
+        if char == '{':
+            match = _quantifier.match(pattern, start)
+            if match is None or not (match.group(1) or match.group(3)):
+                return '\\{'
+            self.position = match.end()
+            minimum, comma, maximum = match.groups()
+            return '{%s%s%s}%s' % (minimum or '0', comma, maximum,
+                                   self.translate_lazy())
+        if char == '|':
+            return '|'
+        return self.translate_literal(ord(char))
+
+    def translate_lazy(self):
+        """
+        :rtype: str
+        """
+        char = self.peek()
+        if char == '?':
+            self.position += 1
+            return '?'
+        if char == '+':
+            raise self.error('possessive quantifiers are not supported')
+        return ''
+
+    def translate_literal(self, code_point, in_class=False, start=None):
+        """
+        :type code_point: int
+        :type in_class: bool
+        :type start: int
+        :rtype: str
+        """
+        escaped = _escape_code_point(code_point, in_class)
+        if escaped is None:
+            raise self.error('astral characters in sets are not supported',
+                             start)
+        if self.flags[-1] & re.IGNORECASE:
+            swapped = _swapped_cases(code_point)
+            if swapped:
+                others = [_escape_code_point(other, True) for other in swapped]
+                if in_class:
+                    return escaped + ''.join(others)
+                return '[%s%s]' % (_escape_code_point(code_point, True),
+                                   ''.join(others))
+        return escaped
+
+    def read_hex(self, digits, start):
+        value = self.peek(digits)
+        if len(value) != digits or not all(
+                c in '0123456789abcdefABCDEF' for c in value):
+            raise self.error('bad escape', start)
+        self.position += digits
+        return int(value, 16)
+
+    def read_code_point(self, char, start, in_class):
+        """
+        Code point of the character escape ``char``, or ``None``.
+
+        :rtype: int
+        """
+        pattern = self.pattern
+        if char in _control_escapes:
+            return _control_escapes[char]
+        if char == 'x':
+            return self.read_hex(2, start)
+        if char == 'u':
+            return self.read_hex(4, start)
+        if char == 'U':
+            return self.read_hex(8, start)
+        if char == 'N':
+            end = pattern.find('}', self.position)
+            if self.peek() != '{' or end < 0:
+                raise self.error('bad escape', start)
+            name = pattern[self.position + 1:end]
+            self.position = end + 1
+            try:
+                return ord(unicodedata.lookup(name))
+            except KeyError:
+                raise self.error('unknown character name %r' % name, start)
+        if char == '0' or (char in _octal_digits and
+                           self.peek(2) and
+                           all(c in _octal_digits for c in self.peek(2))):
+            digits = char
+            while (len(digits) < 3 and self.peek() and
+                   self.peek() in _octal_digits):
+                digits += self.peek()
+                self.position += 1
+            return int(digits, 8)
+        if in_class and char == 'b':
+            return 0x08
+        if not char.isalnum():
+            return ord(char)
+        return None
+
+    def translate_escape(self, start):
+        """
+        :rtype: str
+        """
+        pattern = self.pattern
+        if self.position >= len(pattern):
+            raise self.error('trailing backslash', start)
+        char = pattern[self.position]
+        self.position += 1
+        if char in _class_escapes:
+            return '\\' + char
+        if char in _anchor_escapes:
+            return _anchor_escapes[char]
+        code_point = self.read_code_point(char, start, False)
+        if code_point is not None:
+            return self.translate_literal(code_point)
+        if char.isdigit():
+            digits = char
+            if self.peek().isdigit():
+                digits += self.peek()
+                self.position += 1
+            number = int(digits)
+            if number > self.group_count:
+                raise self.error('invalid group reference %d' % number,
+                                 start)
+            return self.translate_reference(number)
+        raise self.error('bad escape \\%s' % char, start)
+
+    def translate_reference(self, number):
+        """
+        :type number: int
+        :rtype: str
+        """
+        if self.peek().isdigit():
+            return '(?:\\%d)' % number
+        return '\\%d' % number
+
+    def translate_group(self, start):
+        """
+        :rtype: str
+        """
+        pattern = self.pattern
+        if self.peek() != '?':
+            self.group_count += 1
+            self.flags.append(self.flags[-1])
+            return '('
+        self.position += 1
+        char = self.peek()
+        if char == 'P':
+            if self.peek(2) == 'P<':
+                end = pattern.find('>', self.position)
+                if end < 0:
+                    raise self.error('missing >', start)
+                self.group_count += 1
+                self.groups[pattern[self.position + 2:end]] = \
+                    self.group_count
+                self.position = end + 1
+                self.flags.append(self.flags[-1])
+                return '('
+            if self.peek(2) == 'P=':
+                end = pattern.find(')', self.position)
+                name = pattern[self.position + 2:end]
+                if end < 0 or name not in self.groups:
+                    raise self.error('unknown group name', start)
+                self.position = end + 1
+                return self.translate_reference(self.groups[name])
+            raise self.error('unknown extension ?P', start)
+        if char == '#':
+            end = pattern.find(')', self.position)
+            if end < 0:
+                raise self.error('missing ), unterminated comment', start)
+            self.position = end + 1
+            return ''
+        if char in (':', '=', '!'):
+            self.position += 1
+            self.flags.append(self.flags[-1])
+            return '(?' + char
+        if self.peek(2) in ('<=', '<!'):
+            self.position += 2
+            self.flags.append(self.flags[-1])
+            return '(?' + pattern[self.position - 2:self.position]
+        if char == '(':
+            raise self.error('conditional groups are not supported', start)
+        if char == '>':
+            raise self.error('atomic groups are not supported', start)
+        return self.translate_flags(start)
+
+    def translate_flags(self, start):
+        """
+        :rtype: str
+        """
+        pattern = self.pattern
+        added = removed = 0
+        sign = 1
+        while self.position < len(pattern):
+            char = pattern[self.position]
+            self.position += 1
+            if char == '-' and sign == 1:
+                sign = -1
+            elif char in _FLAGS:
+                if sign == 1:
+                    added |= _FLAGS[char]
+                else:
+                    removed |= _FLAGS[char]
+            elif char == ':':
+                flags = self.check_flags(self.flags[-1] | added, start)
+                self.flags.append(flags & ~removed)
+                return '(?:'
+            elif char == ')' and sign == 1:
+                if not self.token_at_start or removed:
+                    raise self.error('global flags not at the start of the '
+                                     'expression', start)
+                flags = self.check_flags(self.flags[-1] | added, start)
+                self.flags[-1] = flags
+                self.at_start = True
+                return ''
+            else:
+                break
+        raise self.error('unknown extension', start)
+
+    def translate_class(self, start):
+        """
+        :rtype: str
+        """
+        pattern = self.pattern
+        translated = ['[']
+        if self.peek() == '^':
+            translated.append('^')
+            self.position += 1
+        first = True
+        while True:
+            if self.position >= len(pattern):
+                raise self.error('unterminated character set', start)
+            char = pattern[self.position]
+            if char == ']' and not first:
+                self.position += 1
+                break
+            at_edge = first
+            first = False
+            item_start = self.position
+            item = self.read_class_item()
+            if (self.peek() == '-' and self.peek(2) != '-]' and
+                    len(self.peek(2)) == 2 and isinstance(item, int)):
+                self.position += 1
+                item_end = self.read_class_item()
+                if not isinstance(item_end, int) or item_end < item:
+                    raise self.error('bad character range',
+                                     self.position - 1)
+                translated.append(self.translate_range(item, item_end,
+                                                       item_start))
+            elif item == ord('-') and (at_edge or self.peek() == ']'):
+                translated.append('-')
+            elif isinstance(item, int):
+                translated.append(self.translate_literal(item, True,
+                                                         item_start))
+            else:
+                translated.append(item)
+        translated.append(']')
+        return ''.join(translated)
+
+    def read_class_item(self):
+        """
+        The code point of the next set member, or the translation of a
+        class escape.
+        """
+        start = self.position
+        char = self.pattern[start]
+        self.position += 1
+        if char != '\\':
+            return ord(char)
+        if self.position >= len(self.pattern):
+            raise self.error('trailing backslash', start)
+        char = self.pattern[self.position]
+        self.position += 1
+        if char in _class_escapes:
+            return '\\' + char
+        code_point = self.read_code_point(char, start, True)
+        if code_point is None:
+            raise self.error('bad escape \\%s' % char, start)
+        return code_point
+
+    def translate_range(self, first, last, start):
+        """
+        :type first: int
+        :type last: int
+        :type start: int
+        :rtype: str
+        """
+        def escape(code_point):
+            escaped = _escape_code_point(code_point, True)
+            if escaped is None:
+                raise self.error('astral characters in sets are not '
+                                 'supported', start)
+            return escaped
+
+        translated = '%s-%s' % (escape(first), escape(last))
+        if (self.flags[-1] & re.IGNORECASE and
+                last - first < _max_expanded_range):
+            others = sorted(set(
+                other for code_point in range(first, last + 1)
+                for other in _swapped_cases(code_point)
+                if not first <= other <= last))
+            ranges = []
+            for code_point in others:
+                if ranges and ranges[-1][1] == code_point - 1:
+                    ranges[-1][1] = code_point
+                else:
+                    ranges.append([code_point, code_point])
+            for low, high in ranges:
+                if low == high:
+                    translated += escape(low)
+                else:
+                    translated += '%s-%s' % (escape(low), escape(high))
+        return translated
+
+
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+cache_size = 512
+
+
+def translate_pattern(pattern, flags=0):
+    """
+    ECMA 262 translation of the Python regular expression ``pattern``
+    compiled with ``flags``.
+
+    :type pattern: str
+    :type flags: int
+    :rtype: str
+    :raises UntranslatablePattern:
+    """
+    if isinstance(pattern, bytes) and not isinstance(pattern, str):
+        pattern = pattern.decode('latin-1')
+    key = pattern, flags
+    with _cache_lock:
+        translated = _cache.pop(key, None)
+        if translated is not None:
+            _cache[key] = translated
+            return translated
+    translated = _Translator(pattern, flags).translate()
+    with _cache_lock:
+        _cache[key] = translated
+        while len(_cache) > cache_size:
+            _cache.popitem(last=False)
+    return translated
+
+
+def compile_pattern(pattern):
+    """
+    Compile the ECMA 262 ``pattern`` with Python ``re``.
+
+    ``$`` outside of sets only matches at the end of the string, as in
+    ECMA 262, where the ``$`` of Python also matches before a trailing
+    newline.
+
+    :type pattern: str
+    :rtype: re.RegexObject
+    """
+    compiled = []
+    in_class = False
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        if char == '\\':
+            compiled.append(pattern[position:position + 2])
+            position += 2
+            continue
+        if in_class:
+            in_class = char != ']'
+        elif char == '[':
+            in_class = True
+        elif char == '$':
+            char = '\\Z'
+        compiled.append(char)
+        position += 1
+    return re.compile(''.join(compiled))
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Collect the time spent per converter and per node while converting, to
+find the nodes and converters responsible for slow conversions.
+"""
+
+import heapq
+import itertools
+import threading
+
+from . import ConversionObserver, convert
+
+
+def _class_name(cls):
+    """
+    :type cls: type
+    :rtype: str
+    """
+    return '%s.%s' % (cls.__module__, cls.__name__)
+
+
+def format_path(path):
+    """
+    :type path: tuple
+    :rtype: str
+    """
+    return '/' + '/'.join(path)
+
+
+def _escape(value):
+    """
+    Escape a Prometheus label value.
+
+    :type value: str
+    :rtype: str
+    """
+    return (value.replace('\\', '\\\\').replace('"', '\\"')
+            .replace('\n', '\\n'))
+
+
+class Histogram(object):
+    """
+    Counts of observations per bucket, ``buckets`` being their upper
+    bounds in seconds.
+    """
+
+    buckets = (1e-6, 5e-6, 1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 1e-1,
+               float('inf'))
+
+    def __init__(self):
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, elapsed):
+        """
+        :type elapsed: float
+        """
+        for i, bound in enumerate(self.buckets):
+            if elapsed <= bound:
+                self.counts[i] += 1
+                break
+        self.count += 1
+        self.sum += elapsed
+
+    def cumulative(self):
+        """
+        :rtype: list
+        """
+        cumulative = []
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            cumulative.append((bound, total))
+        return cumulative
+
+    def as_dict(self):
+        """
+        :rtype: dict
+        """
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'buckets': self.cumulative(),
+        }
+
+
+class ProfileCollector(ConversionObserver):
+    """
+    Observer aggregating a time histogram per converter and per validator
+    class, and keeping the ``top`` slowest node paths.  A collector may be
+    shared by concurrent conversions.
+    """
+
+    prefix = 'colander_jsonschema'
+
+    def __init__(self, top=10):
+        """
+        :type top: int
+        """
+        self.top = top
+        self.converters = {}
+        self.validators = {}
+        self._slowest = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def node_exited(self, path, schema_node, converter_class, elapsed):
+        with self._lock:
+            histogram = self.converters.get(converter_class)
+            if histogram is None:
+                histogram = self.converters[converter_class] = Histogram()
+            histogram.observe(elapsed)
+            # the counter breaks ties, paths are not compared
+            entry = (elapsed, next(self._counter), path)
+            if len(self._slowest) < self.top:
+                heapq.heappush(self._slowest, entry)
+            elif entry > self._slowest[0]:
+                heapq.heapreplace(self._slowest, entry)
+
+    def validator_converted(self, path, schema_node, validator, elapsed):
+        with self._lock:
+            validator_class = type(validator)
+            histogram = self.validators.get(validator_class)
+            if histogram is None:
+                histogram = self.validators[validator_class] = Histogram()
+            histogram.observe(elapsed)
+
+    def slowest(self):
+        """
+        The slowest node paths and their conversion times, slowest first.
+
+        :rtype: list
+        """
+        with self._lock:
+            entries = sorted(self._slowest, reverse=True)
+        return [(format_path(path), elapsed) for elapsed, _, path in entries]
+
+    def as_dict(self):
+        """
+        :rtype: dict
+        """
+        with self._lock:
+            converters = dict((_class_name(cls), histogram.as_dict())
+                              for cls, histogram in self.converters.items())
+            validators = dict((_class_name(cls), histogram.as_dict())
+                              for cls, histogram in self.validators.items())
+        return {
+            'converters': converters,
+            'validators': validators,
+            'slowest': self.slowest(),
+        }
+
+    def prometheus(self):
+        """
+        The histograms and the slowest nodes in the Prometheus text
+        exposition format.
+
+        :rtype: str
+        """
+        lines = []
+        data = self.as_dict()
+        for kind, label in (('converters', 'converter'),
+                            ('validators', 'validator')):
+            name = '%s_%s_seconds' % (self.prefix, label)
+            lines.append('# HELP %s Time spent converting, by %s.'
+                         % (name, label))
+            lines.append('# TYPE %s histogram' % name)
+            for class_name, histogram in sorted(data[kind].items()):
+                labels = '%s="%s"' % (label, _escape(class_name))
+                for bound, count in histogram['buckets']:
+                    lines.append('%s_bucket{%s,le="%s"} %d' % (
+                        name, labels,
+                        '+Inf' if bound == float('inf') else repr(bound),
+                        count))
+                lines.append('%s_sum{%s} %r' % (name, labels,
+                                                histogram['sum']))
+                lines.append('%s_count{%s} %d' % (name, labels,
+                                                  histogram['count']))
+        name = '%s_slowest_node_seconds' % self.prefix
+        lines.append('# HELP %s Conversion time of the slowest nodes.' % name)
+        lines.append('# TYPE %s gauge' % name)
+        for path, elapsed in data['slowest']:
+            lines.append('%s{path="%s"} %r' % (name, _escape(path), elapsed))
+        return '\n'.join(lines) + '\n'
+
+
+def profile(schema_node, converters=None, top=10, collector=None):
+    """
+    Convert ``schema_node`` and return the collector of its profile.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :type top: int
+    :type collector: ProfileCollector
+    :rtype: ProfileCollector
+    """
+    if collector is None:
+        collector = ProfileCollector(top)
+    convert(schema_node, converters, observer=collector)
+    return collector
@@ -0,0 +1,493 @@
+# -*- coding: utf-8 -*-
+"""
+Build colander schemas from JSON Schemas, the inverse of
+:func:`colander_jsonschema.convert`.
+
+Subschemas are memoized by content digest, also across documents built by
+the same :class:`SchemaBuilder`, and ``$ref`` targets are built once per
+document, so documents referring to the same definitions many times are
+built in time linear in their size.  Nodes built from the same subschema
+share their children: treat the built schemas as read-only, and
+``clone()`` them before modifying them.
+
+Keywords without a colander equivalent raise :class:`ConversionError`
+rather than being dropped, and ``pattern`` is validated with the search
+semantics of JSON Schema by :class:`Pattern`.
+"""
+
+import collections
+import copy
+import functools
+
+import colander
+
+from . import ConversionError, _freeze, _stable_digest
+from .patterns import compile_pattern
+
+
+_types = {
+    'array': colander.Sequence,
+    'boolean': colander.Boolean,
+    'integer': colander.Integer,
+    'number': colander.Float,
+    'object': colander.Mapping,
+    'string': colander.String,
+}
+_string_formats = {
+    'date': colander.Date,
+    'date-time': colander.DateTime,
+    'time': colander.Time,
+}
+# keywords of the subschemas, not of the node itself
+_structural = frozenset(['properties', 'items', 'required', 'definitions',
+                         '$schema'])
+_annotations = ('title', 'description', 'default')
+_keywords = frozenset(['type', 'enum', 'format', 'minLength', 'maxLength',
+                       'pattern', 'minimum', 'maximum', 'minItems',
+                       'maxItems', 'additionalProperties']) | _structural | \
+    frozenset(_annotations)
+# keywords next to an allOf of a single reference
+_reference_keywords = frozenset(['allOf', '$schema', 'definitions']) | \
+    frozenset(_annotations)
+_unresolved = object()
+
+
+def _node_type(schema):
+    """
+    The JSON type of ``schema`` and whether it is nullable.
+
+    :type schema: dict
+    :rtype: tuple
+    """
+    types = schema.get('type')
+    if types is None:
+        if 'properties' in schema:
+            types = 'object'
+        elif 'items' in schema:
+            types = 'array'
+        else:
+            raise ConversionError('subschema without type: %r' % (schema,))
+    if not isinstance(types, list):
+        types = [types]
+    nullable = 'null' in types
+    types = [t for t in types if t != 'null']
+    if len(types) != 1 or types[0] not in _types:
+        raise ConversionError('unsupported type: %r' % (schema.get('type'),))
+    return types[0], nullable
+
+
+class Pattern(colander.Regex):
+    """
+    Validates strings against the ECMA 262 regular expression of a JSON
+    Schema ``pattern``, which may match anywhere in the string.
+    """
+
+    def __init__(self, pattern, msg=None):
+        """
+        :type pattern: str
+        :type msg: str
+        """
+        super(Pattern, self).__init__(compile_pattern(pattern), msg)
+
+    def __call__(self, node, value):
+        if self.match_object.search(value) is None:
+            raise colander.Invalid(node, self.msg)
+
+
+def _strip_null_choices(choices, json_type):
+    """
+    Remove the null values :func:`convert` adds to the choices of optional
+    nodes.
+
+    :type choices: list
+    :type json_type: str
+    :rtype: list
+    """
+    null_values = ['', None] if json_type == 'string' else [None]
+    if choices[-len(null_values):] == null_values:
+        return choices[:-len(null_values)]
+    return choices
+
+
+def make_validator(schema, json_type, nullable):
+    """
+    :type schema: dict
+    :type json_type: str
+    :type nullable: bool
+    :rtype: object
+    """
+    validators = []
+    if json_type == 'string':
+        min_length = schema.get('minLength')
+        max_length = schema.get('maxLength')
+        if min_length == 1 and max_length is None and not nullable:
+            # added by convert() to every required string
+            min_length = None
+        if min_length is not None or max_length is not None:
+            validators.append(colander.Length(min_length, max_length))
+        if 'pattern' in schema:
+            validators.append(Pattern(schema['pattern']))
+        if schema.get('format') == 'email':
+            validators.append(colander.Email())
+        elif schema.get('format') == 'uri' and hasattr(colander, 'url'):
+            validators.append(colander.url)
+    elif json_type in ('integer', 'number'):
+        if 'minimum' in schema or 'maximum' in schema:
+            validators.append(colander.Range(schema.get('minimum'),
+                                             schema.get('maximum')))
+    elif json_type == 'array':
+        if 'minItems' in schema or 'maxItems' in schema:
+            validators.append(colander.Length(schema.get('minItems'),
+                                              schema.get('maxItems')))
+    if 'enum' in schema:
+        choices = list(schema['enum'])
+        if nullable:
+            choices = _strip_null_choices(choices, json_type)
+        validators.append(colander.OneOf(choices))
+    if not validators:
+        return None
+    if len(validators) == 1:
+        return validators[0]
+    return colander.All(*validators)
+
+
+def make_node(schema, children=()):
+    """
+    Build the node of ``schema`` alone, unnamed and required.
+
+    :type schema: dict
+    :type children: list
+    :rtype: colander.SchemaNode
+    """
+    unknown = set(schema) - _keywords
+    if unknown:
+        raise ConversionError('unsupported keywords %s'
+                              % ', '.join(sorted(unknown)))
+    json_type, nullable = _node_type(schema)
+    schema_type = _types[json_type]
+    if json_type == 'string':
+        schema_type = _string_formats.get(schema.get('format'), schema_type)
+    elif json_type == 'object':
+        extra = schema.get('additionalProperties', True)
+        if extra is False:
+            schema_type = functools.partial(colander.Mapping,
+                                            unknown='raise')
+        elif extra is not True:
+            raise ConversionError('unsupported additionalProperties %r'
+                                  % (extra,))
+    return colander.SchemaNode(
+        schema_type(), *children,
+        name='',
+        title=schema.get('title', ''),
+        description=schema.get('description', ''),
+        default=schema.get('default', colander.null),
+        validator=make_validator(schema, json_type, nullable))
+
+
+def derive(node, name, required, nullable):
+    """
+    ``node`` named ``name``, a copy sharing its children if need be.
+
+    :type node: colander.SchemaNode
+    :type name: str
+    :type required: bool
+    :type nullable: bool
+    :rtype: colander.SchemaNode
+    """
+    if required and not nullable:
+        missing = colander.required
+    elif nullable:
+        missing = None
+    else:
+        missing = colander.drop
+    if node.name == name and node.missing is missing:
+        return node
+    derived = copy.copy(node)
+    derived.name = name
+    derived.missing = missing
+    return derived
+
+
+class SchemaBuilder(object):
+    """
+    Builds colander schemas from JSON Schema documents, remembering the
+    nodes of the ``maxsize`` last built subschemas.
+    """
+
+    def __init__(self, maxsize=10000):
+        """
+        :type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._nodes = collections.OrderedDict()
+
+    def __call__(self, document, name=''):
+        """
+        :type document: dict
+        :type name: str
+        :rtype: colander.SchemaNode
+        """
+        return _DocumentBuilder(self, document).build(name)
+
+    def get(self, digest):
+        """
+        :type digest: str
+        :rtype: colander.SchemaNode
+        """
+        node = self._nodes.pop(digest, None)
+        if node is None:
+            self.misses += 1
+            return None
+        self._nodes[digest] = node
+        self.hits += 1
+        return node
+
+    def set(self, digest, node):
+        """
+        :type digest: str
+        :type node: colander.SchemaNode
+        """
+        self._nodes[digest] = node
+        while len(self._nodes) > self.maxsize:
+            self._nodes.popitem(last=False)
+
+    def clear(self):
+        self._nodes.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+class _DocumentBuilder(object):
+
+    def __init__(self, builder, document):
+        """
+        :type builder: SchemaBuilder
+        :type document: dict
+        """
+        self.builder = builder
+        self.document = document
+        self.targets = {}
+        # id of built subschemas: (digest or None if recursive, node)
+        self.built = {}
+        # id of subschemas being built: node built early for a recursion
+        self.building = {}
+
+    def build(self, name):
+        """
+        :type name: str
+        :rtype: colander.SchemaNode
+        """
+        digest, node = self.build_subschema(self.document)
+        return derive(node, name, True, _node_type(self.resolve(
+            self.document))[1])
+
+    def resolve(self, schema):
+        """
+        The subschema ``schema`` refers to, by ``$ref`` or by an ``allOf``
+        of a single ``$ref`` as :func:`convert` emits next to annotations.
+
+        :type schema: dict
+        :rtype: dict
+        """
+        seen = set()
+        while True:
+            if 'allOf' in schema:
+                if len(schema['allOf']) != 1:
+                    raise ConversionError('allOf of several subschemas is '
+                                          'not supported')
+                unknown = set(schema) - _reference_keywords
+                if unknown:
+                    raise ConversionError('unsupported keywords %s next to '
+                                          'allOf' % ', '.join(sorted(unknown)))
+                schema = schema['allOf'][0]
+            if '$ref' not in schema:
+                return schema
+            ref = schema['$ref']
+            if ref in seen:
+                raise ConversionError('circular reference %r' % (ref,))
+            seen.add(ref)
+            schema = self.target(ref)
+
+    def target(self, ref):
+        """
+        :type ref: str
+        :rtype: dict
+        """
+        target = self.targets.get(ref, _unresolved)
+        if target is not _unresolved:
+            return target
+        if not ref.startswith('#'):
+            raise ConversionError('only local references are supported: %r'
+                                  % (ref,))
+        target = self.document
+        pointer = ref[1:]
+        if pointer:
+            if not pointer.startswith('/'):
+                raise ConversionError('unsupported reference %r' % (ref,))
+            for part in pointer[1:].split('/'):
+                part = part.replace('~1', '/').replace('~0', '~')
+                try:
+                    if isinstance(target, list):
+                        target = target[int(part)]
+                    else:
+                        target = target[part]
+                except (KeyError, IndexError, ValueError, TypeError):
+                    raise ConversionError('unresolvable reference %r'
+                                          % (ref,))
+        self.targets[ref] = target
+        return target
+
+    def subschemas(self, schema):
+        """
+        The ``(name, subschema)`` pairs of the children of ``schema``.
+
+        :type schema: dict
+        :rtype: list
+        """
+        if 'properties' in schema:
+            properties = schema['properties']
+            names = list(properties)
+            # required names are in the order of the children, which the
+            # plain dicts of Python 2 lose
+            ordered = [name for name in schema.get('required', ())
+                       if name in properties]
+            if len(set(ordered)) == len(ordered):
+                required = set(ordered)
+                ordered = iter(ordered)
+                names = [next(ordered) if name in required else name
+                         for name in names]
+            return [(name, properties[name]) for name in names]
+        if 'items' in schema:
+            return [('item', schema['items'])]
+        return []
+
+    def annotate(self, site, digest, node):
+        """
+        Apply the annotations given next to a reference.
+
+        :type site: dict
+        :type digest: str
+        :type node: colander.SchemaNode
+        :rtype: tuple
+        """
+        annotations = [(key, site[key]) for key in _annotations
+                       if key in site]
+        if not annotations:
+            return digest, node
+        if digest is not None:
+            digest = _stable_digest((digest, _freeze(annotations)))
+            annotated = self.builder.get(digest)
+            if annotated is not None:
+                return digest, annotated
+        annotated = copy.copy(node)
+        for key, value in annotations:
+            setattr(annotated, key, value)
+        if digest is not None:
+            self.builder.set(digest, annotated)
+        return digest, annotated
+
+    def build_subschema(self, schema):
+        """
+        Build the nodes of the subschemas below ``schema``, children first,
+        with an explicit stack.
+
+        :type schema: dict
+        :rtype: tuple
+        """
+        built = self.built
+        building = self.building
+        stack = [(schema, False)]
+        while stack:
+            site, completed = stack.pop()
+            key = id(site)
+            if key in built:
+                continue
+            target = self.resolve(site)
+            if target is not site:
+                target_key = id(target)
+                if target_key in built:
+                    built[key] = self.annotate(site, *built[target_key])
+                elif target_key in building:
+                    built[key] = self.annotate(site, None,
+                                               self.early_node(target))
+                else:
+                    stack.append((site, False))
+                    stack.append((target, False))
+                continue
+            if not completed:
+                if key in building:
+                    # recursion, the parents use the early node
+                    self.early_node(site)
+                    continue
+                building[key] = None
+                stack.append((site, True))
+                stack.extend((sub, False) for name, sub
+                             in reversed(self.subschemas(site)))
+                continue
+            built[key] = self.complete(site)
+            del building[key]
+        return built[id(schema)]
+
+    def early_node(self, schema):
+        """
+        Node of a subschema being built, created before its children to
+        close a recursion.
+
+        :type schema: dict
+        :rtype: colander.SchemaNode
+        """
+        node = self.building[id(schema)]
+        if node is None:
+            node = self.building[id(schema)] = make_node(schema)
+        return node
+
+    def complete(self, schema):
+        """
+        :type schema: dict
+        :rtype: tuple
+        """
+        required = set(schema.get('required', ()))
+        children = []
+        child_digests = []
+        recursive = False
+        for name, sub in self.subschemas(schema):
+            digest, node = self.built.get(id(sub), (None, None))
+            if node is None:
+                # refers to a subschema being built
+                digest, node = None, self.early_node(self.resolve(sub))
+            if digest is None:
+                recursive = True
+            nullable = _node_type(self.resolve(sub))[1]
+            if 'items' in schema:
+                required.add(name)
+            children.append(derive(node, name, name in required, nullable))
+            child_digests.append((name, name in required, digest))
+        early = self.building[id(schema)]
+        if early is not None:
+            early.children.extend(children)
+            return None, early
+        if recursive:
+            return None, make_node(schema, children)
+        own = [(k, v) for k, v in schema.items() if k not in _structural]
+        digest = _stable_digest((_freeze(own), tuple(child_digests)))
+        node = self.builder.get(digest)
+        if node is None:
+            node = make_node(schema, children)
+            self.builder.set(digest, node)
+        return digest, node
+
+
+def build(document, name='', builder=None):
+    """
+    Build the colander schema of the JSON Schema ``document``.
+
+    :type document: dict
+    :type name: str
+    :type builder: SchemaBuilder
+    :rtype: colander.SchemaNode
+    """
+    if builder is None:
+        builder = SchemaBuilder()
+    return builder(document, name)
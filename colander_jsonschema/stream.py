@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+Serialize converted schemas to JSON text while converting, without building
+the whole converted dict first.
+"""
+
+import json
+
+from . import ConversionError, TypeConversionDispatcher, finalize_conversion
+
+
+_encode = json.JSONEncoder().encode
+_string_types = (bytes, type(u''))
+_end = object()
+
+
+def _encode_key(key):
+    """
+    :type key: object
+    :rtype: str
+    """
+    if isinstance(key, _string_types):
+        return _encode(key)
+    # like json, non-string keys are serialized and quoted
+    return _encode(_encode(key))
+
+
+class JSONStreamer(object):
+    """
+    Iterates over the JSON text of ``convert(schema_node)``, serialized like
+    ``json.dumps(..., sort_keys=True)``.
+
+    Each node is converted only when the serializer reaches it, and released
+    once written, so only the nodes along the current path and their direct
+    sub-nodes are held in memory.  The subtrees of custom converters
+    overriding ``convert_type()`` or ``__call__()``, which may read the
+    conversions of their sub-nodes, are converted as a whole instead.
+    """
+
+    def __init__(self, schema_node, converters=None):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converters: dict
+        """
+        self.schema_node = schema_node
+        self.dispatcher = TypeConversionDispatcher(converters)
+        self._deferred = {}
+        self._seen = set()
+
+    def convert_into(self, schema_node, converted, depth):
+        """
+        :type schema_node: colander.SchemaNode
+        :type converted: dict
+        :type depth: int
+        """
+        self._seen.add(id(schema_node))
+        if depth >= len(self._seen):
+            raise ConversionError(
+                'recursive schema at %r, convert it with dedup'
+                % (schema_node.name,))
+        for sub_node, target in self.dispatcher.convert_shallow(schema_node,
+                                                                converted):
+            self._deferred[id(target)] = (sub_node, target, depth + 1)
+
+    def __iter__(self):
+        value = {}
+        self.convert_into(self.schema_node, value, 0)
+        value = finalize_conversion(value)
+        deferred = self._deferred
+        # frames: [items, is_dict, closing token, is_first, node conversion]
+        stack = []
+        while True:
+            if isinstance(value, dict):
+                node = deferred.pop(id(value), None)
+                if node is not None:
+                    self.convert_into(*node)
+                if not value:
+                    yield '{}'
+                else:
+                    yield '{'
+                    stack.append([iter(sorted(value.items())), True, '}',
+                                  True, value if node is not None else None])
+            elif isinstance(value, (list, tuple)):
+                if not value:
+                    yield '[]'
+                else:
+                    yield '['
+                    stack.append([iter(value), False, ']', True, None])
+            else:
+                yield _encode(value)
+            while stack:
+                frame = stack[-1]
+                item = next(frame[0], _end)
+                if item is _end:
+                    stack.pop()
+                    yield frame[2]
+                    if frame[4] is not None:
+                        # written out, release the sub-nodes
+                        frame[4].clear()
+                    continue
+                separator = '' if frame[3] else ', '
+                frame[3] = False
+                if frame[1]:
+                    key, value = item
+                    yield separator + _encode_key(key) + ': '
+                else:
+                    value = item
+                    if separator:
+                        yield separator
+                break
+            else:
+                return
+
+
+def iter_convert_chunks(schema_node, converters=None, chunk_size=65536):
+    """
+    Yield the JSON text of ``convert(schema_node, converters)`` in chunks of
+    about ``chunk_size`` characters; the joined chunks equal
+    ``json.dumps(convert(schema_node, converters), sort_keys=True)``.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :type chunk_size: int
+    :rtype: iter
+    """
+    buffered = []
+    size = 0
+    for token in JSONStreamer(schema_node, converters):
+        buffered.append(token)
+        size += len(token)
+        if size >= chunk_size:
+            yield ''.join(buffered)
+            buffered = []
+            size = 0
+    if buffered:
+        yield ''.join(buffered)
+
+
+def convert_to_stream(schema_node, fp, converters=None, chunk_size=65536,
+                      encoding=None):
+    """
+    Write the JSON text of ``convert(schema_node, converters)`` to ``fp``.
+    Pass ``encoding`` for binary files and sockets (``socket.makefile('wb')``).
+
+    :type schema_node: colander.SchemaNode
+    :type fp: file
+    :type converters: dict
+    :type chunk_size: int
+    :type encoding: str
+    """
+    for chunk in iter_convert_chunks(schema_node, converters, chunk_size):
+        if encoding is not None:
+            chunk = chunk.encode(encoding)
+        fp.write(chunk)
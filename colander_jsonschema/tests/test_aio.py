@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import sys
+import unittest
+
+
+@unittest.skipIf(sys.version_info < (3, 5), 'requires Python 3.5')
+class ConvertAsyncTestCase(unittest.TestCase):
+
+    def setUp(self):
+        import asyncio
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def _makeSchema(self, branches=20):
+        import colander
+        schema = colander.SchemaNode(colander.Mapping())
+        for i in range(branches):
+            branch = colander.SchemaNode(colander.Mapping(),
+                                         name='branch%d' % i)
+            for j in range(5):
+                branch.add(colander.SchemaNode(
+                    colander.Integer(), name='leaf%d' % j,
+                    validator=colander.Range(0, j), missing=None))
+            schema.add(branch)
+        return schema
+
+    def _callFUT(self, schema_node, **kw):
+        from ..aio import convert_async
+        return convert_async(schema_node, **kw)
+
+    def _makeCounter(self):
+        from .. import ConversionObserver
+
+        class Counter(ConversionObserver):
+            entered = 0
+            threads = set()
+
+            def node_entered(self, path, schema_node, converter_class):
+                import threading
+                self.entered += 1
+                self.threads.add(threading.current_thread())
+
+        return Counter()
+
+    def test_equal_to_convert(self):
+        from .. import convert
+        schema = self._makeSchema()
+        for kw in ({}, {'dedup': 'structure'}, {'dialect': 'openapi-3.0'},
+                   {'compact': True}):
+            converted = self.loop.run_until_complete(
+                self._callFUT(schema, step=7, **kw))
+            self.assertEqual(converted, convert(schema, **kw), kw)
+
+    def test_yields_to_the_loop(self):
+        ticks = []
+        task = self.loop.create_task(self._callFUT(self._makeSchema(),
+                                                   step=10))
+
+        def tick():
+            ticks.append(None)
+            if not task.done():
+                self.loop.call_soon(tick)
+
+        self.loop.call_soon(tick)
+        self.loop.run_until_complete(task)
+        # 121 nodes in steps of 10
+        self.assertGreaterEqual(len(ticks), 12)
+
+    def test_offload(self):
+        import concurrent.futures
+        import threading
+        from .. import convert
+        schema = self._makeSchema()
+        counter = self._makeCounter()
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            converted = self.loop.run_until_complete(self._callFUT(
+                schema, step=10, executor=executor, offload_threshold=30,
+                observer=counter))
+        self.assertEqual(converted, convert(schema))
+        self.assertEqual(counter.entered, 121)
+        self.assertIn(threading.current_thread(), counter.threads)
+        self.assertEqual(len(counter.threads), 2)
+
+    def test_cancel(self):
+        import asyncio
+        counter = self._makeCounter()
+        task = self.loop.create_task(self._callFUT(
+            self._makeSchema(), step=10, observer=counter))
+        self.loop.call_soon(task.cancel)
+        with self.assertRaises(asyncio.CancelledError):
+            self.loop.run_until_complete(task)
+        self.assertEqual(counter.entered, 10)
+
+    def test_cancel_offloaded(self):
+        import asyncio
+        import concurrent.futures
+        import threading
+        started = concurrent.futures.Future()
+        resumed = threading.Event()
+
+        class Blocking(type(self._makeCounter())):
+
+            def node_entered(self, path, schema_node, converter_class):
+                super(Blocking, self).node_entered(path, schema_node,
+                                                   converter_class)
+                if self.entered == 25:
+                    started.set_result(None)
+                    resumed.wait()
+
+        counter = Blocking()
+        with concurrent.futures.ThreadPoolExecutor(1) as executor:
+            task = self.loop.create_task(self._callFUT(
+                self._makeSchema(), step=10, executor=executor,
+                offload_threshold=20, observer=counter))
+            self.loop.run_until_complete(asyncio.wrap_future(
+                started, loop=self.loop))
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                self.loop.run_until_complete(task)
+            resumed.set()
+        # the executor stopped at the end of the current step
+        self.assertEqual(counter.entered, 30)
+
+    def test_cached(self):
+        from .. import ConversionCache
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        first = self.loop.run_until_complete(self._callFUT(schema,
+                                                           cache=cache))
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(self.loop.run_until_complete(
+            self._callFUT(schema, cache=cache)), first)
+
+    def test_step(self):
+        self.assertRaises(ValueError, self.loop.run_until_complete,
+                          self._callFUT(self._makeSchema(), step=0))
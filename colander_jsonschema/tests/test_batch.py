@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+import colander
+
+
+class Item(colander.MappingSchema):
+    name = colander.SchemaNode(colander.String())
+    count = colander.SchemaNode(colander.Integer(), missing=None)
+
+
+class Unknown(colander.SchemaType):
+    pass
+
+
+class ConvertManyTestCase(unittest.TestCase):
+
+    def _makeSchemas(self):
+        return [
+            Item(),
+            colander.SchemaNode(colander.String(), name='string'),
+            colander.SchemaNode(Unknown(), name='unknown'),
+            colander.SchemaNode(colander.String(), name='unpicklable',
+                                validator=lambda node, value: None),
+        ]
+
+    def _assertResults(self, results, backend):
+        from .. import NoSuchConverter, convert
+        schemas = self._makeSchemas()
+        self.assertEqual([result.key for result in results], [0, 1, 2, 3])
+        self.assertEqual(results[0].converted, convert(schemas[0]))
+        self.assertEqual(results[1].converted, convert(schemas[1]))
+        self.assertIsNone(results[2].converted)
+        self.assertIsInstance(results[2].error, NoSuchConverter)
+        self.assertEqual(results[3].converted, convert(schemas[3]))
+        for result in results:
+            self.assertTrue(result.elapsed >= 0)
+        self.assertEqual(results[0].backend, backend)
+
+    def test_process(self):
+        from ..batch import convert_many
+        results = convert_many(self._makeSchemas(), workers=2)
+        self._assertResults(results, 'process')
+        self.assertEqual(results[3].backend, 'serial')
+
+    def test_thread(self):
+        from ..batch import convert_many
+        results = convert_many(self._makeSchemas(), workers=2,
+                               backend='thread')
+        self._assertResults(results, 'thread')
+
+    def test_serial(self):
+        from ..batch import convert_many
+        results = convert_many(self._makeSchemas(), workers=1)
+        self._assertResults(results, 'serial')
+
+    def test_mapping(self):
+        import collections
+        from .. import convert
+        from ..batch import convert_many
+        schemas = collections.OrderedDict([('item', Item()),
+                                           ('other', Item())])
+        results = convert_many(schemas, workers=2)
+        self.assertEqual([result.key for result in results],
+                         ['item', 'other'])
+        self.assertEqual(results[1].converted, convert(Item()))
+
+    def test_unknown_backend(self):
+        from ..batch import convert_many
+        self.assertRaises(ValueError, convert_many, [], backend='unknown')
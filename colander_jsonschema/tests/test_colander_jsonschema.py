@@ -453,3 +453,1696 @@ class MappingSchemaTestCase(unittest.TestCase):
                 },
             }
         })
+
+
+class ConversionCacheTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class BaseMapping(colander.MappingSchema):
+            name = colander.SchemaNode(colander.String(),
+                                       validator=colander.Length(max=10))
+            tags = colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.String(), name='tag'),
+                default=['a'],
+            )
+
+        return BaseMapping()
+
+    def test_hit(self):
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        first = convert(schema, cache=cache)
+        second = convert(schema, cache=cache)
+        self.assertDictEqual(first, second)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(cache.misses, 1)
+
+    def test_clone_hits(self):
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        convert(schema, cache=cache)
+        convert(schema.clone(), cache=cache)
+        convert(self._makeSchema(), cache=cache)
+        self.assertEqual(cache.hits, 2)
+        self.assertEqual(len(cache), 1)
+
+    def test_structure_change_misses(self):
+        import colander
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        convert(schema, cache=cache)
+        schema['name'].validator = colander.Length(max=20)
+        # fingerprints are memoized per node until invalidated
+        cache.invalidate(schema)
+        ret = convert(schema, cache=cache)
+        self.assertEqual(ret['properties']['name']['maxLength'], 20)
+        self.assertEqual(cache.hits, 0)
+        other = self._makeSchema()
+        other['name'].validator = colander.Length(max=20)
+        convert(other, cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+    def test_key_is_memoized(self):
+        import colander
+        from .. import ConversionCache
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        key = cache.make_key(schema)
+        schema['name'].validator = colander.Length(max=20)
+        self.assertEqual(cache.make_key(schema), key)
+        cache.invalidate(schema)
+        self.assertNotEqual(cache.make_key(schema), key)
+        self.assertEqual(len(cache._fingerprints), 1)
+        del schema
+        self.assertEqual(len(cache._fingerprints), 0)
+
+    def test_deep(self):
+        import colander
+        import sys
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        root = node = colander.SchemaNode(colander.Mapping(), name='n')
+        for i in range(sys.getrecursionlimit() + 100):
+            child = colander.SchemaNode(colander.Mapping(), name='n')
+            node.add(child)
+            node = child
+        first = convert(root, cache=cache)
+        second = convert(root, cache=cache)
+        self.assertEqual(cache.hits, 1)
+        self.assertEqual(list(second['properties']),
+                         list(first['properties']))
+
+    def test_mutating_result_is_safe(self):
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        expected = convert(schema)
+        ret = convert(schema, cache=cache)
+        ret['properties']['name']['type'] = 'broken'
+        ret['required'].append('broken')
+        ret = convert(schema, cache=cache)
+        ret['properties']['tags']['default'].append('broken')
+        self.assertDictEqual(convert(schema, cache=cache), expected)
+
+    def test_converters_are_part_of_key(self):
+        import colander
+        from .. import ConversionCache, StringTypeConverter
+        cache = ConversionCache()
+        node = colander.SchemaNode(colander.Int())
+        self.assertNotEqual(
+            cache.make_key(node),
+            cache.make_key(node, {colander.Int: StringTypeConverter}))
+        self.assertEqual(cache.make_key(node), cache.make_key(node, {}))
+
+    def test_lru_eviction(self):
+        import colander
+        from .. import ConversionCache, convert
+        cache = ConversionCache(maxsize=2)
+        nodes = [colander.SchemaNode(colander.String(), name=name)
+                 for name in ('a', 'b', 'c')]
+        for node in nodes:
+            convert(node, cache=cache)
+        self.assertEqual(len(cache), 2)
+        convert(nodes[0], cache=cache)
+        self.assertEqual(cache.hits, 0)
+        convert(nodes[2], cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+    def test_invalidate(self):
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        convert(schema, cache=cache)
+        cache.invalidate(schema)
+        self.assertEqual(len(cache), 0)
+        convert(schema, cache=cache)
+        cache.invalidate()
+        self.assertEqual(len(cache), 0)
+
+    def test_invalidate_dialect(self):
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = self._makeSchema()
+        for dialect in (None, 'draft-07', 'openapi-3.0'):
+            convert(schema, cache=cache, dialect=dialect)
+        cache.invalidate(schema, dialect='openapi-3.0')
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get(cache.make_key(schema,
+                                                   dialect='openapi-3.0')))
+        self.assertIsNotNone(cache.get(cache.make_key(schema,
+                                                      dialect='draft-07')))
+        convert(schema, cache=cache, dedup='structure')
+        cache.invalidate(schema)
+        self.assertEqual(list(cache._entries),
+                         [cache.make_key(schema, dedup='structure')])
+
+    def test_invalidate_sub_node(self):
+        import colander
+        from .. import ConversionCache, convert
+        cache = ConversionCache()
+        schema = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(
+                colander.Mapping(),
+                colander.SchemaNode(colander.String(), name='x'),
+                name='addr'))
+        convert(schema, cache=cache)
+        schema['addr'].add(colander.SchemaNode(colander.String(),
+                                               name='zip'))
+        cache.invalidate(schema['addr'])
+        ret = convert(schema, cache=cache)
+        self.assertEqual(ret['properties']['addr']['required'],
+                         ['x', 'zip'])
+        self.assertEqual(cache.hits, 0)
+
+    def test_schema_class_is_part_of_key(self):
+        import colander
+        from .. import ConversionCache, convert
+
+        def make_class(name):
+            return type(str(name), (colander.MappingSchema,), {
+                'street': colander.SchemaNode(colander.String())})
+
+        def make_root(*classes):
+            root = colander.SchemaNode(colander.Mapping())
+            for index, schema_class in enumerate(classes):
+                root.add(schema_class(name='n%d' % index))
+            return root
+
+        address = make_class('Address')
+        location = make_class('Location')
+        cache = ConversionCache()
+        for dedup, trees in (
+                ('structure', [(address, address), (location, location)]),
+                ('class', [(address, address), (address, location)])):
+            for classes in trees:
+                self.assertEqual(
+                    convert(make_root(*classes), cache=cache, dedup=dedup),
+                    convert(make_root(*classes), dedup=dedup), dedup)
+        self.assertEqual(cache.hits, 0)
+
+
+class CompileTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Item(colander.MappingSchema):
+            name = colander.SchemaNode(
+                colander.String(),
+                validator=colander.All(colander.Length(max=10),
+                                       colander.OneOf(['a', 'b'])))
+            count = colander.SchemaNode(colander.Integer(), missing=None,
+                                        validator=colander.Range(0, 9))
+
+        class Items(colander.SequenceSchema):
+            item = Item()
+
+        class Root(colander.MappingSchema):
+            items = Items(validator=colander.Length(min=1))
+            other = Items(default=[])
+            created = colander.SchemaNode(colander.DateTime())
+
+        return Root()
+
+    def test_equal_to_convert(self):
+        from .. import compile, convert
+        schema = self._makeSchema()
+        plan = compile(schema)
+        self.maxDiff = None
+        self.assertDictEqual(plan(), convert(schema))
+        self.assertEqual(len(plan), 10)
+
+    def test_emits_independent_results(self):
+        from .. import compile, convert
+        schema = self._makeSchema()
+        plan = compile(schema)
+        first = plan()
+        first['properties']['items']['items']['required'].append('broken')
+        first['properties']['other']['default'].append('broken')
+        first['properties']['created']['title'] = 'broken'
+        self.assertDictEqual(plan(), convert(schema))
+        self.assertIsNot(plan()['properties']['items'],
+                         plan()['properties']['items'])
+
+    def test_leaf(self):
+        import colander
+        from .. import compile, convert
+        node = colander.SchemaNode(colander.String(), missing=None)
+        self.assertDictEqual(compile(node)(), convert(node))
+
+    def test_converter_reads_sub_nodes(self):
+        import colander
+        from .. import ObjectTypeConverter, compile, convert
+
+        class ClosedObjectConverter(ObjectTypeConverter):
+
+            def convert_type(self, schema_node, converted):
+                converted = super(ClosedObjectConverter, self).convert_type(
+                    schema_node, converted)
+                for sub in converted['properties'].values():
+                    if sub.get('type') == 'array':
+                        sub['items']['additionalProperties'] = False
+                return converted
+
+        schema = self._makeSchema()
+        converters = {colander.Mapping: ClosedObjectConverter}
+        expected = convert(schema, converters)
+        self.assertFalse(expected['properties']['items']['items']
+                         ['additionalProperties'])
+        self.assertDictEqual(compile(schema, converters)(), expected)
+
+
+class DeduplicationTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Address(colander.MappingSchema):
+            street = colander.SchemaNode(colander.String())
+            city = colander.SchemaNode(colander.String())
+
+        class Addresses(colander.SequenceSchema):
+            address = Address()
+
+        class Person(colander.MappingSchema):
+            billing = Address()
+            shipping = Address(missing=None)
+            home = Address(description='where the person lives')
+            others = Addresses()
+
+        return Person()
+
+    def test_structure(self):
+        from .. import convert
+        ret = convert(self._makeSchema(), dedup='structure')
+        self.maxDiff = None
+        self.assertDictEqual(ret, {
+            '$schema': 'http://json-schema.org/draft-04/schema#',
+            'type': 'object',
+            'required': ['billing', 'home', 'others'],
+            'properties': {
+                'billing': {
+                    'title': 'Billing',
+                    'allOf': [{'$ref': '#/definitions/Address'}],
+                },
+                'shipping': {
+                    'type': ['object', 'null'],
+                    'title': 'Shipping',
+                    'required': ['street', 'city'],
+                    'properties': {
+                        'street': {'type': 'string', 'minLength': 1,
+                                   'title': 'Street'},
+                        'city': {'type': 'string', 'minLength': 1,
+                                 'title': 'City'},
+                    },
+                },
+                'home': {
+                    'title': 'Home',
+                    'description': 'where the person lives',
+                    'allOf': [{'$ref': '#/definitions/Address'}],
+                },
+                'others': {
+                    'type': 'array',
+                    'title': 'Others',
+                    'items': {
+                        'title': 'Address',
+                        'allOf': [{'$ref': '#/definitions/Address'}],
+                    },
+                },
+            },
+            'definitions': {
+                'Address': {
+                    'type': 'object',
+                    'required': ['street', 'city'],
+                    'properties': {
+                        'street': {'type': 'string', 'minLength': 1,
+                                   'title': 'Street'},
+                        'city': {'type': 'string', 'minLength': 1,
+                                 'title': 'City'},
+                    },
+                },
+            },
+        })
+
+    def test_class_mode_matches_structure_here(self):
+        from .. import convert
+        schema = self._makeSchema()
+        self.assertDictEqual(convert(schema, dedup='class'),
+                             convert(schema, dedup=True))
+
+    def test_class_mode_ignores_generic_nodes(self):
+        import colander
+        from .. import convert
+
+        def make_pair(name):
+            pair = colander.SchemaNode(colander.Mapping(), name=name)
+            pair.add(colander.SchemaNode(colander.String(), name='key'))
+            return pair
+
+        schema = colander.SchemaNode(colander.Mapping())
+        schema.add(make_pair('first'))
+        schema.add(make_pair('second'))
+        self.assertNotIn('definitions', convert(schema, dedup='class'))
+        self.assertIn('definitions', convert(schema, dedup='structure'))
+
+    def test_no_repetition(self):
+        import colander
+        from .. import convert
+        node = colander.SchemaNode(colander.String())
+        self.assertDictEqual(convert(node, dedup=True), convert(node))
+
+    def test_nested_repetition_is_inlined_once(self):
+        import colander
+        from .. import convert
+
+        class Point(colander.MappingSchema):
+            x = colander.SchemaNode(colander.Integer())
+
+        class Line(colander.MappingSchema):
+            start = Point()
+            end = Point()
+
+        class Drawing(colander.MappingSchema):
+            first = Line()
+            second = Line()
+
+        ret = convert(Drawing(), dedup=True)
+        self.assertEqual(sorted(ret['definitions']), ['Line', 'Point'])
+        self.assertEqual(ret['definitions']['Line']['properties']['start'],
+                         {'title': 'Start',
+                          'allOf': [{'$ref': '#/definitions/Point'}]})
+
+    def test_recursive(self):
+        import colander
+        from .. import convert
+        tree = colander.SchemaNode(colander.Mapping(), name='tree')
+        tree.add(colander.SchemaNode(colander.String(), name='label'))
+        tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                     name='children', missing=None))
+        root = colander.SchemaNode(colander.Mapping())
+        root.add(tree)
+        ret = convert(root, dedup=True)
+        self.assertEqual(ret['properties']['tree'], {
+            'title': 'Tree',
+            'allOf': [{'$ref': '#/definitions/Tree'}],
+        })
+        children = ret['definitions']['Tree']['properties']['children']
+        self.assertEqual(children['items'], {
+            'title': 'Tree',
+            'allOf': [{'$ref': '#/definitions/Tree'}],
+        })
+
+    def test_recursive_root(self):
+        import colander
+        from .. import convert
+        tree = colander.SchemaNode(colander.Mapping(), name='tree')
+        tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                     name='children', missing=None))
+        ret = convert(tree, dedup=True)
+        self.assertNotIn('definitions', ret)
+        self.assertEqual(ret['properties']['children']['items'],
+                         {'title': 'Tree', 'allOf': [{'$ref': '#'}]})
+
+    def test_unknown_mode(self):
+        import colander
+        from .. import convert
+        node = colander.SchemaNode(colander.String())
+        self.assertRaises(ValueError, convert, node, dedup='unknown')
+
+    def test_report(self):
+        from .. import deduplication_report
+        report = deduplication_report(self._makeSchema())
+        self.assertEqual(report['definitions'], {'Address': 3})
+        self.assertLess(report['size'], report['inline_size'])
+        self.assertEqual(report['saved'],
+                         report['inline_size'] - report['size'])
+
+    def test_report_recursive(self):
+        import colander
+        from .. import deduplication_report
+        tree = colander.SchemaNode(colander.Mapping(), name='tree')
+        tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                     name='children', missing=None))
+        report = deduplication_report(tree)
+        self.assertIsNone(report['inline_size'])
+        self.assertIsNone(report['ratio'])
+
+
+class WalkTestCase(unittest.TestCase):
+
+    def test_deep(self):
+        import colander
+        import sys
+        from .. import convert
+        depth = sys.getrecursionlimit() * 2
+        root = node = colander.SchemaNode(colander.Mapping())
+        for i in range(depth):
+            sub_node = colander.SchemaNode(colander.Mapping(), name='n')
+            node.add(sub_node)
+            node = sub_node
+        node.add(colander.SchemaNode(colander.String(), name='leaf'))
+        ret = convert(root)
+        for i in range(depth):
+            self.assertEqual(ret['required'], ['n'])
+            ret = ret['properties']['n']
+        self.assertEqual(ret['properties']['leaf']['type'], 'string')
+
+    def test_order_is_preserved(self):
+        import colander
+        import sys
+        from .. import convert
+        names = ['n%d' % i for i in range(50)]
+        root = colander.SchemaNode(colander.Mapping())
+        for name in names:
+            root.add(colander.SchemaNode(colander.Integer(), name=name))
+        ret = convert(root)
+        self.assertEqual(ret['required'], names)
+        if sys.version_info >= (3, 7):
+            # dicts keep the insertion order
+            self.assertEqual(list(ret['properties']), names)
+
+    def test_recursive_without_dedup(self):
+        import colander
+        from .. import ConversionError, convert
+        tree = colander.SchemaNode(colander.Mapping(), name='tree')
+        tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                     name='children'))
+        self.assertRaises(ConversionError, convert, tree)
+
+    def test_converter_reads_sub_nodes(self):
+        import colander
+        from .. import ConversionObserver, ObjectTypeConverter, convert
+
+        class ClosedObjectConverter(ObjectTypeConverter):
+
+            def convert_type(self, schema_node, converted):
+                converted = super(ClosedObjectConverter, self).convert_type(
+                    schema_node, converted)
+                for sub in converted['properties'].values():
+                    if sub.get('type') in ('object', ['object', 'null']):
+                        sub['additionalProperties'] = False
+                return converted
+
+        class Paths(ConversionObserver):
+            paths = []
+
+            def node_entered(self, path, schema_node, converter_class):
+                self.paths.append(path)
+
+        def make_branch(name):
+            return colander.SchemaNode(
+                colander.Mapping(),
+                colander.SchemaNode(colander.String(), name='leaf'),
+                colander.SchemaNode(
+                    colander.Mapping(),
+                    colander.SchemaNode(colander.Integer(), name='count'),
+                    name='inner'),
+                name=name)
+
+        schema = colander.SchemaNode(
+            colander.Mapping(), make_branch('a'), make_branch('b'),
+            colander.SchemaNode(colander.Sequence(), make_branch('item'),
+                                name='items'))
+        converters = {colander.Mapping: ClosedObjectConverter}
+        observer = Paths()
+        for kw in ({}, {'compact': True}, {'dedup': 'structure'},
+                   {'dialect': 'draft-07'}, {'observer': observer}):
+            ret = convert(schema, converters, **kw)
+            if 'definitions' in ret:
+                branch = ret['definitions']['A']
+            else:
+                branch = ret['properties']['a']
+                self.assertFalse(branch['additionalProperties'], kw)
+                self.assertFalse(
+                    ret['properties']['items']['items']['properties']
+                    ['inner']['additionalProperties'], kw)
+            self.assertFalse(
+                branch['properties']['inner']['additionalProperties'], kw)
+            self.assertEqual(
+                branch['properties']['inner']['properties']['count'],
+                {'type': 'integer', 'title': 'Count'}, kw)
+        self.assertIn(('items', 'item', 'inner', 'count'), observer.paths)
+        self.assertEqual(len(observer.paths), 14)
+
+    def test_iter_walk(self):
+        import colander
+        from .. import DeduplicatingDispatcher, TypeConversionDispatcher
+        root = colander.SchemaNode(colander.Mapping())
+        for i in range(3):
+            branch = colander.SchemaNode(colander.Mapping(), name='b%d' % i)
+            branch.add(colander.SchemaNode(colander.Integer(),
+                                           name='n%d' % i))
+            root.add(branch)
+        for dispatcher_class in (TypeConversionDispatcher,
+                                 DeduplicatingDispatcher):
+            steps = list(dispatcher_class().iter_walk(root, 2))
+            # 7 nodes
+            self.assertEqual(steps[:-1], [None] * 3)
+            self.assertEqual(steps[-1], dispatcher_class()(root))
+        dispatcher = TypeConversionDispatcher()
+        walk = dispatcher.iter_walk(root, 2)
+        next(walk)
+        walk.close()
+        self.assertEqual(dispatcher(root), TypeConversionDispatcher()(root))
+
+    def test_converter_returning_new_dict(self):
+        import colander
+        from .. import ObjectTypeConverter, TypeConversionDispatcher
+
+        class Custom(colander.Mapping):
+            pass
+
+        class CustomConverter(ObjectTypeConverter):
+
+            def convert_type(self, schema_node, converted):
+                converted = super(CustomConverter, self).convert_type(
+                    schema_node, converted)
+                return dict(converted, custom=True)
+
+        class Dispatcher(TypeConversionDispatcher):
+            converters = dict(TypeConversionDispatcher.converters)
+            converters[Custom] = CustomConverter
+
+        node = colander.SchemaNode(colander.Mapping())
+        sub_node = colander.SchemaNode(Custom(), name='custom')
+        sub_node.add(colander.SchemaNode(colander.String(), name='leaf'))
+        node.add(sub_node)
+        ret = Dispatcher()(node)
+        self.assertTrue(ret['properties']['custom']['custom'])
+        self.assertEqual(
+            ret['properties']['custom']['properties']['leaf']['type'],
+            'string')
+
+
+class DispatchTestCase(unittest.TestCase):
+
+    def _makeDispatcher(self):
+        from .. import TypeConversionDispatcher
+
+        class Dispatcher(TypeConversionDispatcher):
+            converters = dict(TypeConversionDispatcher.converters)
+
+        return Dispatcher()
+
+    def test_subclass(self):
+        import colander
+        from .. import convert
+
+        class Slug(colander.String):
+            pass
+
+        class Document(colander.Mapping):
+            pass
+
+        node = colander.SchemaNode(Document())
+        node.add(colander.SchemaNode(Slug(), name='slug'))
+        ret = convert(node)
+        self.assertEqual(ret['type'], 'object')
+        self.assertEqual(ret['properties']['slug'],
+                         {'type': 'string', 'minLength': 1, 'title': 'Slug'})
+
+    def test_nearest_base_wins(self):
+        import colander
+        from .. import BooleanTypeConverter, IntegerTypeConverter
+
+        class Base(colander.Integer):
+            pass
+
+        class Flag(Base):
+            pass
+
+        dispatcher = self._makeDispatcher()
+        self.assertIs(dispatcher.resolve(Flag), IntegerTypeConverter)
+        dispatcher.register(Base, BooleanTypeConverter)
+        self.assertIs(dispatcher.resolve(Flag), BooleanTypeConverter)
+        node = colander.SchemaNode(Flag())
+        self.assertEqual(dispatcher(node)['type'], 'boolean')
+
+    def test_unknown(self):
+        import colander
+        from .. import NoSuchConverter
+
+        class Unknown(colander.SchemaType):
+            pass
+
+        dispatcher = self._makeDispatcher()
+        node = colander.SchemaNode(Unknown())
+        self.assertRaises(NoSuchConverter, dispatcher, node)
+        self.assertIsNone(dispatcher.resolve(Unknown))
+
+
+class ConverterRegistryTestCase(unittest.TestCase):
+
+    def test_layers(self):
+        import colander
+        from .. import (
+            BooleanTypeConverter,
+            ConverterRegistry,
+            IntegerTypeConverter,
+            StringTypeConverter,
+        )
+        base = ConverterRegistry({colander.Integer: IntegerTypeConverter,
+                                  colander.String: StringTypeConverter})
+        layer = base.extend({colander.Integer: BooleanTypeConverter})
+        self.assertIs(layer[colander.Integer], BooleanTypeConverter)
+        self.assertIs(layer[colander.String], StringTypeConverter)
+        self.assertIs(base[colander.Integer], IntegerTypeConverter)
+        self.assertEqual(len(layer), 2)
+        self.assertEqual(set(layer), set([colander.Integer, colander.String]))
+        self.assertRaises(KeyError, layer.__getitem__, colander.Date)
+
+    def test_converters_do_not_leak(self):
+        import colander
+        from .. import (
+            BooleanTypeConverter,
+            IntegerTypeConverter,
+            TypeConversionDispatcher,
+            convert,
+        )
+        node = colander.SchemaNode(colander.Integer())
+        ret = convert(node, {colander.Integer: BooleanTypeConverter})
+        self.assertEqual(ret['type'], 'boolean')
+        self.assertEqual(convert(node)['type'], 'integer')
+        self.assertIs(TypeConversionDispatcher.converters[colander.Integer],
+                      IntegerTypeConverter)
+        dispatcher = TypeConversionDispatcher()
+        dispatcher.register(colander.Integer, BooleanTypeConverter)
+        self.assertEqual(dispatcher(node)['type'], 'boolean')
+        self.assertEqual(convert(node)['type'], 'integer')
+
+    def test_default_registry_is_shared(self):
+        from .. import TypeConversionDispatcher
+        self.assertIs(TypeConversionDispatcher().converters,
+                      TypeConversionDispatcher().converters)
+
+    def test_default_registry_follows_class_dict(self):
+        import colander
+        from .. import (
+            BooleanTypeConverter,
+            StringTypeConverter,
+            TypeConversionDispatcher,
+            convert,
+        )
+        node = colander.SchemaNode(colander.String())
+        self.assertEqual(convert(node)['type'], 'string')
+        converters = TypeConversionDispatcher.converters
+        converters[colander.String] = BooleanTypeConverter
+        try:
+            self.assertEqual(convert(node)['type'], 'boolean')
+        finally:
+            converters[colander.String] = StringTypeConverter
+        self.assertEqual(convert(node)['type'], 'string')
+
+    def test_concurrent_convert(self):
+        import colander
+        import threading
+        from .. import StringTypeConverter, convert
+
+        def make_converter(index):
+            return type(str('Converter%d' % index), (StringTypeConverter,),
+                        {'format': 'tenant-%d' % index})
+
+        schema = colander.SchemaNode(colander.Mapping())
+        for i in range(20):
+            schema.add(colander.SchemaNode(colander.String(),
+                                           name='s%d' % i))
+        expected = convert(schema)
+        errors = []
+
+        def run(index):
+            converters = None
+            if index % 2:
+                converters = {colander.String: make_converter(index)}
+            try:
+                for i in range(50):
+                    ret = convert(schema, converters)
+                    for value in ret['properties'].values():
+                        if converters is None:
+                            assert 'format' not in value, value
+                        else:
+                            assert value['format'] == 'tenant-%d' % index
+                    if converters is None:
+                        assert ret == expected
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(i,))
+                   for i in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+
+    def test_nested_convert(self):
+        import colander
+        from .. import (
+            NoSuchConverter,
+            StringTypeConverter,
+            TypeConversionDispatcher,
+            convert,
+        )
+
+        class Unknown(colander.SchemaType):
+            pass
+
+        class Converter(StringTypeConverter):
+            def convert_type(self, schema_node, converted):
+                converted = super(Converter, self).convert_type(
+                    schema_node, converted)
+                example = colander.SchemaNode(colander.Integer())
+                converted['example'] = convert(example)['type']
+                return converted
+
+        schema = colander.SchemaNode(colander.Mapping())
+        schema.add(colander.SchemaNode(colander.String(), name='s'))
+        schema.add(colander.SchemaNode(Unknown(), name='u'))
+        self.assertRaises(NoSuchConverter, convert, schema)
+        del schema['u']
+        converters = TypeConversionDispatcher.converters
+        converters[colander.String] = Converter
+        try:
+            ret = convert(schema)
+        finally:
+            converters[colander.String] = StringTypeConverter
+        self.assertEqual(ret['properties']['s']['example'], 'integer')
+        self.assertNotIn('example', convert(schema)['properties']['s'])
+
+
+class AllocationTestCase(unittest.TestCase):
+
+    def _makeSchema(self, nodes, **kw):
+        import colander
+        schema = colander.SchemaNode(colander.Mapping())
+        for i in range(nodes):
+            schema.add(colander.SchemaNode(colander.String(),
+                                           name='s%d' % i, **kw))
+        return schema
+
+    def _traceWalk(self, schema):
+        try:
+            import tracemalloc
+        except ImportError:  # pragma: no cover
+            self.skipTest('tracemalloc is not available')
+        import colander_jsonschema
+        from .. import TypeConversionDispatcher
+        dispatcher = TypeConversionDispatcher()
+        dispatcher(schema)
+        tracemalloc.start()
+        try:
+            ret = dispatcher(schema)
+            current, peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+        finally:
+            tracemalloc.stop()
+        snapshot = snapshot.filter_traces([
+            tracemalloc.Filter(True, colander_jsonschema.__file__)])
+        self.assertTrue(ret)
+        blocks = sum(stat.count for stat in snapshot.statistics('filename'))
+        return blocks, current, peak
+
+    def test_blocks_per_node(self):
+        nodes = 1000
+        for kw, per_node in (({}, 2), ({'missing': None}, 4)):
+            blocks, current, peak = self._traceWalk(
+                self._makeSchema(nodes, **kw))
+            # a fragment and its keys per node, and the type list of
+            # nullable nodes, with some slack
+            self.assertLessEqual(blocks, nodes * per_node * 5 // 4, kw)
+            # nothing but the pending sub-nodes is held while walking
+            self.assertLessEqual(peak - current, current, kw)
+
+    def test_converters_per_walk(self):
+        import colander
+        from .. import TypeConversionDispatcher, TypeConverter
+
+        class Slug(colander.String):
+            pass
+
+        schema = self._makeSchema(100, missing=None)
+        for i in range(10):
+            schema.add(colander.SchemaNode(
+                colander.Integer(), name='i%d' % i,
+                validator=colander.Range(0, i)))
+            schema.add(colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(Slug(), name='slug'), name='q%d' % i))
+        instances = []
+        init = TypeConverter.__init__
+
+        def counting_init(converter, dispatcher):
+            instances.append(type(converter))
+            init(converter, dispatcher)
+
+        TypeConverter.__init__ = counting_init
+        try:
+            dispatcher = TypeConversionDispatcher()
+            expected = dispatcher(schema)
+            self.assertEqual(dispatcher(schema), expected)
+        finally:
+            TypeConverter.__init__ = init
+        # one converter per class, whatever the schema types and walks
+        self.assertEqual(len(instances), 4)
+        self.assertEqual(len(set(instances)), 4)
+
+    def test_converters_are_bound_once(self):
+        import colander
+        from .. import StringTypeConverter, TypeConversionDispatcher
+        instances = []
+
+        class Converter(StringTypeConverter):
+
+            def __init__(self, dispatcher):
+                super(Converter, self).__init__(dispatcher)
+                instances.append(self)
+
+        class Slug(colander.String):
+            pass
+
+        schema = self._makeSchema(10)
+        schema.add(colander.SchemaNode(Slug(), name='slug'))
+        dispatcher = TypeConversionDispatcher({colander.String: Converter})
+        dispatcher(schema)
+        dispatcher(schema)
+        self.assertEqual(len(instances), 1)
+
+
+class IncrementalConversionTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Address(colander.MappingSchema):
+            street = colander.SchemaNode(colander.String())
+            city = colander.SchemaNode(colander.String())
+
+        class Addresses(colander.SequenceSchema):
+            address = Address()
+
+        class Root(colander.MappingSchema):
+            name = colander.SchemaNode(colander.String())
+            home = Address()
+            others = Addresses()
+
+        return Root()
+
+    def test_equal_to_convert(self):
+        from .. import IncrementalConversion, convert
+        schema = self._makeSchema()
+        handle = IncrementalConversion(schema)
+        self.assertDictEqual(handle.convert(), convert(schema))
+        self.assertEqual(handle.converted_nodes, 9)
+        self.assertDictEqual(handle.convert(), convert(schema))
+        self.assertEqual(handle.converted_nodes, 0)
+
+    def test_add(self):
+        import colander
+        from .. import IncrementalConversion, convert
+        schema = self._makeSchema()
+        handle = IncrementalConversion(schema)
+        before = handle.convert()
+        home = schema['home']
+        home.add(colander.SchemaNode(colander.Integer(), name='zip'))
+        handle.invalidate(home)
+        after = handle.convert()
+        self.assertDictEqual(after, convert(schema))
+        # root, home and zip
+        self.assertEqual(handle.converted_nodes, 3)
+        self.assertIs(after['properties']['others']['items'],
+                      before['properties']['others']['items'])
+        self.assertNotIn('zip', before['properties']['home']['properties'])
+
+    def test_remove(self):
+        from .. import IncrementalConversion, convert
+        schema = self._makeSchema()
+        handle = IncrementalConversion(schema)
+        handle.convert()
+        address = schema['others']['address']
+        del address['street']
+        handle.invalidate(address)
+        self.assertDictEqual(handle.convert(), convert(schema))
+        self.assertEqual(handle.converted_nodes, 3)
+        others = schema['others']
+        del schema['others']
+        handle.invalidate(schema)
+        self.assertDictEqual(handle.convert(), convert(schema))
+        self.assertEqual(handle.converted_nodes, 1)
+        self.assertNotIn(others, handle)
+        self.assertNotIn(address, handle)
+        # root, name, home and the street and city shared with home
+        self.assertEqual(len(handle._fragments), 5)
+
+    def test_validator(self):
+        import colander
+        from .. import IncrementalConversion, convert
+        schema = self._makeSchema()
+        handle = IncrementalConversion(schema)
+        handle.convert()
+        name = schema['name']
+        name.validator = colander.Length(max=10)
+        handle.invalidate(name)
+        converted = handle.convert()
+        self.assertDictEqual(converted, convert(schema))
+        self.assertEqual(converted['properties']['name']['maxLength'], 10)
+        self.assertEqual(handle.converted_nodes, 2)
+
+    def test_converter_reads_sub_nodes(self):
+        import colander
+        from .. import IncrementalConversion, ObjectTypeConverter, convert
+
+        class Closed(colander.Mapping):
+            pass
+
+        class ClosedObjectConverter(ObjectTypeConverter):
+
+            def convert_type(self, schema_node, converted):
+                converted = super(ClosedObjectConverter, self).convert_type(
+                    schema_node, converted)
+                for sub in converted['properties'].values():
+                    if 'properties' in sub:
+                        sub['additionalProperties'] = False
+                return converted
+
+        converters = {Closed: ClosedObjectConverter}
+        schema = self._makeSchema()
+        home = colander.SchemaNode(
+            Closed(), schema['home'].clone(), name='home')
+        home['home'].name = 'geo'
+        schema['home'] = home
+        handle = IncrementalConversion(schema, converters)
+        converted = handle.convert()
+        self.assertDictEqual(converted, convert(schema, converters))
+        self.assertFalse(converted['properties']['home']['properties']
+                         ['geo']['additionalProperties'])
+        geo = home['geo']
+        geo.add(colander.SchemaNode(colander.String(), name='zip'))
+        handle.invalidate(geo)
+        self.assertDictEqual(handle.convert(), convert(schema, converters))
+        # root and home, converted with its subtree
+        self.assertEqual(handle.converted_nodes, 2)
+        del home['geo']
+        handle.invalidate(home)
+        self.assertDictEqual(handle.convert(), convert(schema, converters))
+        self.assertNotIn(geo, handle)
+
+    def test_invalidate_all(self):
+        from .. import IncrementalConversion
+        schema = self._makeSchema()
+        handle = IncrementalConversion(schema)
+        handle.convert()
+        handle.invalidate()
+        handle.convert()
+        self.assertEqual(handle.converted_nodes, 9)
+
+    def test_unknown_node(self):
+        import colander
+        from .. import ConversionError, IncrementalConversion
+        handle = IncrementalConversion(self._makeSchema())
+        handle.convert()
+        node = colander.SchemaNode(colander.String(), name='unknown')
+        self.assertRaises(ConversionError, handle.invalidate, node)
+
+    def test_recursive(self):
+        import colander
+        from .. import ConversionError, IncrementalConversion
+        schema = colander.SchemaNode(colander.Mapping(), name='node')
+        schema.add(schema)
+        handle = IncrementalConversion(schema)
+        self.assertRaises(ConversionError, handle.convert)
+
+
+class LazyConversionTestCase(unittest.TestCase):
+
+    def _makeSchema(self, width=3):
+        import colander
+        schema = colander.SchemaNode(colander.Mapping(), name='root')
+        for i in range(width):
+            branch = colander.SchemaNode(colander.Mapping(),
+                                         name='branch%d' % i)
+            branch.add(colander.SchemaNode(
+                colander.String(), name='name',
+                validator=colander.Length(max=5)))
+            items = colander.SchemaNode(colander.Sequence(), name='items')
+            items.add(colander.SchemaNode(colander.Integer(), name='item'))
+            branch.add(items)
+            schema.add(branch)
+        return schema
+
+    def _makeConverters(self, converted):
+        import colander
+        from .. import (ArrayTypeConverter, IntegerTypeConverter,
+                        ObjectTypeConverter, StringTypeConverter)
+        converters = {}
+        for schema_type, base in ((colander.Mapping, ObjectTypeConverter),
+                                  (colander.Sequence, ArrayTypeConverter),
+                                  (colander.String, StringTypeConverter),
+                                  (colander.Integer, IntegerTypeConverter)):
+
+            class Converter(base):
+
+                # not convert_type(), whose overrides convert eagerly
+                def convert_validator(self, schema_node):
+                    converted.append(schema_node.name)
+                    return super(type(self), self).convert_validator(
+                        schema_node)
+
+            converters[schema_type] = Converter
+        return converters
+
+    def test_equal_to_convert(self):
+        from .. import LazySchema, convert
+        schema = self._makeSchema()
+        lazy = convert(schema, lazy=True)
+        self.assertIsInstance(lazy, LazySchema)
+        self.assertEqual(lazy, convert(schema))
+        self.assertEqual(convert(schema), lazy)
+
+    def test_converts_on_access(self):
+        from .. import convert
+        converted = []
+        schema = self._makeSchema()
+        lazy = convert(schema, self._makeConverters(converted), lazy=True)
+        self.assertFalse(lazy.loaded)
+        self.assertEqual(converted, [])
+        self.assertEqual(sorted(lazy['properties']),
+                         ['branch0', 'branch1', 'branch2'])
+        self.assertEqual(converted, ['root'])
+        branch = lazy['properties']['branch1']
+        self.assertFalse(branch.loaded)
+        self.assertEqual(branch['properties']['items']['items']['type'],
+                         'integer')
+        self.assertEqual(converted, ['root', 'branch1', 'items', 'item'])
+        self.assertFalse(branch['properties']['name'].loaded)
+
+    def test_materialize(self):
+        import json
+        from .. import convert
+        schema = self._makeSchema()
+        lazy = convert(schema, lazy=True)
+        lazy['properties']['branch0']['type']
+        materialized = lazy.materialize()
+        self.assertIs(type(materialized), dict)
+        self.assertDictEqual(materialized, convert(schema))
+        self.assertEqual(json.dumps(materialized, sort_keys=True),
+                         json.dumps(convert(schema), sort_keys=True))
+        branch = lazy['properties']['branch2'].materialize()
+        self.assertDictEqual(branch,
+                             convert(schema)['properties']['branch2'])
+
+    def test_converter_reads_sub_nodes(self):
+        import colander
+        from .. import ObjectTypeConverter, convert
+
+        class ClosedObjectConverter(ObjectTypeConverter):
+
+            def convert_type(self, schema_node, converted):
+                converted = super(ClosedObjectConverter, self).convert_type(
+                    schema_node, converted)
+                for sub in converted['properties'].values():
+                    if 'properties' in sub:
+                        sub['additionalProperties'] = False
+                return converted
+
+        schema = self._makeSchema()
+        converters = {colander.Mapping: ClosedObjectConverter}
+        expected = convert(schema, converters)
+        lazy = convert(schema, converters, lazy=True)
+        self.assertEqual(dict(lazy['properties']['branch1']),
+                         expected['properties']['branch1'])
+        self.assertDictEqual(lazy.materialize(), expected)
+
+    def test_read_only(self):
+        from .. import convert
+        lazy = convert(self._makeSchema(), lazy=True)
+        with self.assertRaises(TypeError):
+            lazy['title'] = 'changed'
+
+    def test_dedup(self):
+        from .. import ConversionCache, ConversionError, convert
+        schema = self._makeSchema()
+        self.assertRaises(ConversionError, convert, schema, lazy=True,
+                          dedup='structure')
+        self.assertRaises(ConversionError, convert, schema, lazy=True,
+                          cache=ConversionCache())
+
+    def test_observer_and_compact(self):
+        from .. import ConversionError, ConversionObserver, convert
+        schema = self._makeSchema()
+        self.assertRaises(ConversionError, convert, schema, lazy=True,
+                          observer=ConversionObserver())
+        self.assertRaises(ConversionError, convert, schema, lazy=True,
+                          compact=True)
+
+
+class ValidatorDispatchTestCase(unittest.TestCase):
+
+    def test_subclass(self):
+        import colander
+        from .. import convert
+
+        class Slug(colander.Length):
+            pass
+
+        node = colander.SchemaNode(colander.String(), validator=Slug(max=5))
+        self.assertEqual(convert(node)['maxLength'], 5)
+
+    def test_resolve(self):
+        import colander
+        from .. import StringTypeConverter, convert_regex_validator
+        dispatcher = StringTypeConverter.convert_validator
+        converters = dispatcher.resolve(colander.Email)
+        self.assertIs(converters[0], convert_regex_validator)
+        self.assertEqual(len(converters), 1)
+        self.assertIs(dispatcher.resolve(colander.Email), converters)
+        self.assertEqual(
+            dispatcher.resolve(colander.All),
+            (dispatcher.convert_all_validator,))
+
+    def test_extend(self):
+        import colander
+        from .. import StringTypeConverter, converts_validators, convert
+
+        class Slug(colander.Regex):
+
+            def __init__(self):
+                super(Slug, self).__init__(r'^[a-z-]+$')
+
+        @converts_validators(Slug)
+        def convert_slug_validator(schema_node, validator):
+            return {'format': 'slug'}
+
+        class SlugConverter(StringTypeConverter):
+            convert_validator = StringTypeConverter.convert_validator.extend(
+                convert_slug_validator)
+
+        node = colander.SchemaNode(
+            colander.String(),
+            validator=colander.All(Slug(), colander.Length(max=5)))
+        converted = convert(node, {colander.String: SlugConverter})
+        self.assertEqual(converted['format'], 'slug')
+        self.assertEqual(converted['maxLength'], 5)
+        self.assertNotIn('format', convert(node))
+
+    def test_probed(self):
+        import colander
+        from .. import ValidatorConversionDispatcher
+
+        def convert_function_validator(schema_node, validator):
+            if isinstance(validator, colander.Function):
+                return {'format': 'custom'}
+
+        dispatcher = ValidatorConversionDispatcher(convert_function_validator)
+        node = colander.SchemaNode(
+            colander.String(),
+            validator=colander.Function(lambda value: True))
+        self.assertEqual(dispatcher(node), {'format': 'custom'})
+        node.validator = colander.Length(max=1)
+        self.assertEqual(dispatcher(node), {})
+
+    def test_all_flattened_once(self):
+        import colander
+        from .. import _flatten_all_validator, convert
+        length = colander.Length(max=5)
+        regex = colander.Regex(r'^a')
+        oneof = colander.OneOf(['a'])
+        validator = colander.All(length, colander.All(regex,
+                                                      colander.All(oneof)))
+        flattened = _flatten_all_validator(validator)
+        self.assertEqual(flattened, (length, regex, oneof))
+        self.assertIs(_flatten_all_validator(validator), flattened)
+        validator.validators = (length,)
+        self.assertEqual(_flatten_all_validator(validator), (length,))
+        node = colander.SchemaNode(
+            colander.String(),
+            validator=colander.All(colander.All(length), regex))
+        converted = convert(node)
+        self.assertEqual(converted['maxLength'], 5)
+        self.assertEqual(converted['pattern'], '^a')
+
+
+class CompactTestCase(unittest.TestCase):
+
+    def _makeSchema(self, branches=3):
+        import colander
+        schema = colander.SchemaNode(colander.Mapping(), name='root')
+        for i in range(branches):
+            branch = colander.SchemaNode(colander.Mapping(),
+                                         name='branch%d' % i)
+            branch.add(colander.SchemaNode(colander.String(), name='name',
+                                           title=''))
+            branch.add(colander.SchemaNode(colander.DateTime(),
+                                           name='created', title='',
+                                           missing=None))
+            branch.add(colander.SchemaNode(
+                colander.Integer(), name='count', title='',
+                validator=colander.Range(0, 9), default=1))
+            schema.add(branch)
+        return schema
+
+    def test_equal_to_convert(self):
+        from .. import convert
+        schema = self._makeSchema()
+        self.assertDictEqual(convert(schema, compact=True), convert(schema))
+
+    def test_shared_leaves(self):
+        from .. import convert
+        properties = convert(self._makeSchema(), compact=True)['properties']
+        for name in ('name', 'created', 'count'):
+            self.assertIs(properties['branch0']['properties'][name],
+                          properties['branch2']['properties'][name])
+        self.assertIsNot(properties['branch0'], properties['branch1'])
+
+    def test_default_mode_shares_nothing(self):
+        from .. import convert
+        converted = convert(self._makeSchema())
+        first = converted['properties']['branch0']['properties']['created']
+        other = converted['properties']['branch1']['properties']['created']
+        self.assertIsNot(first, other)
+        first['type'].append('broken')
+        self.assertEqual(other['type'], ['string', 'null'])
+        self.assertEqual(convert(self._makeSchema())['properties']['branch0']
+                         ['properties']['created']['type'],
+                         ['string', 'null'])
+
+    def test_later_conversions_share_nothing(self):
+        import colander
+        from .. import convert
+        node = colander.SchemaNode(colander.String(), missing=None)
+        converted = convert(node, compact=True)
+        converted['type'].append('integer')
+        self.assertEqual(convert(node, compact=True)['type'],
+                         ['string', 'null'])
+        self.assertEqual(convert(node)['type'], ['string', 'null'])
+        properties = convert(self._makeSchema(), compact=True)['properties']
+        properties['branch0']['properties']['created']['type'].append('x')
+        self.assertEqual(convert(self._makeSchema(), compact=True)
+                         ['properties']['branch1']['properties']['created']
+                         ['type'], ['string', 'null'])
+
+    def test_equal_values_of_other_types(self):
+        import colander
+        from .. import convert
+        schema = colander.SchemaNode(colander.Mapping())
+        schema.add(colander.SchemaNode(colander.Integer(), name='a',
+                                       title='', default=1))
+        schema.add(colander.SchemaNode(colander.Integer(), name='b',
+                                       title='', default=True))
+        properties = convert(schema, compact=True)['properties']
+        self.assertIs(properties['b']['default'], True)
+        self.assertIsNot(properties['a'], properties['b'])
+
+    def test_fragments_are_interned(self):
+        from .. import (DateTimeTypeConverter, StringTypeConverter,
+                        TypeConversionDispatcher)
+        dispatcher = TypeConversionDispatcher()
+        converter = StringTypeConverter(dispatcher)
+        fragment, lists = converter.get_fragment(True)
+        self.assertEqual(fragment, {'type': 'string', 'minLength': 1})
+        self.assertEqual(lists, ())
+        self.assertIs(StringTypeConverter(dispatcher).get_fragment(True)[0],
+                      fragment)
+        fragment, lists = DateTimeTypeConverter(dispatcher).get_fragment(
+            False)
+        self.assertEqual(fragment, {'type': ['string', 'null'],
+                                    'format': 'date-time'})
+        self.assertEqual(lists, ('type',))
+
+    def test_custom_fragment(self):
+        import colander
+        from .. import StringTypeConverter, convert
+
+        class SlugConverter(StringTypeConverter):
+
+            def make_fragment(self, required):
+                fragment = super(SlugConverter, self).make_fragment(required)
+                fragment['format'] = 'slug'
+                return fragment
+
+        node = colander.SchemaNode(colander.String(), title='')
+        self.assertEqual(convert(node, {colander.String: SlugConverter}),
+                         {'type': 'string', 'minLength': 1, 'format': 'slug',
+                          '$schema': 'http://json-schema.org/draft-04/'
+                                     'schema#'})
+
+    def test_observed(self):
+        from .. import convert
+        from ..profiling import ProfileCollector
+        schema = self._makeSchema()
+        collector = ProfileCollector(top=100)
+        self.assertDictEqual(
+            convert(schema, compact=True, observer=collector),
+            convert(schema))
+        self.assertEqual(
+            sorted(path for path, _ in collector.slowest()),
+            sorted(['/'] + ['/branch%d' % i for i in range(3)] +
+                   ['/branch%d/%s' % (i, name) for i in range(3)
+                    for name in ('name', 'created', 'count')]))
+
+    def test_dedup(self):
+        from .. import ConversionError, convert
+        self.assertRaises(ConversionError, convert, self._makeSchema(),
+                          compact=True, dedup='structure')
+
+    def test_memory(self):
+        try:
+            import tracemalloc
+        except ImportError:  # pragma: no cover
+            self.skipTest('tracemalloc is not available')
+        from .. import convert
+        schema = self._makeSchema(200)
+        convert(schema)
+
+        def measure(compact):
+            tracemalloc.start()
+            try:
+                converted = convert(schema, compact=compact)
+                self.assertTrue(converted)
+                return tracemalloc.get_traced_memory()[0]
+            finally:
+                tracemalloc.stop()
+
+        self.assertLess(measure(True) * 2, measure(False))
+
+
+class DialectTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Address(colander.MappingSchema):
+            street = colander.SchemaNode(
+                colander.String(), validator=colander.Length(2, 20))
+            zip = colander.SchemaNode(
+                colander.String(), missing=colander.drop,
+                validator=colander.OneOf(['1', '2']))
+
+        class Person(colander.MappingSchema):
+            home = Address(title='Home')
+            work = Address(title='Work')
+            age = colander.SchemaNode(colander.Integer(), missing=None)
+
+        return Person()
+
+    def _callFUT(self, schema_node, dialects, **kw):
+        from .. import convert_dialects
+        return convert_dialects(schema_node, dialects, **kw)
+
+    def test_draft4(self):
+        from .. import convert
+        schema = self._makeSchema()
+        self.assertEqual(convert(schema, dialect='draft-04'), convert(schema))
+
+    def test_draft7(self):
+        from .. import convert
+        schema = self._makeSchema()
+        expected = convert(schema)
+        expected['$schema'] = 'http://json-schema.org/draft-07/schema#'
+        self.assertEqual(convert(schema, dialect='draft-07'), expected)
+
+    def test_openapi(self):
+        from .. import convert
+        converted = convert(self._makeSchema(), dialect='openapi-3.0')
+        self.assertNotIn('$schema', converted)
+        self.assertEqual(converted['properties']['age'],
+                         {'type': 'integer', 'nullable': True,
+                          'title': 'Age'})
+        zip_code = converted['properties']['home']['properties']['zip']
+        self.assertEqual(zip_code['type'], 'string')
+        self.assertTrue(zip_code['nullable'])
+
+    def test_definitions(self):
+        converted = self._callFUT(self._makeSchema(),
+                                  ['2020-12', 'openapi-3.0', 'draft-04'],
+                                  dedup='structure')
+        self.assertEqual(list(converted),
+                         ['2020-12', 'openapi-3.0', 'draft-04'])
+        latest = converted['2020-12']
+        self.assertNotIn('definitions', latest)
+        self.assertIn('Address', latest['$defs'])
+        self.assertEqual(latest['properties']['home'],
+                         {'$ref': '#/$defs/Address', 'title': 'Home'})
+        openapi = converted['openapi-3.0']
+        self.assertNotIn('definitions', openapi)
+        address = openapi['components']['schemas']['Address']
+        self.assertTrue(address['properties']['zip']['nullable'])
+        self.assertEqual(openapi['properties']['work'],
+                         {'allOf': [{'$ref': '#/components/schemas/Address'}],
+                          'title': 'Work'})
+        self.assertEqual(
+            converted['draft-04']['properties']['home']['allOf'],
+            [{'$ref': '#/definitions/Address'}])
+
+    def test_single_walk_equals_separate_conversions(self):
+        from .. import convert
+        from ..dialects import dialects
+        schema = self._makeSchema()
+        for dedup in (None, 'structure', 'class'):
+            converted = self._callFUT(schema, list(dialects), dedup=dedup)
+            for name, result in converted.items():
+                self.assertEqual(result,
+                                 convert(schema, dedup=dedup, dialect=name),
+                                 (dedup, name))
+            self.assertEqual(converted['draft-04'],
+                             convert(schema, dedup=dedup))
+
+    def test_outputs_share_no_containers(self):
+        converted = self._callFUT(self._makeSchema(),
+                                  ['draft-07', 'openapi-3.0'])
+        draft7 = converted['draft-07']['properties']['age']
+        openapi = converted['openapi-3.0']['properties']['age']
+        self.assertEqual(draft7['type'], ['integer', 'null'])
+        draft7['type'].append('string')
+        self.assertEqual(openapi['type'], 'integer')
+        self.assertIsNot(converted['draft-07']['required'],
+                         converted['openapi-3.0']['required'])
+
+    def test_valid_documents(self):
+        try:
+            import jsonschema
+        except ImportError:  # pragma: no cover
+            self.skipTest('jsonschema is not installed')
+        converted = self._callFUT(self._makeSchema(), ['draft-07'],
+                                  dedup='structure')['draft-07']
+        jsonschema.Draft7Validator.check_schema(converted)
+        checker = jsonschema.Draft7Validator(converted)
+        self.assertTrue(checker.is_valid(
+            {'home': {'street': 'Main'}, 'work': {'street': 'Side',
+                                                  'zip': '1'},
+                      'age': None}))
+        self.assertFalse(checker.is_valid(
+            {'home': {'street': 'M'}, 'work': {'street': 'Side'}}))
+
+    def test_cached(self):
+        from .. import ConversionCache, convert
+        schema = self._makeSchema()
+        cache = ConversionCache()
+        draft4 = convert(schema, cache=cache)
+        openapi = convert(schema, cache=cache, dialect='openapi-3.0')
+        self.assertNotEqual(openapi, draft4)
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(convert(schema, cache=cache, dialect='openapi-3.0'),
+                         openapi)
+        self.assertEqual(convert(schema, cache=cache, dialect='draft-04'),
+                         draft4)
+        self.assertEqual(len(cache), 2)
+
+    def test_errors(self):
+        from .. import ConversionError, TypeConversionDispatcher, convert
+        schema = self._makeSchema()
+        self.assertRaises(ValueError, convert, schema, dialect='draft-03')
+        self.assertRaises(ConversionError, convert, schema, lazy=True,
+                          dialect='draft-07')
+        self.assertRaises(ConversionError, TypeConversionDispatcher,
+                          compact=True, dialects=['draft-07', 'openapi-3.0'])
+
+
+def _positive(node, value):
+    pass
+
+
+class FingerprintTestCase(unittest.TestCase):
+
+    def _callFUT(self, schema_node):
+        from .. import fingerprint
+        return fingerprint(schema_node)
+
+    def _makeSchema(self):
+        import colander
+
+        class Address(colander.MappingSchema):
+            street = colander.SchemaNode(colander.String(),
+                                         validator=colander.Length(1, 50))
+            zip = colander.SchemaNode(colander.String(), missing=None,
+                                      validator=colander.Regex(r'^\d+$'))
+
+        class Person(colander.MappingSchema):
+            name = colander.SchemaNode(colander.String(), title='Full Name')
+            age = colander.SchemaNode(colander.Integer(), default=20,
+                                      validator=colander.Range(0, 150))
+            kind = colander.SchemaNode(
+                colander.String(),
+                validator=colander.OneOf(['user', 'admin']))
+            home = Address()
+            work = Address()
+
+        return Person()
+
+    def test_stable(self):
+        schema = self._makeSchema()
+        digest = self._callFUT(schema)
+        self.assertEqual(len(digest), 40)
+        self.assertEqual(self._callFUT(schema), digest)
+        self.assertEqual(self._callFUT(schema.clone()), digest)
+        self.assertEqual(self._callFUT(self._makeSchema()), digest)
+
+    def test_pinned(self):
+        import colander
+        schema = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.String(), name='name',
+                                validator=colander.Length(max=10)),
+            colander.SchemaNode(colander.Integer(), name='count', default=1,
+                                missing=None))
+        # the same in every process, Python version and release
+        self.assertEqual(self._callFUT(schema),
+                         'c650ec9c7b161d233f3c5c0b800853d678afec0a')
+
+    def test_changes(self):
+        import colander
+        digest = self._callFUT(self._makeSchema())
+        changes = [
+            lambda s: setattr(s['name'], 'title', 'Name'),
+            lambda s: setattr(s['name'], 'description', 'Given name'),
+            lambda s: setattr(s['age'], 'default', 21),
+            lambda s: setattr(s['age'], 'default', colander.null),
+            lambda s: setattr(s['age'], 'missing', 20),
+            lambda s: setattr(s['age'], 'validator', colander.Range(0, 99)),
+            lambda s: setattr(s['age'], 'typ', colander.Float()),
+            lambda s: setattr(s['name'], 'name', 'full_name'),
+            lambda s: setattr(s['home']['zip'], 'validator',
+                              colander.Regex(r'^\d*$')),
+            lambda s: s.children.reverse(),
+            lambda s: s['work'].children.pop(),
+            lambda s: s.add(colander.SchemaNode(colander.Bool(),
+                                                name='active')),
+        ]
+        digests = set([digest])
+        for change in changes:
+            schema = self._makeSchema()
+            change(schema)
+            digests.add(self._callFUT(schema))
+        self.assertEqual(len(digests), len(changes) + 1)
+
+    def test_equivalent_validators(self):
+        import colander
+
+        def make(validator):
+            return colander.SchemaNode(colander.String(), name='kind',
+                                       validator=validator)
+
+        self.assertEqual(
+            self._callFUT(make(colander.OneOf(['a', 'b']))),
+            self._callFUT(make(colander.OneOf(('a', 'b')))))
+        self.assertEqual(
+            self._callFUT(make(colander.All(
+                colander.Length(1), colander.All(colander.Length(max=5))))),
+            self._callFUT(make(colander.All(colander.Length(1),
+                                            colander.Length(max=5)))))
+        self.assertNotEqual(self._callFUT(make(colander.Length(True))),
+                            self._callFUT(make(colander.Length(1))))
+
+    def test_sibling_validators(self):
+        import colander
+
+        def make(*validators):
+            return colander.SchemaNode(colander.Mapping(), *[
+                colander.SchemaNode(colander.String(), name='s%d' % i,
+                                    validator=validator)
+                for i, validator in enumerate(validators)])
+
+        # equal but for the types of their values, unlike their encodings
+        digest = self._callFUT(make(colander.Length(1), colander.Length(1)))
+        for other in (colander.Length(1.0), colander.Length(True)):
+            self.assertNotEqual(
+                self._callFUT(make(colander.Length(1), other)), digest)
+        self.assertNotEqual(
+            self._callFUT(make(colander.All(colander.Length(1)),
+                               colander.All(colander.Length(True)))),
+            self._callFUT(make(colander.All(colander.Length(1)),
+                               colander.All(colander.Length(1)))))
+
+    def test_function_validator(self):
+        from .. import _CanonicalEncoder
+        encode = _CanonicalEncoder()
+        self.assertEqual(
+            encode(_positive),
+            u'Fcolander_jsonschema.tests.test_colander_jsonschema._positive')
+        self.assertNotEqual(encode(lambda node, value: None),
+                            encode(lambda node, value: value))
+
+    def test_shared_and_recursive(self):
+        import colander
+        leaf = colander.SchemaNode(colander.String(), name='label')
+        branch = colander.SchemaNode(colander.Mapping(), leaf, name='branch')
+        shared = colander.SchemaNode(colander.Mapping(), branch, branch,
+                                     leaf)
+        copied = colander.SchemaNode(colander.Mapping(), branch.clone(),
+                                     branch.clone(), leaf.clone())
+        self.assertEqual(self._callFUT(shared), self._callFUT(copied))
+
+        def make_tree():
+            tree = colander.SchemaNode(colander.Mapping(), name='tree')
+            tree.add(colander.SchemaNode(colander.String(), name='label'))
+            tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                         name='children'))
+            return tree
+
+        digest = self._callFUT(make_tree())
+        self.assertEqual(self._callFUT(make_tree()), digest)
+        tree = make_tree()
+        tree['label'].title = 'Name'
+        self.assertNotEqual(self._callFUT(tree), digest)
+
+    def test_large_subtrees(self):
+        import colander
+        # subtrees too long to be inlined in the text of their parent
+        shared = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.String(), name='label'),
+            name='shared')
+        branch = colander.SchemaNode(colander.Mapping(), shared,
+                                     name='branch')
+        for i in range(300):
+            branch.add(colander.SchemaNode(colander.String(),
+                                           name='field%d' % i))
+
+        def make_root(first, second, last):
+            return colander.SchemaNode(
+                colander.Mapping(),
+                colander.SchemaNode(colander.Mapping(), first, name='a'),
+                colander.SchemaNode(colander.Mapping(), second, name='b'),
+                last)
+
+        digest = self._callFUT(make_root(branch, branch, shared))
+        copied = make_root(branch.clone(), branch.clone(), shared.clone())
+        self.assertEqual(self._callFUT(copied), digest)
+        copied['b']['branch']['field299'].title = 'Last'
+        self.assertNotEqual(self._callFUT(copied), digest)
+
+    def test_deep(self):
+        import colander
+        import sys
+        root = node = colander.SchemaNode(colander.Mapping(), name='n')
+        for i in range(sys.getrecursionlimit() + 100):
+            child = colander.SchemaNode(colander.Mapping(), name='n')
+            node.add(child)
+            node = child
+        node.add(colander.SchemaNode(colander.String(), name='leaf'))
+        self.assertEqual(len(self._callFUT(root)), 40)
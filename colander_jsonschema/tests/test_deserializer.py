@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class CompileDeserializerTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Item(colander.MappingSchema):
+            name = colander.SchemaNode(
+                colander.String(),
+                validator=colander.All(colander.Length(max=5),
+                                       colander.Regex('^[a-z]+$')))
+            count = colander.SchemaNode(colander.Integer(), missing=None,
+                                        validator=colander.Range(0, 9))
+            kind = colander.SchemaNode(colander.String(),
+                                       missing=colander.drop,
+                                       validator=colander.OneOf(['a', 'b']))
+            ratio = colander.SchemaNode(colander.Float(), missing=0.5)
+            active = colander.SchemaNode(colander.Boolean(), missing=False)
+            created = colander.SchemaNode(colander.Date(), missing=None)
+
+        class Items(colander.SequenceSchema):
+            item = Item()
+
+        class Root(colander.MappingSchema):
+            items = Items(validator=colander.Length(min=1, max=3))
+            flag = colander.SchemaNode(
+                colander.Boolean(true_choices=('yes',)))
+            point = colander.SchemaNode(
+                colander.Tuple(),
+                colander.SchemaNode(colander.Integer(), name='x'),
+                colander.SchemaNode(colander.Integer(), name='y'),
+                missing=colander.drop)
+
+        return Root()
+
+    def _callFUT(self, schema_node, converters=None):
+        from ..deserializer import compile_deserializer
+        return compile_deserializer(schema_node, converters)
+
+    def assertSameResult(self, schema_node, cstruct):
+        import colander
+        compiled = self._callFUT(schema_node)
+        try:
+            expected = schema_node.deserialize(cstruct)
+        except colander.Invalid as e:
+            with self.assertRaises(colander.Invalid) as context:
+                compiled.deserialize(cstruct)
+            self.assertEqual(context.exception.asdict(), e.asdict(), cstruct)
+            self.assertTrue(compiled(cstruct)[1])
+        else:
+            self.assertEqual(compiled.deserialize(cstruct), expected)
+            self.assertEqual(compiled(cstruct), (expected, []))
+
+    def test_valid(self):
+        import datetime
+        schema = self._makeSchema()
+        cstruct = {
+            'items': [{'name': 'abc', 'count': '3', 'kind': 'a',
+                       'ratio': '1', 'active': 'false',
+                       'created': '2014-10-06'},
+                      {'name': 'de', 'count': '', 'active': True}],
+            'flag': 'YES',
+            'point': ['1', '2'],
+        }
+        appstruct, errors = self._callFUT(schema)(cstruct)
+        self.assertEqual(errors, [])
+        self.assertEqual(appstruct, {
+            'items': [{'name': 'abc', 'count': 3, 'kind': 'a', 'ratio': 1.0,
+                       'active': False,
+                       'created': datetime.date(2014, 10, 6)},
+                      {'name': 'de', 'count': None, 'ratio': 0.5,
+                       'active': True, 'created': None}],
+            'flag': True,
+            'point': (1, 2),
+        })
+        self.assertSameResult(schema, cstruct)
+
+    def test_errors(self):
+        schema = self._makeSchema()
+        cstruct = {
+            'items': [{'name': 'ABCDEF', 'count': 'x', 'kind': 'c',
+                       'ratio': 'y', 'created': 'never'},
+                      {'count': '10', 'active': True}],
+            'flag': 'maybe',
+            'point': ['a'],
+        }
+        appstruct, errors = self._callFUT(schema)(cstruct)
+        self.assertEqual(sorted(path for path, message in errors), [
+            ('flag',),
+            ('items', 0, 'count'),
+            ('items', 0, 'created'),
+            ('items', 0, 'kind'),
+            ('items', 0, 'name'),
+            ('items', 0, 'ratio'),
+            ('items', 1, 'count'),
+            ('items', 1, 'name'),
+            ('point',),
+        ])
+        self.assertSameResult(schema, cstruct)
+        for cstruct in ({'items': [], 'flag': True}, {'items': 'abc'},
+                        {'items': [None, 1]}, None, [], {}):
+            self.assertSameResult(schema, cstruct)
+
+    def test_unknown(self):
+        import colander
+        for unknown in ('ignore', 'preserve', 'raise'):
+            schema = colander.SchemaNode(
+                colander.Mapping(unknown=unknown),
+                colander.SchemaNode(colander.Integer(), name='a'))
+            for cstruct in ({'a': '1'}, {'a': '1', 'b': 2}, {'a': 'x'},
+                            {'a': 'x', 'b': 2}):
+                self.assertSameResult(schema, cstruct)
+
+    def test_called(self):
+        import colander
+        calls = []
+
+        def check(node, value):
+            calls.append(value)
+            if value == 'bad':
+                raise colander.Invalid(node, 'Bad')
+
+        class Upper(colander.SchemaNode):
+            schema_type = colander.String
+
+            def deserialize(self, cstruct=colander.null):
+                if cstruct is colander.null:
+                    return cstruct
+                return cstruct.upper()
+
+        schema = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.String(), name='a',
+                                validator=colander.All(
+                                    colander.Length(max=5),
+                                    colander.Function(lambda v: True)),
+                                preparer=[lambda v: v.strip()]),
+            colander.SchemaNode(colander.String(), name='b',
+                                validator=check),
+            colander.SchemaNode(colander.Set(), name='c',
+                                missing=colander.drop),
+            Upper(name='d', missing=colander.drop),
+            colander.SchemaNode(colander.String(), name='e',
+                                missing=colander.drop,
+                                validator=colander.deferred(
+                                    lambda node, kw: None)))
+        compiled = self._callFUT(schema)
+        self.assertEqual(compiled({'a': ' x ', 'b': 'ok', 'c': [1, 1],
+                                   'd': 'x', 'e': 'y'}),
+                         ({'a': 'x', 'b': 'ok', 'c': set([1]), 'd': 'X',
+                           'e': 'y'}, []))
+        self.assertEqual(calls, ['ok'])
+        self.assertSameResult(schema, {'a': 'abcdefg', 'b': 'bad'})
+
+    def test_converters(self):
+        import colander
+        from .. import IntegerTypeConverter, StringTypeConverter
+
+        class Code(colander.String):
+            pass
+
+        class Digits(colander.String):
+
+            def deserialize(self, node, cstruct):
+                return int(cstruct)
+
+        schema = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(Code(), name='code'),
+            colander.SchemaNode(Digits(), name='digits'))
+        compiled = self._callFUT(schema, {Code: StringTypeConverter,
+                                          Digits: IntegerTypeConverter})
+        self.assertIn("type(cstruct", compiled.source)
+        self.assertEqual(compiled({'code': 'a', 'digits': '12'}),
+                         ({'code': 'a', 'digits': 12}, []))
+
+    def test_enum_keeps_unhashable_values(self):
+        import colander
+        schema = colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(colander.Set(), name='tags',
+                                validator=colander.OneOf([set(['a'])])))
+        self.assertSameResult(schema, [['a'], ['b']])
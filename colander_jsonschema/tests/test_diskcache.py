@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class DiskCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def _makeOne(self, *args, **kw):
+        from ..diskcache import DiskCache
+        return DiskCache(self.directory, *args, **kw)
+
+    def _makeSchema(self):
+        from .test_batch import Item
+        return Item()
+
+    def test_shared_between_instances(self):
+        from .. import convert
+        schema = self._makeSchema()
+        cache = self._makeOne()
+        expected = convert(schema, cache=cache)
+        self.assertEqual(cache.misses, 1)
+        cache = self._makeOne()
+        self.assertEqual(convert(schema.clone(), cache=cache), expected)
+        self.assertEqual(cache.hits, 1)
+
+    def test_key_is_stable(self):
+        import colander
+        cache = self._makeOne()
+        schema = self._makeSchema()
+        key = cache.make_key(schema)
+        self.assertEqual(key, cache.make_key(self._makeSchema()))
+        self.assertEqual(len(key), 40)
+        schema['name'].validator = colander.Length(max=1)
+        self.assertNotEqual(key, cache.make_key(schema))
+        self.assertNotEqual(key, cache.make_key(self._makeSchema(),
+                                                dedup='class'))
+
+    def test_key_covers_schema_classes(self):
+        import colander
+        from .. import convert
+
+        def make_root(name):
+            schema_class = type(str(name), (colander.MappingSchema,), {
+                'street': colander.SchemaNode(colander.String())})
+            return colander.SchemaNode(
+                colander.Mapping(), schema_class(name='a'),
+                schema_class(name='b'))
+
+        convert(make_root('Address'), cache=self._makeOne(),
+                dedup='structure')
+        cache = self._makeOne()
+        ret = convert(make_root('Location'), cache=cache, dedup='structure')
+        self.assertEqual(list(ret['definitions']), ['Location'])
+        self.assertEqual(cache.hits, 0)
+
+    def test_key_covers_converters(self):
+        import colander
+        from .. import StringTypeConverter
+        cache = self._makeOne()
+        schema = self._makeSchema()
+        self.assertNotEqual(
+            cache.make_key(schema),
+            cache.make_key(schema, {colander.Int: StringTypeConverter}))
+
+    def test_corrupted_entry_is_a_miss(self):
+        from .. import convert
+        schema = self._makeSchema()
+        cache = self._makeOne()
+        convert(schema, cache=cache)
+        with open(cache.path(cache.make_key(schema)), 'wb') as fp:
+            fp.write(b'broken')
+        self.assertIsNone(cache.get(cache.make_key(schema)))
+        self.assertEqual(convert(schema, cache=cache), convert(schema))
+
+    def test_memory(self):
+        from .. import ConversionCache, convert
+        schema = self._makeSchema()
+        memory = ConversionCache()
+        cache = self._makeOne(memory=memory)
+        convert(schema, cache=cache)
+        convert(schema, cache=cache)
+        self.assertEqual(memory.hits, 1)
+
+    def test_invalidate(self):
+        import os
+        from .. import convert
+        schema = self._makeSchema()
+        cache = self._makeOne()
+        convert(schema, cache=cache)
+        cache.invalidate(schema)
+        self.assertEqual(os.listdir(self.directory), [])
+        convert(schema, cache=cache)
+        cache.clear()
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_invalidate_dialect(self):
+        import os
+        from .. import ConversionCache, convert
+        schema = self._makeSchema()
+        memory = ConversionCache()
+        cache = self._makeOne(memory=memory)
+        for dialect in (None, 'draft-07', 'openapi-3.0'):
+            convert(schema, cache=cache, dialect=dialect)
+        cache.invalidate(schema, dialect='draft-07')
+        self.assertEqual(len(os.listdir(self.directory)), 2)
+        self.assertNotIn(cache.make_key(schema, dialect='draft-07'), cache)
+        cache.invalidate(schema)
+        self.assertEqual(os.listdir(self.directory), [])
+        self.assertEqual(len(memory), 0)
+
+
+class PrewarmTestCase(unittest.TestCase):
+
+    def setUp(self):
+        import tempfile
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        import shutil
+        shutil.rmtree(self.directory)
+
+    def _callFUT(self, *argv):
+        import sys
+        from ..diskcache import main
+        stdout, stderr = sys.stdout, sys.stderr
+        try:
+            try:
+                from cStringIO import StringIO
+            except ImportError:
+                from io import StringIO
+            sys.stdout = sys.stderr = StringIO()
+            return main([self.directory] + list(argv))
+        finally:
+            sys.stdout, sys.stderr = stdout, stderr
+
+    def test_attribute(self):
+        from .. import convert
+        from ..diskcache import DiskCache
+        from .test_batch import Item
+        status = self._callFUT(
+            'colander_jsonschema.tests.test_batch:Item')
+        self.assertEqual(status, 0)
+        cache = DiskCache(self.directory)
+        self.assertIn(cache.make_key(Item()), cache)
+        convert(Item(), cache=cache)
+        self.assertEqual(cache.hits, 1)
+
+    def test_entry_mode(self):
+        import os
+        import stat
+        from .. import convert
+        from ..diskcache import DiskCache
+        from .test_batch import Item
+        status = self._callFUT(
+            'colander_jsonschema.tests.test_batch:Item')
+        self.assertEqual(status, 0)
+        umask = os.umask(0o022)
+        os.umask(umask)
+        cache = DiskCache(self.directory)
+        path = cache.path(cache.make_key(Item()))
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode),
+                         0o666 & ~umask)
+        self.assertEqual(convert(Item(), cache=cache), convert(Item()))
+        self.assertEqual(cache.hits, 1)
+
+    def test_module(self):
+        import os
+        status = self._callFUT('colander_jsonschema.tests.test_batch')
+        self.assertEqual(status, 0)
+        self.assertEqual(len(os.listdir(self.directory)), 1)
+
+    def test_failure(self):
+        status = self._callFUT('colander_jsonschema.tests.test_batch:Nope')
+        self.assertEqual(status, 1)
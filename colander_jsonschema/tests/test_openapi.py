@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class ComponentsGeneratorTestCase(unittest.TestCase):
+
+    def _makeSchemas(self):
+        import colander
+
+        class Address(colander.MappingSchema):
+            street = colander.SchemaNode(colander.String())
+            zip = colander.SchemaNode(colander.String(), missing=None)
+
+        class Person(colander.MappingSchema):
+            home = Address(title='Home')
+            work = Address()
+
+        class Order(colander.MappingSchema):
+            ship_to = Address()
+            buyer = Person()
+
+        return Address, Person, Order
+
+    def _makeOne(self, schemas=None, converters=None):
+        from ..openapi import ComponentsGenerator
+        return ComponentsGenerator(schemas, converters)
+
+    def test_components(self):
+        Address, Person, Order = self._makeSchemas()
+        generator = self._makeOne({'Order': Order(), 'Customer': Person()})
+        schemas = generator.generate()['schemas']
+        self.assertEqual(list(schemas), ['Address', 'Customer', 'Order'])
+        self.assertEqual(schemas['Order']['properties']['buyer'],
+                         {'allOf': [{'$ref': '#/components/schemas/Customer'}],
+                          'title': 'Buyer'})
+        self.assertEqual(schemas['Customer']['properties']['home'],
+                         {'allOf': [{'$ref': '#/components/schemas/Address'}],
+                          'title': 'Home'})
+        self.assertEqual(schemas['Address']['properties']['zip'],
+                         {'type': 'string', 'nullable': True,
+                          'title': 'Zip'})
+        self.assertEqual(generator.converted_schemas, 2)
+        self.assertEqual(sorted(generator.emitted),
+                         ['Address', 'Customer', 'Order'])
+
+    def test_optional_nodes(self):
+        import colander
+        Address, Person, Order = self._makeSchemas()
+
+        class Contact(colander.MappingSchema):
+            home = Address()
+            work = Address(missing=None, title='Work')
+
+        generator = self._makeOne({'Contact': Contact()})
+        schemas = generator.generate()['schemas']
+        self.assertEqual(list(schemas), ['Address', 'Contact'])
+        self.assertEqual(schemas['Address']['type'], 'object')
+        self.assertNotIn('nullable', schemas['Address'])
+        self.assertEqual(schemas['Contact']['properties']['home'],
+                         {'allOf': [{'$ref': '#/components/schemas/Address'}],
+                          'title': 'Home'})
+        self.assertEqual(schemas['Contact']['properties']['work'],
+                         {'allOf': [{'$ref': '#/components/schemas/Address'}],
+                          'title': 'Work', 'nullable': True})
+
+    def test_equal_to_convert(self):
+        import colander
+        from .. import convert
+        Address, Person, Order = self._makeSchemas()
+        plain = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.Integer(), name='count',
+                                validator=colander.Range(0, 9)),
+            colander.SchemaNode(colander.DateTime(), name='seen',
+                                missing=None))
+        generator = self._makeOne({'Plain': plain, 'Address': Address()})
+        schemas = generator.generate()['schemas']
+        for name, schema_node in (('Plain', plain), ('Address', Address())):
+            self.assertEqual(schemas[name],
+                             convert(schema_node, dialect='openapi-3.0'))
+
+    def test_incremental(self):
+        import colander
+        Address, Person, Order = self._makeSchemas()
+        order = Order()
+        generator = self._makeOne()
+        generator['Order'] = order
+        generator['Customer'] = Person()
+        first = generator.generate()['schemas']
+        second = generator.generate()['schemas']
+        self.assertEqual(generator.converted_schemas, 0)
+        self.assertEqual(generator.emitted, [])
+        self.assertEqual(second, first)
+        order.add(colander.SchemaNode(colander.Integer(), name='total'))
+        generator.invalidate('Order')
+        third = generator.generate()['schemas']
+        self.assertEqual(generator.converted_schemas, 1)
+        self.assertEqual(sorted(generator.emitted), ['Address', 'Order'])
+        self.assertIs(third['Customer'], first['Customer'])
+        self.assertIn('total', third['Order']['properties'])
+        self.assertRaises(KeyError, generator.invalidate, 'Missing')
+
+    def test_removed(self):
+        Address, Person, Order = self._makeSchemas()
+        generator = self._makeOne({'Order': Order(), 'Customer': Person()})
+        generator.generate()
+        del generator['Order']
+        schemas = generator.generate()['schemas']
+        self.assertEqual(list(schemas), ['Address', 'Customer'])
+        del generator['Customer']
+        self.assertEqual(generator.generate(), {'schemas': {}})
+        self.assertEqual(len(generator), 0)
+
+    def test_registered_class(self):
+        Address, Person, Order = self._makeSchemas()
+        generator = self._makeOne({'Customer': Person()})
+        first = generator.generate()['schemas']
+        # takes over the component of its class
+        generator['Address'] = Address()
+        schemas = generator.generate()['schemas']
+        self.assertEqual(generator.emitted, ['Address'])
+        self.assertIs(schemas['Customer'], first['Customer'])
+        # refers to the component of its class under another name
+        generator['PostalAddress'] = Address()
+        generator['Order'] = Order()
+        schemas = generator.generate()['schemas']
+        self.assertEqual(generator.converted_schemas, 2)
+        self.assertEqual(schemas['Order']['properties']['ship_to'],
+                         {'allOf': [{'$ref': '#/components/schemas/Address'}],
+                          'title': 'Ship To'})
+
+    def test_renamed(self):
+        Address, Person, Order = self._makeSchemas()
+        generator = self._makeOne({'Customer': Person()})
+        generator.generate()
+        generator['Location'] = Address()
+        schemas = generator.generate()['schemas']
+        self.assertEqual(generator.converted_schemas, 2)
+        self.assertEqual(list(schemas), ['Customer', 'Location'])
+        self.assertEqual(schemas['Customer']['properties']['work'],
+                         {'allOf': [{'$ref': '#/components/schemas/Location'}],
+                          'title': 'Work'})
+
+    def test_name_collision(self):
+        import colander
+        Address, Person, Order = self._makeSchemas()
+        generator = self._makeOne({'Customer': Person()})
+        generator.generate()
+        generator['Address'] = colander.SchemaNode(
+            colander.Mapping(),
+            colander.SchemaNode(colander.String(), name='line'))
+        schemas = generator.generate()['schemas']
+        self.assertEqual(list(schemas), ['Address', 'Address2', 'Customer'])
+        self.assertIn('line', schemas['Address']['properties'])
+        self.assertEqual(schemas['Customer']['properties']['work'],
+                         {'allOf': [{'$ref': '#/components/schemas/Address2'}],
+                          'title': 'Work'})
+
+    def test_recursive(self):
+        import colander
+        tree = colander.SchemaNode(colander.Mapping(), name='tree')
+        tree.add(colander.SchemaNode(colander.String(), name='label'))
+        tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                     name='children', missing=None))
+        generator = self._makeOne({'Tree': tree})
+        schemas = generator.generate()['schemas']
+        self.assertEqual(list(schemas), ['Tree'])
+        self.assertEqual(schemas['Tree']['properties']['children']['items'],
+                         {'allOf': [{'$ref': '#/components/schemas/Tree'}],
+                          'title': 'Tree'})
+
+    def test_valid_references(self):
+        try:
+            import jsonschema
+        except ImportError:  # pragma: no cover
+            self.skipTest('jsonschema is not installed')
+        Address, Person, Order = self._makeSchemas()
+        generator = self._makeOne({'Order': Order()})
+        document = {'components': generator.generate(),
+                    '$ref': '#/components/schemas/Order'}
+        checker = jsonschema.Draft4Validator(document)
+        address = {'street': 'Main', 'zip': '1'}
+        self.assertTrue(checker.is_valid({
+            'ship_to': address,
+            'buyer': {'home': address, 'work': address}}))
+        self.assertFalse(checker.is_valid({
+            'ship_to': address, 'buyer': {'home': {}, 'work': address}}))
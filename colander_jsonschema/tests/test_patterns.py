@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import re
+import unittest
+
+
+class TranslatePatternTestCase(unittest.TestCase):
+
+    def _callFUT(self, pattern, flags=0):
+        from ..patterns import translate_pattern
+        return translate_pattern(pattern, flags)
+
+    def test_unchanged(self):
+        for pattern in (r'TESTtestTEST', r'^[a-z0-9_-]+$', r'\d{2,4}\.\w*?',
+                        r'(?:a|b)(?=c)(?!d)(?<=e)(?<!f)', r'a/b', r'\bx\B',
+                        r'(a)\1'):
+            self.assertEqual(self._callFUT(pattern), pattern)
+
+    def test_named_groups(self):
+        self.assertEqual(self._callFUT(r'(?P<year>\d{4})-(?P=year)'),
+                         r'(\d{4})-\1')
+        self.assertEqual(self._callFUT(r'(a)(?P<b>b)(?P=b)0'),
+                         r'(a)(b)(?:\2)0')
+
+    def test_anchors(self):
+        self.assertEqual(self._callFUT(r'\Aabc\Z'), r'^abc$')
+        self.assertEqual(self._callFUT(r'^a$', re.MULTILINE),
+                         r'(?:^|(?<=\n))a(?=\n|$)')
+
+    def test_flags(self):
+        self.assertEqual(self._callFUT(r'(?i)ab[c-e_]'),
+                         r'[aA][bB][c-eC-E_]')
+        self.assertEqual(self._callFUT(r'ab', re.IGNORECASE), r'[aA][bB]')
+        self.assertEqual(self._callFUT(r'(?s)a.'), r'a[\s\S]')
+        self.assertEqual(self._callFUT(r'(?i:a)b'), r'(?:[aA])b')
+        self.assertEqual(self._callFUT(r'(?x) a b  # comment'), r'ab')
+        self.assertEqual(self._callFUT(r'(?u)a', re.UNICODE), r'a')
+
+    def test_escapes(self):
+        self.assertEqual(self._callFUT(r'a{,3}b{2}c{2,}'),
+                         r'a{0,3}b{2}c{2,}')
+        self.assertEqual(self._callFUT(r'\x41\101\a\N{LATIN SMALL LETTER E}'),
+                         r'AA\x07e')
+        # not raw, raw unicode literals of Python 2 decode \U
+        self.assertEqual(self._callFUT('\\U0001F600'), '\\uD83D\\uDE00')
+        self.assertEqual(self._callFUT(r'[]a][\b]'), r'[\]a][\x08]')
+        self.assertEqual(self._callFUT(r'a{x}'), r'a\{x\}')
+        self.assertEqual(self._callFUT(r'a(?#comment)b'), r'ab')
+
+    def test_same_matches(self):
+        samples = ['abc', 'ABC', 'a\nb', '2014-2014', '2014-2015', 'aB_',
+                   'x{', '']
+        for pattern, flags in ((r'(?P<y>\d{4})-(?P=y)', 0),
+                               (r'\Aa', 0),
+                               (r'(?i)ab', 0),
+                               (r'a(?i:b)', 0),
+                               (r'(?s)a.b', 0),
+                               (r'(?m)^b$', 0),
+                               (r'[a-c]{,2}$', re.IGNORECASE),
+                               (r'(?x) x \{', 0)):
+            try:
+                re.compile(pattern, flags)
+            except re.error:
+                # scoped flags are only supported since Python 3.6
+                continue
+            translated = self._callFUT(pattern, flags)
+            for sample in samples:
+                self.assertEqual(
+                    bool(re.search(pattern, sample, flags)),
+                    bool(re.search(translated, sample)),
+                    (pattern, translated, sample))
+
+    def test_untranslatable(self):
+        from ..patterns import UntranslatablePattern
+        for pattern, position in ((r'a*+', 2), (r'(?>a)', 0),
+                                  (r'(?(1)a|b)', 0), (r'a(?i)', 1),
+                                  ('[\\U0001F600]', 1), (r'(?L)a', 0),
+                                  (r'\1', 0), (r'(a', 2)):
+            with self.assertRaises(UntranslatablePattern) as context:
+                self._callFUT(pattern)
+            self.assertEqual(context.exception.position, position, pattern)
+            self.assertIn(repr(pattern), str(context.exception))
+
+    def test_cached(self):
+        from .. import patterns
+        patterns.clear_cache()
+        translated = self._callFUT(r'(?P<a>x)')
+        self.assertIs(self._callFUT(r'(?P<a>x)'), translated)
+        self.assertEqual(list(patterns._cache), [(r'(?P<a>x)', 0)])
+        self.assertEqual(self._callFUT(r'(?P<a>x)', re.IGNORECASE),
+                         r'([xX])')
+        self.assertEqual(len(patterns._cache), 2)
+
+    def test_cache_is_bounded(self):
+        from .. import patterns
+        patterns.clear_cache()
+        for i in range(patterns.cache_size + 10):
+            self._callFUT('a%d' % i)
+        self.assertEqual(len(patterns._cache), patterns.cache_size)
+
+
+class CompilePatternTestCase(unittest.TestCase):
+
+    def _callFUT(self, pattern):
+        from ..patterns import compile_pattern
+        return compile_pattern(pattern)
+
+    def test_end_anchor(self):
+        for pattern, samples in (('^\\d+$', {'12': True, '12\n': False}),
+                                 ('a(?=\\n|$)', {'a\nb': True, 'a\n': True,
+                                                  'ab': False}),
+                                 ('[$]\\$', {'$$': True, '$': False})):
+            search = self._callFUT(pattern).search
+            for sample, matches in samples.items():
+                self.assertEqual(bool(search(sample)), matches,
+                                 (pattern, sample))
+
+
+class ConvertRegexValidatorTestCase(unittest.TestCase):
+
+    def test_translated(self):
+        import colander
+        from .. import convert
+        node = colander.SchemaNode(
+            colander.String(),
+            validator=colander.Regex(re.compile(r'\A(?P<a>x)(?P=a)\Z',
+                                                re.IGNORECASE)))
+        self.assertEqual(convert(node)['pattern'], r'^([xX])\1$')
+
+    def test_untranslatable(self):
+        import colander
+        from .. import ConversionError, convert
+        node = colander.SchemaNode(colander.String(), name='code',
+                                   validator=colander.Regex(
+                                       r'(a)?(?(1)b|c)'))
+        with self.assertRaises(ConversionError) as context:
+            convert(node)
+        self.assertIn("'code'", str(context.exception))
+        self.assertIn('conditional groups', str(context.exception))
@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class ObserverTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Item(colander.MappingSchema):
+            name = colander.SchemaNode(
+                colander.String(),
+                validator=colander.All(colander.Length(max=10),
+                                       colander.OneOf(['a', 'b'])))
+            count = colander.SchemaNode(colander.Integer(), missing=None)
+
+        class Items(colander.SequenceSchema):
+            item = Item()
+
+        class Root(colander.MappingSchema):
+            items = Items()
+            created = colander.SchemaNode(colander.DateTime())
+
+        return Root()
+
+    def _makeObserver(self):
+        from .. import ConversionObserver
+
+        class Observer(ConversionObserver):
+
+            def __init__(self):
+                self.events = []
+                self.elapsed = []
+
+            def node_entered(self, path, schema_node, converter_class):
+                self.events.append(('enter', path, converter_class))
+
+            def node_exited(self, path, schema_node, converter_class,
+                            elapsed):
+                self.elapsed.append(elapsed)
+                self.events.append(('exit', path, converter_class))
+
+            def validator_converted(self, path, schema_node, validator,
+                                    elapsed):
+                self.events.append(('validator', path, type(validator)))
+
+        return Observer()
+
+    def test_events(self):
+        import colander
+        from .. import (ArrayTypeConverter, DateTimeTypeConverter,
+                        IntegerTypeConverter, ObjectTypeConverter,
+                        StringTypeConverter, convert)
+        schema = self._makeSchema()
+        observer = self._makeObserver()
+        self.assertDictEqual(convert(schema, observer=observer),
+                             convert(schema))
+        self.assertEqual(observer.events[:2], [
+            ('enter', (), ObjectTypeConverter),
+            ('exit', (), ObjectTypeConverter),
+        ])
+        entered = sorted((path, cls) for event, path, cls in observer.events
+                         if event == 'enter')
+        self.assertEqual(entered, sorted([
+            ((), ObjectTypeConverter),
+            (('items',), ArrayTypeConverter),
+            (('items', 'item'), ObjectTypeConverter),
+            (('items', 'item', 'name'), StringTypeConverter),
+            (('items', 'item', 'count'), IntegerTypeConverter),
+            (('created',), DateTimeTypeConverter),
+        ]))
+        self.assertIn(('validator', ('items', 'item', 'name'), colander.All),
+                      observer.events)
+        self.assertEqual(len(observer.elapsed), 6)
+        self.assertTrue(all(elapsed >= 0 for elapsed in observer.elapsed))
+
+    def test_dedup(self):
+        from .. import convert
+        schema = self._makeSchema()
+        observer = self._makeObserver()
+        self.assertDictEqual(
+            convert(schema, dedup='structure', observer=observer),
+            convert(schema, dedup='structure'))
+        self.assertTrue(observer.events)
+
+    def test_disabled(self):
+        from .. import TypeConversionDispatcher
+        dispatcher = TypeConversionDispatcher()
+        self.assertIsNone(dispatcher.observer)
+        dispatcher(self._makeSchema())
+        self.assertEqual(dispatcher.path, ())
+
+
+class ProfileCollectorTestCase(unittest.TestCase):
+
+    def _makeSchema(self, fields=20):
+        import colander
+        schema = colander.SchemaNode(colander.Mapping(), name='root')
+        for i in range(fields):
+            schema.add(colander.SchemaNode(
+                colander.String(), name='f%d' % i,
+                validator=colander.Length(max=10)))
+        return schema
+
+    def test_collect(self):
+        from .. import ObjectTypeConverter, StringTypeConverter
+        from ..profiling import profile
+        collector = profile(self._makeSchema(), top=5)
+        self.assertEqual(collector.converters[StringTypeConverter].count, 20)
+        self.assertEqual(collector.converters[ObjectTypeConverter].count, 1)
+        slowest = collector.slowest()
+        self.assertEqual(len(slowest), 5)
+        self.assertEqual([elapsed for path, elapsed in slowest],
+                         sorted([elapsed for path, elapsed in slowest],
+                                reverse=True))
+        data = collector.as_dict()
+        histogram = data['converters'][
+            'colander_jsonschema.StringTypeConverter']
+        self.assertEqual(histogram['buckets'][-1], (float('inf'), 20))
+        self.assertEqual(
+            data['validators']['colander.Length']['count'], 20)
+
+    def test_accumulates(self):
+        from .. import StringTypeConverter
+        from ..profiling import ProfileCollector, profile
+        collector = ProfileCollector()
+        profile(self._makeSchema(), collector=collector)
+        profile(self._makeSchema(), collector=collector)
+        self.assertEqual(collector.converters[StringTypeConverter].count, 40)
+        self.assertEqual(len(collector.slowest()), 10)
+
+    def test_prometheus(self):
+        from ..profiling import profile
+        text = profile(self._makeSchema(), top=3).prometheus()
+        lines = text.splitlines()
+        self.assertIn('# TYPE colander_jsonschema_converter_seconds '
+                      'histogram', lines)
+        self.assertIn('colander_jsonschema_converter_seconds_count'
+                      '{converter="colander_jsonschema.StringTypeConverter"}'
+                      ' 20', lines)
+        self.assertIn('colander_jsonschema_converter_seconds_bucket'
+                      '{converter="colander_jsonschema.StringTypeConverter",'
+                      'le="+Inf"} 20', lines)
+        self.assertEqual(len([line for line in lines if line.startswith(
+            'colander_jsonschema_slowest_node_seconds{')]), 3)
+
+    def test_histogram(self):
+        from ..profiling import Histogram
+        histogram = Histogram()
+        for elapsed in (2e-6, 2e-6, 2e-3, 1.0):
+            histogram.observe(elapsed)
+        cumulative = dict(histogram.cumulative())
+        self.assertEqual(cumulative[1e-6], 0)
+        self.assertEqual(cumulative[5e-6], 2)
+        self.assertEqual(cumulative[5e-3], 3)
+        self.assertEqual(cumulative[float('inf')], 4)
+        self.assertEqual(histogram.count, 4)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class BuildTestCase(unittest.TestCase):
+
+    def _callFUT(self, document, name='', builder=None):
+        from ..reverse import build
+        return build(document, name, builder)
+
+    def _makeSchema(self):
+        import colander
+
+        class Address(colander.MappingSchema):
+            street = colander.SchemaNode(
+                colander.String(), validator=colander.Length(2, 20))
+            zip = colander.SchemaNode(
+                colander.String(), validator=colander.Regex(r'^\d+$'),
+                missing=colander.drop)
+
+        class Tags(colander.SequenceSchema):
+            tag = colander.SchemaNode(
+                colander.String(), validator=colander.OneOf(['a', 'b']))
+
+        class Person(colander.MappingSchema):
+            home = Address(title='Home')
+            work = Address(missing=None, description='Office')
+            tags = Tags(validator=colander.Length(max=3))
+            age = colander.SchemaNode(
+                colander.Integer(), validator=colander.Range(0, 150),
+                missing=None)
+            size = colander.SchemaNode(colander.Float(), default=1.5)
+            kind = colander.SchemaNode(
+                colander.String(), missing=None,
+                validator=colander.OneOf(['x', 'y']))
+            email = colander.SchemaNode(
+                colander.String(), validator=colander.Email())
+            born = colander.SchemaNode(colander.Date())
+            seen = colander.SchemaNode(colander.DateTime())
+            active = colander.SchemaNode(colander.Boolean())
+
+        return Person()
+
+    def test_round_trip(self):
+        import colander
+        from .. import convert
+        converted = convert(self._makeSchema())
+        node = self._callFUT(converted, 'person')
+        self.assertEqual(node.name, 'person')
+        self.assertDictEqual(convert(node), converted)
+        self.assertIsInstance(node['born'].typ, colander.Date)
+        self.assertIsNone(node['home']['zip'].missing)
+        self.assertEqual(node['kind'].validator.choices, ['x', 'y'])
+        appstruct = node.deserialize({
+            'home': {'street': 'Main'}, 'tags': ['a'], 'size': '2',
+            'email': 'a@example.com', 'born': '2014-01-02',
+            'seen': '2014-01-02T03:04:05', 'active': 'true'})
+        self.assertEqual(appstruct['tags'], ['a'])
+        self.assertIsNone(appstruct['age'])
+        with self.assertRaises(colander.Invalid):
+            node.deserialize({'home': {'street': 'M'}})
+
+    def test_round_trip_dedup(self):
+        from .. import convert
+        schema = self._makeSchema()
+        converted = convert(schema, dedup='structure')
+        node = self._callFUT(converted)
+        self.assertDictEqual(convert(node), convert(schema))
+
+    def test_shared_children(self):
+        document = {
+            'type': 'object',
+            'definitions': {
+                'Point': {
+                    'type': 'object',
+                    'properties': {'x': {'type': 'number'},
+                                   'y': {'type': 'number'}},
+                    'required': ['x', 'y'],
+                },
+            },
+            'properties': {
+                'a': {'$ref': '#/definitions/Point'},
+                'b': {'allOf': [{'$ref': '#/definitions/Point'}],
+                      'title': 'B'},
+            },
+            'required': ['a', 'b'],
+        }
+        node = self._callFUT(document)
+        self.assertEqual(node['a'].name, 'a')
+        self.assertEqual(node['b'].title, 'B')
+        self.assertIs(node['a'].children, node['b'].children)
+
+    def test_ref_chain_linear(self):
+        from ..reverse import SchemaBuilder
+        # every level refers twice to the previous one: 2 ** 40 paths
+        definitions = {'L0': {'type': 'string'}}
+        for i in range(1, 41):
+            definitions['L%d' % i] = {
+                'type': 'object',
+                'properties': {
+                    'left': {'$ref': '#/definitions/L%d' % (i - 1)},
+                    'right': {'$ref': '#/definitions/L%d' % (i - 1)},
+                },
+            }
+        document = {'$ref': '#/definitions/L40', 'definitions': definitions}
+        builder = SchemaBuilder()
+        node = self._callFUT(document, builder=builder)
+        self.assertIs(node['left']['right']['left'].children,
+                      node['right']['left']['right'].children)
+        self.assertEqual(len(builder._nodes), 41)
+
+    def test_recursive(self):
+        import colander
+        from .. import convert
+        document = {
+            'type': 'object',
+            'definitions': {
+                'Tree': {
+                    'type': 'object',
+                    'properties': {
+                        'value': {'type': 'integer'},
+                        'children': {
+                            'type': 'array',
+                            'items': {'$ref': '#/definitions/Tree'},
+                        },
+                    },
+                    'required': ['value'],
+                },
+            },
+            'properties': {'tree': {'$ref': '#/definitions/Tree'}},
+        }
+        node = self._callFUT(document)
+        tree = node['tree']
+        self.assertIs(tree['children']['item'].children, tree.children)
+        appstruct = node.deserialize({'tree': {'value': '1', 'children': [
+            {'value': '2', 'children': [{'value': '3'}]}]}})
+        self.assertEqual(
+            appstruct['tree']['children'][0]['children'][0]['value'], 3)
+        self.assertIn('definitions', convert(node, dedup='class'))
+        with self.assertRaises(colander.Invalid):
+            node.deserialize({'tree': {'children': [{}]}})
+
+    def test_memoized_across_documents(self):
+        from ..reverse import SchemaBuilder
+        from .. import convert
+        builder = SchemaBuilder()
+        converted = convert(self._makeSchema())
+        first = self._callFUT(converted, builder=builder)
+        misses = builder.misses
+        second = self._callFUT(dict(converted), builder=builder)
+        self.assertIs(second.children[0].children,
+                      first.children[0].children)
+        self.assertEqual(builder.misses, misses)
+        self.assertGreater(builder.hits, 0)
+        builder.clear()
+        self.assertEqual(len(builder._nodes), 0)
+
+    def test_bounded(self):
+        from ..reverse import SchemaBuilder
+        builder = SchemaBuilder(maxsize=2)
+        for i in range(5):
+            self._callFUT({'type': 'integer', 'maximum': i}, builder=builder)
+        self.assertEqual(len(builder._nodes), 2)
+
+    def test_errors(self):
+        from .. import ConversionError
+        for document in ({'$ref': 'http://example.com/schema.json'},
+                         {'$ref': '#/definitions/Missing'},
+                         {'$ref': '#/definitions/A',
+                          'definitions': {'A': {'$ref': '#/definitions/A'}}},
+                         {'allOf': [{'type': 'string'}, {'type': 'integer'}]},
+                         {'type': ['string', 'integer']},
+                         {'type': 'any'},
+                         {'enum': [1, 2]},
+                         {'type': 'string', 'minimum': 1, 'anyOf': []},
+                         {'type': 'integer', 'exclusiveMinimum': True},
+                         {'type': 'number', 'multipleOf': 2},
+                         {'type': 'object', 'additionalProperties': {}},
+                         {'type': 'object', 'properties': {
+                             'a': {'type': 'string', 'uniqueItems': True}}},
+                         {'allOf': [{'$ref': '#/definitions/A'}],
+                          'maximum': 1,
+                          'definitions': {'A': {'type': 'integer'}}}):
+            with self.assertRaises(ConversionError):
+                self._callFUT(document)
+
+    def test_additional_properties(self):
+        import colander
+        node = self._callFUT({'type': 'object',
+                              'properties': {'a': {'type': 'integer'}},
+                              'additionalProperties': False})
+        self.assertEqual(node.deserialize({'a': '0'}), {'a': 0})
+        with self.assertRaises(colander.Invalid):
+            node.deserialize({'a': '0', 'zzz': 1})
+        node = self._callFUT({'type': 'object',
+                              'properties': {'a': {'type': 'integer'}},
+                              'additionalProperties': True})
+        self.assertEqual(node.deserialize({'a': '0', 'zzz': 1}), {'a': 0})
+
+    def test_pattern_searches(self):
+        import colander
+        from .. import convert
+        node = self._callFUT({'type': 'string', 'pattern': 'abc'})
+        self.assertEqual(node.deserialize('xabcx'), 'xabcx')
+        with self.assertRaises(colander.Invalid):
+            node.deserialize('ab')
+        node = self._callFUT({'type': 'string', 'pattern': r'^\d+$'})
+        self.assertEqual(node.deserialize('12'), '12')
+        with self.assertRaises(colander.Invalid):
+            node.deserialize('12\n')
+        self.assertEqual(convert(node)['pattern'], r'^\d+$')
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class StreamTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Item(colander.MappingSchema):
+            name = colander.SchemaNode(
+                colander.String(), title='Näme',
+                validator=colander.All(colander.Length(max=10),
+                                       colander.OneOf(['a', 'b'])))
+            count = colander.SchemaNode(colander.Float(), missing=None,
+                                        default=1.5,
+                                        validator=colander.Range(0, 9))
+            empty = colander.MappingSchema()
+
+        class Items(colander.SequenceSchema):
+            item = Item()
+
+        class Root(colander.MappingSchema):
+            items = Items(validator=colander.Length(min=1))
+            other = Items(default=[{'name': 'a'}], missing=[])
+            flag = colander.SchemaNode(colander.Boolean(), default=False)
+            created = colander.SchemaNode(colander.DateTime())
+
+        return Root()
+
+    def test_equal_to_dumps(self):
+        import json
+        from .. import convert
+        from ..stream import iter_convert_chunks
+        schema = self._makeSchema()
+        expected = json.dumps(convert(schema), sort_keys=True)
+        self.assertEqual(''.join(iter_convert_chunks(schema)), expected)
+        chunks = list(iter_convert_chunks(schema, chunk_size=16))
+        self.assertTrue(len(chunks) > 10)
+        self.assertEqual(''.join(chunks), expected)
+
+    def test_converter_reads_sub_nodes(self):
+        import colander
+        import json
+        from .. import ObjectTypeConverter, convert
+        from ..stream import iter_convert_chunks
+
+        class ClosedObjectConverter(ObjectTypeConverter):
+
+            def convert_type(self, schema_node, converted):
+                converted = super(ClosedObjectConverter, self).convert_type(
+                    schema_node, converted)
+                for sub in converted['properties'].values():
+                    if 'properties' in sub:
+                        sub['additionalProperties'] = False
+                return converted
+
+        schema = self._makeSchema()
+        converters = {colander.Mapping: ClosedObjectConverter}
+        expected = json.dumps(convert(schema, converters), sort_keys=True)
+        self.assertIn('"additionalProperties": false', expected)
+        self.assertEqual(''.join(iter_convert_chunks(schema, converters)),
+                         expected)
+
+    def test_leaf(self):
+        import colander
+        import json
+        from .. import convert
+        from ..stream import iter_convert_chunks
+        node = colander.SchemaNode(colander.Integer(), missing=None)
+        self.assertEqual(''.join(iter_convert_chunks(node)),
+                         json.dumps(convert(node), sort_keys=True))
+
+    def test_convert_to_stream(self):
+        import io
+        import json
+        from .. import convert
+        from ..stream import convert_to_stream
+        schema = self._makeSchema()
+        fp = io.BytesIO()
+        convert_to_stream(schema, fp, chunk_size=100, encoding='ascii')
+        self.assertEqual(fp.getvalue().decode('ascii'),
+                         json.dumps(convert(schema), sort_keys=True))
+
+    def test_deep(self):
+        import colander
+        import sys
+        from ..stream import iter_convert_chunks
+        depth = sys.getrecursionlimit() * 2
+        root = node = colander.SchemaNode(colander.Mapping())
+        for i in range(depth):
+            sub_node = colander.SchemaNode(colander.Mapping(), name='n')
+            node.add(sub_node)
+            node = sub_node
+        text = ''.join(iter_convert_chunks(root))
+        self.assertEqual(text.count('"properties": {"n": {'), depth)
+
+    def test_recursive(self):
+        import colander
+        from .. import ConversionError
+        from ..stream import iter_convert_chunks
+        tree = colander.SchemaNode(colander.Mapping(), name='tree')
+        tree.add(colander.SchemaNode(colander.Sequence(), tree,
+                                     name='children'))
+        self.assertRaises(ConversionError, list, iter_convert_chunks(tree))
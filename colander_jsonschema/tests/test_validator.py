@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class CompileValidatorTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Item(colander.MappingSchema):
+            name = colander.SchemaNode(
+                colander.String(),
+                validator=colander.All(colander.Length(max=5),
+                                       colander.Regex('^[a-z]+$')))
+            count = colander.SchemaNode(colander.Integer(), missing=None,
+                                        validator=colander.Range(0, 9))
+            kind = colander.SchemaNode(colander.String(), missing=None,
+                                       validator=colander.OneOf(['a', 'b']))
+            ratio = colander.SchemaNode(colander.Float(), missing=None)
+
+        class Items(colander.SequenceSchema):
+            item = Item()
+
+        class Root(colander.MappingSchema):
+            items = Items(validator=colander.Length(min=1, max=3))
+            flag = colander.SchemaNode(colander.Boolean())
+            tags = colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.String(), name='tag'),
+                missing=None)
+
+        return Root()
+
+    def _makeOne(self):
+        from ..validator import compile_validator
+        return compile_validator(self._makeSchema())
+
+    def test_valid(self):
+        validate = self._makeOne()
+        payload = {
+            'items': [{'name': 'abc', 'count': None, 'kind': 'b',
+                       'ratio': 1}],
+            'flag': False,
+            'tags': ['x'],
+        }
+        self.assertEqual(validate(payload), [])
+        self.assertTrue(validate.is_valid(payload))
+        payload['tags'] = None
+        payload['items'][0]['kind'] = ''
+        self.assertTrue(validate.is_valid(payload))
+
+    def test_errors(self):
+        validate = self._makeOne()
+        payload = {
+            'items': [
+                {'name': 'ABCDEF', 'count': 10, 'kind': 'c', 'ratio': 'x'},
+                {'count': True},
+            ],
+            'flag': 1,
+            'tags': [''],
+        }
+        self.assertEqual(sorted(validate(payload)), sorted([
+            (('items', 0, 'name'), 'is too long'),
+            (('items', 0, 'name'), "does not match '^[a-z]+$'"),
+            (('items', 0, 'count'), 'is greater than the maximum of 9'),
+            (('items', 0, 'kind'), 'is not one of the enumerated values'),
+            (('items', 0, 'ratio'), 'is not of type number or null'),
+            (('items', 1), "'name' is a required property"),
+            (('items', 1, 'count'), 'is not of type integer or null'),
+            (('flag',), 'is not of type boolean'),
+            (('tags', 0), 'is too short'),
+        ]))
+        self.assertFalse(validate.is_valid(payload))
+
+    def test_container_errors(self):
+        validate = self._makeOne()
+        self.assertEqual(validate([]), [((), 'is not of type object')])
+        self.assertEqual(sorted(validate({'items': [], 'flag': True})),
+                         [(('items',), 'is too short')])
+        self.assertEqual(validate({'items': None, 'flag': True}),
+                         [(('items',), 'is not of type array')])
+
+    def test_enum_keeps_booleans_apart(self):
+        import colander
+        from ..validator import compile_validator
+        node = colander.SchemaNode(colander.Integer(),
+                                   validator=colander.OneOf([1, 2]))
+        validate = compile_validator(node)
+        self.assertTrue(validate.is_valid(1))
+        self.assertFalse(validate.is_valid(True))
+        self.assertFalse(validate.is_valid(3))
+
+    def test_pattern_end_anchor(self):
+        import colander
+        from ..validator import compile_validator
+        node = colander.SchemaNode(colander.String(),
+                                   validator=colander.Regex(r'\A\d+\Z'))
+        validate = compile_validator(node)
+        self.assertEqual(validate('12'), [])
+        self.assertEqual(validate('12\n'),
+                         [((), "does not match '^\\\\d+$'")])
+        self.assertRaises(colander.Invalid, node.deserialize, '12\n')
+
+    def test_unknown_keyword(self):
+        from .. import ConversionError
+        from ..validator import compile_schema_validator
+        self.assertRaises(ConversionError, compile_schema_validator,
+                          {'type': 'object', 'allOf': []})
+
+    def test_agrees_with_jsonschema(self):
+        try:
+            import jsonschema
+        except ImportError:  # pragma: no cover
+            self.skipTest('jsonschema is not installed')
+        from .. import convert
+        schema = convert(self._makeSchema())
+        validate = self._makeOne()
+        checker = jsonschema.Draft4Validator(schema)
+        payloads = [
+            {'items': [{'name': 'abc', 'kind': 'a'}], 'flag': True},
+            {'items': [{'name': 'abc', 'count': -1}], 'flag': True},
+            {'items': [{'name': 'abc', 'ratio': 0.5}] * 4, 'flag': True},
+            {'items': [{'name': 3}], 'flag': None, 'tags': [1]},
+            {'flag': False, 'tags': None},
+        ]
+        for payload in payloads:
+            self.assertEqual(validate.is_valid(payload),
+                             checker.is_valid(payload), payload)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import unicode_literals
+import unittest
+
+
+class BatchValidatorTestCase(unittest.TestCase):
+
+    def _makeSchema(self):
+        import colander
+
+        class Row(colander.MappingSchema):
+            name = colander.SchemaNode(
+                colander.String(),
+                validator=colander.All(colander.Length(max=5),
+                                       colander.Regex('^[a-z]+$')))
+            count = colander.SchemaNode(colander.Integer(), missing=None,
+                                        validator=colander.Range(0, 9))
+            kind = colander.SchemaNode(colander.String(), missing=None,
+                                       validator=colander.OneOf(['a', 'b']))
+            tags = colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(colander.String(), name='tag'),
+                missing=None)
+
+        class Rows(colander.SequenceSchema):
+            row = Row()
+
+        return Rows(validator=colander.Length(max=5))
+
+    def _makeRows(self):
+        return [
+            {'name': 'abc', 'count': 1, 'kind': 'a'},
+            {'name': 'ABCDEFG', 'count': 10},
+            {'count': -1, 'kind': 'c', 'tags': ['x', 1]},
+            {'name': 'ok', 'count': 2.5, 'kind': None, 'tags': None},
+            'broken',
+            {'name': None, 'count': True},
+        ]
+
+    def _assertErrors(self, errors):
+        self.assertEqual(sorted(errors), sorted([
+            ((), 'is too long', None),
+            ((), 'is not of type object', [4]),
+            ((), "'name' is a required property", [2]),
+            (('name',), 'is not of type string', [5]),
+            (('name',), 'is too long', [1]),
+            (('name',), "does not match '^[a-z]+$'", [1]),
+            (('count',), 'is not of type integer or null', [3, 5]),
+            (('count',), 'is less than the minimum of 0', [2]),
+            (('count',), 'is greater than the maximum of 9', [1]),
+            (('kind',), 'is not one of the enumerated values', [2]),
+            (('tags', 1), 'is not of type string', [2]),
+        ]))
+
+    def test_errors(self):
+        from ..vectorized import compile_batch_validator
+        validate = compile_batch_validator(self._makeSchema())
+        self._assertErrors(validate(self._makeRows()))
+        self.assertEqual(validate.invalid_rows(self._makeRows()),
+                         [1, 2, 3, 4, 5])
+
+    def test_errors_without_numpy(self):
+        from .. import vectorized
+        numpy = vectorized.numpy
+        vectorized.numpy = None
+        try:
+            self.test_errors()
+        finally:
+            vectorized.numpy = numpy
+
+    def test_unhashable_values(self):
+        import colander
+        from ..vectorized import compile_batch_validator
+        for choices, failed in (([0, 1], [0, 1, 3]),
+                                ([0, 1, True], [1, 3]),
+                                ([[], 0], [0, 2, 3])):
+            schema = colander.SchemaNode(
+                colander.Sequence(),
+                colander.SchemaNode(
+                    colander.Mapping(),
+                    colander.SchemaNode(colander.Integer(), name='e',
+                                        validator=colander.OneOf(choices)),
+                    name='row'))
+            validate = compile_batch_validator(schema)
+            errors = validate([{'e': True}, {'e': []}, {'e': 1}, {'e': {}}])
+            self.assertIn((('e',), 'is not one of the enumerated values',
+                           failed), errors, choices)
+
+    def test_pattern_end_anchor(self):
+        import colander
+        from ..vectorized import compile_batch_validator
+        schema = colander.SchemaNode(
+            colander.Sequence(),
+            colander.SchemaNode(
+                colander.Mapping(),
+                colander.SchemaNode(colander.String(), name='code',
+                                    validator=colander.Regex(r'\A\d+\Z')),
+                name='row'))
+        validate = compile_batch_validator(schema)
+        self.assertEqual(validate.invalid_rows([{'code': '12'},
+                                                {'code': '12\n'}]), [1])
+
+    def test_valid(self):
+        from ..vectorized import compile_batch_validator
+        validate = compile_batch_validator(self._makeSchema())
+        self.assertEqual(validate([{'name': 'a'}, {'name': 'b', 'count': 9}]),
+                         [])
+
+    def test_agrees_with_compiled_validator(self):
+        from ..validator import compile_validator
+        from ..vectorized import compile_batch_validator
+        schema = self._makeSchema()
+        rows = self._makeRows()[:4]
+        expected = set(path[0] for path, message
+                       in compile_validator(schema)(rows))
+        self.assertEqual(compile_batch_validator(schema).invalid_rows(rows),
+                         sorted(expected))
+
+    def test_rows_must_be_objects(self):
+        import colander
+        from .. import ConversionError
+        from ..vectorized import compile_batch_validator
+        node = colander.SchemaNode(colander.Sequence(),
+                                   colander.SchemaNode(colander.String()))
+        self.assertRaises(ConversionError, compile_batch_validator, node)
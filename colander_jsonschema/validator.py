@@ -0,0 +1,317 @@
+# -*- coding: utf-8 -*-
+"""
+Compile converted schemas into specialized Python validators of payloads.
+"""
+
+
+from . import ConversionError, convert
+from .patterns import compile_pattern
+
+
+_string_types = tuple(set([str, type(u'')]))
+_integer_types = tuple(set([int, type(2 ** 64)]))
+_number_types = _integer_types + (float,)
+
+_type_checks = {
+    'array': 'isinstance(%s, list)',
+    'boolean': 'isinstance(%s, bool)',
+    'integer': '(isinstance(%s, _integer_types) and %s is not True and '
+               '%s is not False)',
+    'number': '(isinstance(%s, _number_types) and %s is not True and '
+              '%s is not False)',
+    'object': 'isinstance(%s, dict)',
+    'string': 'isinstance(%s, _string_types)',
+}
+
+_subtypes = {
+    'array': ('array',),
+    'number': ('integer', 'number'),
+    'object': ('object',),
+    'string': ('string',),
+}
+
+# keywords without effect on validation
+_annotations = frozenset(['$schema', 'title', 'description', 'default',
+                          'format'])
+_keywords = frozenset(['type', 'enum', 'minLength', 'maxLength', 'pattern',
+                       'minimum', 'maximum', 'properties', 'required',
+                       'items', 'minItems', 'maxItems']) | _annotations
+
+
+def _repr_text(value):
+    """
+    ``repr()`` of ``value`` for messages, without the ``u`` prefix of text
+    in Python 2.
+
+    :type value: object
+    :rtype: str
+    """
+    text = repr(value)
+    if isinstance(value, type(u'')) and text.startswith('u'):
+        return text[1:]
+    return text
+
+
+class CompiledValidator(object):
+    """
+    Validates payloads against a converted schema with generated code.
+
+    Calling it returns the list of ``(path, message)`` errors of a payload,
+    ``path`` being the tuple of keys and indexes leading to the failing
+    value; ``source`` holds the generated code.
+    """
+
+    def __init__(self, function, source):
+        """
+        :type function: callable
+        :type source: str
+        """
+        self.function = function
+        self.source = source
+
+    def __call__(self, instance):
+        """
+        :type instance: object
+        :rtype: list
+        """
+        return self.function(instance, (), [])
+
+    def is_valid(self, instance):
+        """
+        :type instance: object
+        :rtype: bool
+        """
+        return not self.function(instance, (), [])
+
+
+class _ValidatorBuilder(object):
+
+    def __init__(self):
+        self.functions = []
+        self.namespace = {
+            '_integer_types': _integer_types,
+            '_number_types': _number_types,
+            '_string_types': _string_types,
+        }
+
+    def constant(self, prefix, value):
+        """
+        :type prefix: str
+        :type value: object
+        :rtype: str
+        """
+        name = '%s%d' % (prefix, len(self.namespace))
+        self.namespace[name] = value
+        return name
+
+    def build_function(self, schema):
+        """
+        :type schema: dict
+        :rtype: str
+        """
+        name = '_validate%d' % len(self.functions)
+        lines = ['def %s(value, path, errors):' % name]
+        self.functions.append(lines)
+        self.emit(schema, 'value', 'path', lines, 1)
+        lines.append('    return errors')
+        return name
+
+    def emit(self, schema, var, path, lines, level):
+        """
+        Append the checks of ``var`` against ``schema`` to ``lines``.
+
+        :type schema: dict
+        :type var: str
+        :type path: str
+        :type lines: list
+        :type level: int
+        """
+        unknown = set(schema) - _keywords
+        if unknown:
+            raise ConversionError('cannot compile keywords %s'
+                                  % ', '.join(sorted(unknown)))
+        indent = '    ' * level
+
+        def error(message, indent=indent):
+            lines.append('%s    errors.append((%s, %r))'
+                         % (indent, path, message))
+
+        types = schema.get('type', [])
+        if not isinstance(types, list):
+            types = [types]
+        enum = schema.get('enum')
+        if enum is not None:
+            try:
+                # bool and numbers are equal in sets, keep them apart
+                enum_values = frozenset((type(v) is bool, v) for v in enum)
+                enum_check = ('(type(%s) is bool, %s) not in %s'
+                              % (var, var,
+                                 self.constant('_enum', enum_values)))
+            except TypeError:
+                enum_check = '%s not in %s' % (
+                    var, self.constant('_enum', list(enum)))
+
+        lines.append('%sif %s is None:' % (indent, var))
+        if types and 'null' not in types:
+            error('is not of type %s' % ' or '.join(types))
+        elif enum is not None and None not in enum:
+            error('is not one of the enumerated values')
+        else:
+            lines.append('%s    pass' % indent)
+        checks = [_type_checks[t].replace('%s', var)
+                  for t in types if t != 'null']
+        if checks:
+            lines.append('%selif not (%s):' % (indent, ' or '.join(checks)))
+            error('is not of type %s' % ' or '.join(types))
+        lines.append('%selse:' % indent)
+        start = len(lines)
+        indent += '    '
+        if enum is not None:
+            lines.append('%sif %s:' % (indent, enum_check))
+            error('is not one of the enumerated values', indent)
+        self.emit_string(schema, var, path, lines, indent, error)
+        self.emit_number(schema, var, path, lines, indent, error)
+        self.emit_object(schema, var, path, lines, indent, error)
+        self.emit_array(schema, var, path, lines, indent, error)
+        if len(lines) == start:
+            lines.append('%spass' % indent)
+
+    def guard(self, schema, var, lines, indent, type_name, keywords):
+        """
+        Open a block checking ``var`` is of ``type_name`` when ``schema``
+        does not only allow that type already.
+
+        :rtype: str
+        """
+        if not any(keyword in schema for keyword in keywords):
+            return None
+        types = schema.get('type', [])
+        if not isinstance(types, list):
+            types = [types]
+        allowed = [t for t in types if t != 'null']
+        if allowed and all(t in _subtypes[type_name] for t in allowed):
+            return indent
+        lines.append('%sif %s:' % (indent,
+                                   _type_checks[type_name].replace('%s', var)))
+        return indent + '    '
+
+    def emit_string(self, schema, var, path, lines, indent, error):
+        indent = self.guard(schema, var, lines, indent, 'string',
+                            ('minLength', 'maxLength', 'pattern'))
+        if indent is None:
+            return
+        if 'minLength' in schema:
+            lines.append('%sif len(%s) < %r:' % (indent, var,
+                                                 schema['minLength']))
+            error('is too short', indent)
+        if 'maxLength' in schema:
+            lines.append('%sif len(%s) > %r:' % (indent, var,
+                                                 schema['maxLength']))
+            error('is too long', indent)
+        if 'pattern' in schema:
+            regex = self.constant('_search',
+                                  compile_pattern(schema['pattern']).search)
+            lines.append('%sif %s(%s) is None:' % (indent, regex, var))
+            error('does not match %s' % _repr_text(schema['pattern']),
+                  indent)
+
+    def emit_number(self, schema, var, path, lines, indent, error):
+        indent = self.guard(schema, var, lines, indent, 'number',
+                            ('minimum', 'maximum'))
+        if indent is None:
+            return
+        if 'minimum' in schema:
+            lines.append('%sif %s < %s:' % (
+                indent, var, self.constant('_minimum', schema['minimum'])))
+            error('is less than the minimum of %r' % schema['minimum'],
+                  indent)
+        if 'maximum' in schema:
+            lines.append('%sif %s > %s:' % (
+                indent, var, self.constant('_maximum', schema['maximum'])))
+            error('is greater than the maximum of %r' % schema['maximum'],
+                  indent)
+
+    def emit_object(self, schema, var, path, lines, indent, error):
+        indent = self.guard(schema, var, lines, indent, 'object',
+                            ('properties', 'required'))
+        if indent is None:
+            return
+        for name in schema.get('required', ()):
+            lines.append('%sif %r not in %s:' % (indent, name, var))
+            error('%s is a required property' % _repr_text(name), indent)
+        for name, sub_schema in schema.get('properties', {}).items():
+            self.emit_child(sub_schema, '%s[%r]' % (var, name),
+                            '%s + (%r,)' % (path, name), lines, indent,
+                            '%sif %r in %s:' % (indent, name, var))
+
+    def emit_array(self, schema, var, path, lines, indent, error):
+        indent = self.guard(schema, var, lines, indent, 'array',
+                            ('items', 'minItems', 'maxItems'))
+        if indent is None:
+            return
+        if 'minItems' in schema:
+            lines.append('%sif len(%s) < %r:' % (indent, var,
+                                                 schema['minItems']))
+            error('is too short', indent)
+        if 'maxItems' in schema:
+            lines.append('%sif len(%s) > %r:' % (indent, var,
+                                                 schema['maxItems']))
+            error('is too long', indent)
+        if 'items' in schema:
+            item = 'item%d' % len(lines)
+            index = 'index%d' % len(lines)
+            self.emit_child(schema['items'], item,
+                            '%s + (%s,)' % (path, index), lines, indent,
+                            '%sfor %s, %s in enumerate(%s):'
+                            % (indent, index, item, var))
+
+    def emit_child(self, schema, var, path, lines, indent, header):
+        """
+        Check a property or item inline, or in a function of its own when
+        it is a container, which keeps the generated blocks shallow.
+        """
+        lines.append(header)
+        if 'properties' in schema or 'items' in schema:
+            name = self.build_function(schema)
+            lines.append('%s    %s(%s, %s, errors)' % (indent, name, var,
+                                                        path))
+            return
+        value = 'value%d' % len(lines)
+        lines.append('%s    %s = %s' % (indent, value, var))
+        self.emit(schema, value, path, lines, len(indent) // 4 + 1)
+
+    def build(self, schema):
+        """
+        :type schema: dict
+        :rtype: CompiledValidator
+        """
+        name = self.build_function(schema)
+        source = '\n\n'.join('\n'.join(lines) for lines in self.functions)
+        code = compile(source, '<colander_jsonschema validator>', 'exec')
+        exec(code, self.namespace)
+        return CompiledValidator(self.namespace[name], source)
+
+
+def compile_validator(schema_node, converters=None):
+    """
+    Compile a validator of payloads against ``convert(schema_node)``.
+
+    The generated code checks JSON Schema draft-04 ``type``, ``enum``,
+    string, number, object and array keywords as emitted by the converters;
+    ``format`` is not asserted.
+
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :rtype: CompiledValidator
+    """
+    return compile_schema_validator(convert(schema_node, converters))
+
+
+def compile_schema_validator(schema):
+    """
+    Compile a validator of payloads against a converted ``schema``.
+
+    :type schema: dict
+    :rtype: CompiledValidator
+    """
+    return _ValidatorBuilder().build(schema)
@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+"""
+Validate many rows, flat objects converted from a mapping schema, column by
+column instead of row by row.  Numeric and length bounds are checked with
+NumPy when it is installed.
+"""
+
+import collections
+import operator
+
+from . import ConversionError, convert
+from .patterns import compile_pattern
+from .validator import _repr_text, compile_schema_validator
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+_string_types = tuple(set([str, type(u'')]))
+_integer_types = tuple(set([int, type(2 ** 64)]))
+_number_types = _integer_types + (float,)
+_missing = object()
+
+
+def _is_string(value):
+    return isinstance(value, _string_types)
+
+
+def _is_integer(value):
+    return isinstance(value, _integer_types) and not isinstance(value, bool)
+
+
+def _is_number(value):
+    return isinstance(value, _number_types) and not isinstance(value, bool)
+
+
+def _in_enum(value, enum):
+    """
+    Whether ``value``, maybe unhashable, is one of ``enum``; booleans are
+    not taken for 0 and 1.
+
+    :type value: object
+    :type enum: list
+    :rtype: bool
+    """
+    is_boolean = type(value) is bool
+    return any(value == v and (type(v) is bool) is is_boolean for v in enum)
+
+
+def _is_boolean(value):
+    return isinstance(value, bool)
+
+
+def _is_object(value):
+    return isinstance(value, dict)
+
+
+def _is_array(value):
+    return isinstance(value, list)
+
+
+# exact types decoded from JSON, checked first, and the complete checks
+_types = {
+    'array': ((list,), _is_array),
+    'boolean': ((bool,), _is_boolean),
+    'integer': (_integer_types, _is_integer),
+    'null': ((type(None),), lambda value: value is None),
+    'number': (_number_types, _is_number),
+    'object': ((dict,), _is_object),
+    'string': (_string_types, _is_string),
+}
+
+
+ColumnError = collections.namedtuple('ColumnError',
+                                     ['field', 'message', 'rows'])
+
+
+def _outside(values, minimum, maximum):
+    """
+    Positions of ``values`` below ``minimum`` and above ``maximum``.
+
+    :type values: list
+    :rtype: tuple
+    """
+    if numpy is not None and len(values):
+        array = numpy.asarray(values)
+        if array.dtype != object:
+            below = above = ()
+            if minimum is not None:
+                below = numpy.flatnonzero(array < minimum).tolist()
+            if maximum is not None:
+                above = numpy.flatnonzero(array > maximum).tolist()
+            return below, above
+    below = above = ()
+    if minimum is not None:
+        below = [k for k, v in enumerate(values) if v < minimum]
+    if maximum is not None:
+        above = [k for k, v in enumerate(values) if v > maximum]
+    return below, above
+
+
+def _lengths(values):
+    """
+    :type values: list
+    :rtype: list
+    """
+    if numpy is not None:
+        return numpy.fromiter(map(len, values), numpy.intp, len(values))
+    return [len(v) for v in values]
+
+
+class _Column(object):
+
+    def __init__(self, name, schema):
+        """
+        :type name: str
+        :type schema: dict
+        """
+        self.field = (name,)
+        self.nested = None
+        if 'properties' in schema or 'items' in schema:
+            self.nested = compile_schema_validator(schema)
+            return
+        types = schema.get('type', [])
+        if not isinstance(types, list):
+            types = [types]
+        self.types = types
+        self.type_error = 'is not of type %s' % ' or '.join(types)
+        self.exact_types = frozenset(t for name in types
+                                     for t in _types[name][0])
+        self.type_checks = [_types[name][1] for name in types]
+        self.enum = schema.get('enum')
+        self.enum_set = None
+        if self.enum is not None:
+            try:
+                self.enum_set = frozenset(self.enum)
+            except TypeError:
+                pass
+        self.min_length = schema.get('minLength')
+        self.max_length = schema.get('maxLength')
+        self.pattern = schema.get('pattern')
+        self.search = None
+        if self.pattern is not None:
+            self.search = compile_pattern(self.pattern).search
+        self.minimum = schema.get('minimum')
+        self.maximum = schema.get('maximum')
+
+    def check(self, values, rows, report):
+        """
+        Check the ``values`` of the column, ``rows[k]`` being the row of
+        ``values[k]``.
+
+        :type values: list
+        :type rows: list
+        :type report: callable
+        """
+        field = self.field
+        if self.nested is not None:
+            for row, value in zip(rows, values):
+                for path, message in self.nested(value):
+                    report(field + path, message, [row])
+            return
+
+        def report_positions(message, positions):
+            if len(positions):
+                report(field, message, [rows[k] for k in positions])
+
+        seen_types = set(map(type, values))
+        if self.enum is not None:
+            enum = self.enum
+            try:
+                if any(type(v) is bool for v in enum):
+                    enum = frozenset((type(v) is bool, v) for v in enum)
+                    failed = [k for k, v in enumerate(values)
+                              if (type(v) is bool, v) not in enum]
+                elif (bool not in seen_types and self.enum_set is not None and
+                      set(values) <= self.enum_set):
+                    failed = ()
+                else:
+                    # booleans would be taken for 0 and 1
+                    enum = frozenset(enum)
+                    failed = [k for k, v in enumerate(values)
+                              if v not in enum or type(v) is bool]
+            except TypeError:
+                # unhashable values, compared one by one
+                enum = self.enum
+                failed = [k for k, v in enumerate(values)
+                          if not _in_enum(v, enum)]
+            report_positions('is not one of the enumerated values', failed)
+
+        failed = ()
+        if self.types and not seen_types <= self.exact_types:
+            exact_types = self.exact_types
+            failed = [k for k, v in enumerate(values)
+                      if type(v) not in exact_types]
+            checks = self.type_checks
+            failed = [k for k in failed
+                      if not any(check(values[k]) for check in checks)]
+            report_positions(self.type_error, failed)
+        if failed or type(None) in seen_types:
+            failed = set(failed)
+            kept = [k for k, v in enumerate(values)
+                    if v is not None and k not in failed]
+            rows = [rows[k] for k in kept]
+            values = [values[k] for k in kept]
+
+        if (self.min_length is not None or self.max_length is not None or
+                self.search is not None):
+            strings = values
+            string_rows = rows
+            if [t for t in self.types if t != 'null'] != ['string']:
+                kept = [k for k, v in enumerate(values) if _is_string(v)]
+                strings = [values[k] for k in kept]
+                string_rows = [rows[k] for k in kept]
+            if self.min_length is not None or self.max_length is not None:
+                too_short, too_long = _outside(_lengths(strings),
+                                               self.min_length,
+                                               self.max_length)
+                if len(too_short):
+                    report(field, 'is too short',
+                           [string_rows[k] for k in too_short])
+                if len(too_long):
+                    report(field, 'is too long',
+                           [string_rows[k] for k in too_long])
+            if self.search is not None:
+                search = self.search
+                failed = [row for row, v in zip(string_rows, strings)
+                          if search(v) is None]
+                if failed:
+                    report(field,
+                           'does not match %s' % _repr_text(self.pattern),
+                           failed)
+
+        if self.minimum is not None or self.maximum is not None:
+            if not set(self.types) <= set(['integer', 'number', 'null']):
+                kept = [k for k, v in enumerate(values) if _is_number(v)]
+                rows = [rows[k] for k in kept]
+                values = [values[k] for k in kept]
+            below, above = _outside(values, self.minimum, self.maximum)
+            report_positions('is less than the minimum of %r'
+                             % self.minimum, below)
+            report_positions('is greater than the maximum of %r'
+                             % self.maximum, above)
+
+
+class BatchValidator(object):
+    """
+    Validates a list of rows against a converted array-of-objects schema,
+    or against the object schema of the rows, one column at a time.
+
+    Calling it returns the list of :class:`ColumnError`, each holding the
+    path of a field, the message and the sorted indexes of the failing rows
+    (``None`` for errors of the array itself).
+    """
+
+    def __init__(self, schema):
+        """
+        :type schema: dict
+        """
+        self.array_schema = None
+        if schema.get('type') in ('array', ['array', 'null']):
+            self.array_schema = schema
+            schema = schema.get('items', {})
+        if schema.get('type') not in ('object', ['object', 'null']):
+            raise ConversionError('rows must be objects')
+        self.nullable = schema['type'] != 'object'
+        self.required = schema.get('required', [])
+        self.columns = [_Column(name, sub_schema) for name, sub_schema
+                        in schema.get('properties', {}).items()]
+
+    def __call__(self, rows):
+        """
+        :type rows: list
+        :rtype: list of ColumnError
+        """
+        errors = collections.OrderedDict()
+
+        def report(field, message, indices):
+            if indices:
+                errors.setdefault((field, message), []).extend(indices)
+
+        if self.array_schema is not None:
+            for key, message, failed in (
+                    ('minItems', 'is too short', lambda n, b: n < b),
+                    ('maxItems', 'is too long', lambda n, b: n > b)):
+                bound = self.array_schema.get(key)
+                if bound is not None and failed(len(rows), bound):
+                    errors[((), message)] = None
+
+        if set(map(type, rows)) == set([dict]):
+            objects = range(len(rows))
+            objects_rows = rows
+        else:
+            objects = []
+            for index, row in enumerate(rows):
+                if isinstance(row, dict):
+                    objects.append(index)
+                elif row is not None or not self.nullable:
+                    report((), 'is not of type object', [index])
+            objects_rows = [rows[i] for i in objects]
+        if self.required:
+            try:
+                collections.deque(map(operator.itemgetter(*self.required),
+                                      objects_rows), 0)
+            except KeyError:
+                for name in self.required:
+                    report((), '%s is a required property'
+                           % _repr_text(name),
+                           [i for i, row in zip(objects, objects_rows)
+                            if name not in row])
+        for column in self.columns:
+            name = column.field[0]
+            indices = objects
+            try:
+                values = list(map(operator.itemgetter(name), objects_rows))
+            except KeyError:
+                values = [row.get(name, _missing) for row in objects_rows]
+                indices = [i for i, v in zip(objects, values)
+                           if v is not _missing]
+                values = [v for v in values if v is not _missing]
+            column.check(values, indices, report)
+        return [ColumnError(field, message,
+                            sorted(set(indices)) if indices is not None
+                            else None)
+                for (field, message), indices in errors.items()]
+
+    def invalid_rows(self, rows):
+        """
+        Sorted indexes of the rows with errors.
+
+        :type rows: list
+        :rtype: list
+        """
+        invalid = set()
+        for error in self(rows):
+            invalid.update(error.rows or ())
+        return sorted(invalid)
+
+
+def compile_batch_validator(schema_node, converters=None):
+    """
+    :type schema_node: colander.SchemaNode
+    :type converters: dict
+    :rtype: BatchValidator
+    """
+    return BatchValidator(convert(schema_node, converters))
@@ -28,6 +28,11 @@ setup(
     zip_safe=False,
     install_requires=['colander'],
     test_suite = 'colander_jsonschema.tests',
+    entry_points={
+        'console_scripts': [
+            'colander_jsonschema-prewarm = colander_jsonschema.diskcache:main',
+        ],
+    },
     classifiers=[
         'Environment :: Console',
         'Framework :: Pylons',